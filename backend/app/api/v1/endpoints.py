@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, PrivateAttr, ValidationError
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, inspect
 from ...db.session import SessionLocal
@@ -13,11 +13,15 @@ from ...models.documents import Folder, Document, DocumentVersion
 from ...models.scheduling import Shift, AvailabilityBlock, ShiftSwapRequest
 from ...models.skates import SkateInventory, SkateRental
 from fastapi import UploadFile, File, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse, HTMLResponse, Response
+from fastapi.responses import FileResponse, HTMLResponse, Response, StreamingResponse
 from typing import Dict, Set, List, Optional
 from datetime import datetime, timedelta, timezone, date
 import asyncio
+import heapq
+import math
+import re
 import time
+import uuid
 from ...core.security import verify_password, hash_password, create_access_token, decode_token
 from ...services.dali import service as dali_service
 from ...core.config import settings
@@ -25,8 +29,20 @@ import os, shutil
 from ...services.pdf_service import ensure_archive_path, render_pdf_bytes, save_pdf_to_archive
 from ...services.siren import siren_wav_bytes
 from ...services.obs_v5 import obs_manager
+from ...services.settings_cache import settings_cache
+from ...services.audit import audit_writer
+from ...services.audit_archive import audit_archive, audit_hot_cutoff
+from ...services.ws_manager import ws_manager, Frame, PUBLIC_ROOMS
+from ...services.state_sync import VersionedState
+from ...services import game_clock
+from ...services.game_clock import Countdown
+from ...services.game_store import game_store
+from ...services.game_events import GameEventLog
+from ...services.game_timers import DeadlineQueue
+from ...services.notifications import notification_hub, NotificationCoalescer
+from ...db.partitions import ensure_audit_partitions
 from ...core.encryption import encrypt_value, decrypt_value
-from fastapi import Form, Request
+from fastapi import Form, Query, Request
 import importlib
 try:
     slowapi = importlib.import_module('slowapi')
@@ -65,11 +81,8 @@ def _has_username_column(db: Session) -> bool:
 
 
 def _get_setting_value(db: Session, key: str, default: str | None = None) -> str | None:
-    """Return AppSetting.value or default safely without confusing the type checker."""
-    row = db.query(AppSetting).filter(AppSetting.key == key).first()
-    if not row:
-        return default
-    return getattr(row, 'value', default)
+    """Return AppSetting.value or default, served from the in-process settings cache."""
+    return settings_cache.get(key, default, db)
 
 def get_db():
     db = SessionLocal()
@@ -523,50 +536,213 @@ def clear_skating_calendar(db: Session = Depends(get_db), _: User = Depends(requ
     return {"ok": True}
 
 # ---- WebSocket Rooms and Command Broker ----
-class WSManager:
-    def __init__(self) -> None:
-        self.rooms: Dict[str, Set[WebSocket]] = {
-            'control': set(),
-            'player': set(),
-            'display': set(),
-            'game': set(),
-        }
-        self.lock = asyncio.Lock()
+# WSManager lives in services.ws_manager (per-connection send queues)
+
+def _ws_control_message(ws: WebSocket, data) -> bool:
+    """Handle protocol messages shared by both socket endpoints; True if consumed."""
+    if not isinstance(data, dict):
+        return False
+    kind = data.get('type')
+    if kind == 'pong':
+        return True
+    if kind == 'timeSync':
+        # NTP-style probe: the client sent t0 (its clock), we stamp receive/transmit in server
+        # ms; offset = ((t1 - t0) + (t2 - t3)) / 2. Jumps the queue so t2 is not stale on send
+        t1 = game_clock.server_ms()
+        ws_manager.send(ws, {"type": "timeSync", "t0": data.get('t0'), "t1": t1, "t2": game_clock.server_ms()}, urgent=True)
+        return True
+    if kind == 'resync':
+        # client saw a version gap: send it the current keyframe only
+        keyframes = [g.keyframe() for g in map(games.of_room, ws_manager.rooms_of(ws)) if g is not None]
+        for frame in keyframes:
+            ws_manager.send(ws, frame)
+        return bool(keyframes)
+    return False
+
+def _public_room(room: str) -> str | None:
+    """The room an unauthenticated client asked for, or None if it is not public.
+
+    'game' stands for the default game's room; other games are 'game:{id}' while they exist.
+    """
+    if room == 'game':
+        return games.default.room
+    if room in PUBLIC_ROOMS or games.of_room(room) is not None:
+        return room
+    return None
 
-    async def connect(self, room: str, ws: WebSocket):
-        await ws.accept()
-        async with self.lock:
-            self.rooms.setdefault(room, set()).add(ws)
+@router.websocket("/ws/{room}")
+async def ws_endpoint(ws: WebSocket, room: str, encoding: str | None = None, token: str | None = None):
+    """Unauthenticated single-room socket for kiosk displays and overlays (public rooms only).
+
+    ``?encoding=struct|msgpack`` selects a compact binary encoding (see services.ws_codec).
+    The 'control' room needs ``?token=`` with the 'obs.control' permission.
+    With ``?token=`` on a game room the socket is also the operator's control channel:
+    the JWT and its 'game.control' permission are checked once here, then
+    ``{"type": "command", "seq": n, "commands": [...]}`` runs ops as POST /game/commands
+    does and is answered with ``{"type": "ack", "seq": n, ...}``.
+    """
+    principal = control = None
+    if token is not None:
+        principal = await asyncio.to_thread(_ws_principal, token)
+        if principal is None:
+            await ws.close(code=4401)
+            return
+        control = _WSControl(principal)
+    if room == 'control':
+        if principal is None or not _ws_topic_allowed(principal, room):
+            await ws.close(code=4403)
+            return
+    else:
+        room = _public_room(room)
+        if room is None:
+            await ws.close(code=4404)
+            return
+    game = games.of_room(room)
+    await ws_manager.connect(room, ws, encoding)
+    try:
+        while True:
+            data = await ws.receive_json()
+            ws_manager.touch(ws)
+            if _ws_control_message(ws, data):
+                continue
+            if isinstance(data, dict) and data.get('type') == 'command':
+                # commands address this socket's game only
+                await _ws_game_command(ws, control, {**data, "game": None}, game.id if game is not None else None)
+                continue
+            # echo back ack if needed (queued so it stays ordered with broadcasts)
+            ws_manager.send(ws, {"ok": True})
+    except WebSocketDisconnect:
+        pass
+    except Exception:
+        pass
+    finally:
+        # also covers invalid frames and sockets closed by eviction
+        await ws_manager.disconnect_all(ws)
 
-    async def disconnect(self, room: str, ws: WebSocket):
-        async with self.lock:
-            if room in self.rooms and ws in self.rooms[room]:
-                self.rooms[room].remove(ws)
+_SSE_KEEPALIVE = 15.0
 
-    async def broadcast(self, room: str, message: dict):
-        async with self.lock:
-            targets = list(self.rooms.get(room, set()))
-        for ws in targets:
-            try:
-                await ws.send_json(message)
-            except Exception:
-                try:
-                    await ws.close()
-                except Exception:
-                    pass
+@router.get("/stream/{room}")
+async def sse_stream(room: str, request: Request):
+    """Server-Sent Events feed of a public room, for displays that cannot keep a WebSocket.
 
-ws_manager = WSManager()
+    Each event's data is the JSON message the room's sockets get; the room's retained
+    state (e.g. the game keyframe) comes first. A comment line every 15s keeps proxies
+    from closing an idle stream.
+    """
+    room = _public_room(room)
+    if room is None:
+        raise HTTPException(status_code=404, detail="Stanza non trovata")
+
+    async def events():
+        with ws_manager.listen(room) as listener:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                frame = await listener.get(_SSE_KEEPALIVE)
+                if frame is None:
+                    yield ": keepalive\n\n"
+                elif isinstance(frame.data, str):
+                    yield f"data: {frame.data}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+class _WSPrincipal(BaseModel):
+    user_id: int
+    is_admin: bool
+    permissions: set[str]
 
-@router.websocket("/ws/{room}")
-async def ws_endpoint(ws: WebSocket, room: str):
-    await ws_manager.connect(room, ws)
+    def can(self, permission: str) -> bool:
+        # as require_permission: admin has all permissions
+        return self.is_admin or permission in self.permissions
+
+def _ws_principal(token: str | None) -> _WSPrincipal | None:
+    """Resolve a socket's JWT to its user; blocking, so sockets call it via ``asyncio.to_thread``."""
+    payload = decode_token(token) if token else None
+    if not payload or 'sub' not in payload:
+        return None
+    db = SessionLocal()
+    try:
+        user = db.query(User).get(int(payload['sub']))
+        if not user or not user.is_active:
+            return None
+        return _WSPrincipal(
+            user_id=user.id,
+            is_admin=any(r.name == 'admin' for r in user.roles),
+            permissions={p.code for r in user.roles for p in r.permissions},
+        )
+    finally:
+        db.close()
+
+def _ws_topic_allowed(principal: _WSPrincipal, topic: str) -> bool:
+    if topic.startswith('notifications_user_'):
+        return topic == f"notifications_user_{principal.user_id}"
+    if topic == 'control':
+        return principal.can('obs.control')
+    return _public_room(topic) == topic or topic == 'notifications_all'
+
+@router.websocket("/ws")
+async def ws_multiplexed(ws: WebSocket, token: str | None = None, encoding: str | None = None):
+    """Authenticated socket carrying several topics.
+
+    The JWT (``?token=``) is checked once at connect. Then send
+    ``{"type": "subscribe", "topics": [...]}`` / ``{"type": "unsubscribe", ...}``; the
+    server answers ``{"type": "subscribed", "topics": [...], "denied": [...]}``.
+    Messages from all topics arrive as-is on this one socket; ``?encoding=`` works as
+    on ``/ws/{room}``. Game commands (``"game"`` picks the game, default 'main') are
+    accepted as on a game room's control channel.
+    """
+    principal = await asyncio.to_thread(_ws_principal, token)
+    if principal is None:
+        await ws.close(code=4401)
+        return
+    control = _WSControl(principal)
+    await ws_manager.accept(ws, encoding)
     try:
         while True:
             data = await ws.receive_json()
-            # echo back ack if needed
-            await ws.send_json({"ok": True})
+            ws_manager.touch(ws)
+            if _ws_control_message(ws, data):
+                continue
+            if isinstance(data, dict) and data.get('type') == 'command':
+                await _ws_game_command(ws, control, data, DEFAULT_GAME_ID)
+                continue
+            kind = data.get('type') if isinstance(data, dict) else None
+            topics = data.get('topics') if isinstance(data, dict) else None
+            if kind not in ('subscribe', 'unsubscribe') or not isinstance(topics, list):
+                ws_manager.send(ws, {"type": "error", "detail": "Messaggio non valido"})
+                continue
+            # 'game' is the default game's room, as on /ws/game
+            topics = [games.default.room if t == 'game' else t for t in topics if isinstance(t, str)]
+            if kind == 'unsubscribe':
+                for t in topics:
+                    ws_manager.leave(ws, t)
+                ws_manager.send(ws, {"type": "subscribed", "topics": sorted(ws_manager.rooms_of(ws)), "denied": []})
+                continue
+            denied, joined = [], []
+            for t in topics:
+                current = ws_manager.rooms_of(ws)
+                if t in current:
+                    continue
+                if (not _ws_topic_allowed(principal, t)
+                        or len(current) >= settings.ws_max_subscriptions
+                        or not ws_manager.join(ws, t, replay=False)):
+                    denied.append(t)
+                else:
+                    joined.append(t)
+            ws_manager.send(ws, {"type": "subscribed", "topics": sorted(ws_manager.rooms_of(ws)), "denied": denied})
+            # retained room state goes out right after the ack
+            for t in joined:
+                ws_manager.replay(ws, t)
+            since = data.get('since')
+            if isinstance(since, int) and f"notifications_user_{principal.user_id}" in ws_manager.rooms_of(ws):
+                # reconnect: replay what the client missed after its last seen id
+                for payload in await asyncio.to_thread(notification_hub.replay, principal.user_id, since):
+                    ws_manager.send(ws, payload)
     except WebSocketDisconnect:
-        await ws_manager.disconnect(room, ws)
+        pass
+    except Exception:
+        pass
+    finally:
+        await ws_manager.disconnect_all(ws)
 
 class Command(BaseModel):
     type: str
@@ -577,9 +753,20 @@ async def send_command(target: str, cmd: Command, _: User = Depends(require_admi
     # target: 'player' or 'display'
     if target not in ('player', 'display'):
         raise HTTPException(status_code=400, detail="Target non valido")
-    await ws_manager.broadcast(target, {"type": cmd.type, "payload": cmd.payload or {}})
+    # view changes are state: a display that (re)connects later gets the current one
+    await ws_manager.broadcast(target, {"type": cmd.type, "payload": cmd.payload or {}}, retain=cmd.type in _RETAINED_COMMANDS.get(target, ()))
     return {"ok": True}
 
+# Command types kept as the room's last value; the rest (jingles, volume steps, track skips) are one-shot
+_RETAINED_COMMANDS = {'display': {'showView'}}
+
+def _timer_view(start_time: datetime):
+    # retained timer view: computed at join time so a late display shows the real remaining time
+    def provider():
+        remaining = max(0, int((start_time - datetime.now(timezone.utc)).total_seconds()))
+        return Frame.encode({"type": "showView", "payload": {"view": "timer", "seconds": remaining}})
+    return provider
+
 # ---- Automation Task ----
 async def skating_scheduler():
     while True:
@@ -605,6 +792,7 @@ async def skating_scheduler():
                 if not ev.display_timer_trigger_sent:
                     remaining = int((ev.start_time - now).total_seconds())
                     await ws_manager.broadcast('display', {"type": "showView", "payload": {"view": "timer", "seconds": remaining}})
+                    ws_manager.retain('display', 'showView', _timer_view(ev.start_time))
                     ev.display_timer_trigger_sent = True
             db.commit()
         except Exception:
@@ -750,7 +938,8 @@ async def tasks_create(data: TaskCreate, db: Session = Depends(get_db), current:
             assignee.id, 
             f"Nuovo incarico assegnato: {task.title}",
             "info",
-            {"task_id": task.id, "priority": task.priority}
+            {"task_id": task.id, "priority": task.priority},
+            coalesce_key="tasks.assigned",
         )
     
     return TaskOut(
@@ -1001,14 +1190,13 @@ def tickets_move(ticket_id: int, req: TicketMoveRequest, db: Session = Depends(g
                 str(t.creator_id), str(t.assignee_id or ''),
                 (t.created_at.isoformat() if t.created_at else ''), (t.updated_at.isoformat() if t.updated_at else '')
             ]
-            footer = (db.query(AppSetting).filter(AppSetting.key == 'pdf.footer').first() or type('x',(),{'value':None}))
             pdf = render_pdf_bytes(
                 title='Ticket Risolto',
                 subtitle=f"Ticket #{t.id}",
                 table_headers=headers,
                 table_rows=[row],
                 logo_path=settings.report_logo_path,
-                footer_text=getattr(footer,'value',None),
+                footer_text=_get_setting_value(db, 'pdf.footer'),
             )
             fname = f"Ticket_{t.id:06d}.pdf"
             save_pdf_to_archive(db, folder_id, fname, pdf, author_id=current.id)
@@ -1250,14 +1438,9 @@ def admin_settings_list(db: Session = Depends(get_db), _: User = Depends(require
 
 @router.put('/admin/settings')
 def admin_settings_set(items: list[SettingItem], db: Session = Depends(get_db), current: User = Depends(require_admin)):
-    for it in items:
-        row = db.query(AppSetting).filter(AppSetting.key == it.key).first()
-        if row:
-            row.value = it.value
-        else:
-            db.add(AppSetting(key=it.key, value=it.value))
-    db.add(AuditLog(user_id=current.id, action='settings.update', details=f"{len(items)} items"))
+    settings_cache.put_many(db, {it.key: it.value for it in items})
     db.commit()
+    audit_writer.log(current.id, 'settings.update', f"{len(items)} items")
     return {"ok": True}
 
 
@@ -1273,12 +1456,9 @@ def admin_obs_config(data: ObsConfig, db: Session = Depends(get_db), current: Us
     # store encrypted password to protect at-rest secrets
     enc_pwd = encrypt_value(data.password or '')
     kv = { 'obs.host': data.host, 'obs.port': str(data.port), 'obs.password': enc_pwd }
-    for k,v in kv.items():
-        row = db.query(AppSetting).filter(AppSetting.key==k).first()
-        if row: row.value = v
-        else: db.add(AppSetting(key=k, value=v))
-    db.add(AuditLog(user_id=current.id, action='obs.config', details=f"{data.host}:{data.port}"))
+    settings_cache.put_many(db, kv)
     db.commit()
+    audit_writer.log(current.id, 'obs.config', f"{data.host}:{data.port}")
     try:
         # start/refresh persistent connection
         obs_manager.set_config(data.host, int(data.port), data.password or '')
@@ -1479,15 +1659,109 @@ class AuditOut(BaseModel):
     class Config:
         from_attributes = True
 
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _audit_cursor(ts: datetime, row_id: int) -> str:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    us = (ts - _EPOCH) // timedelta(microseconds=1)
+    return f"{us}:{row_id}"
+
+def _parse_audit_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        us, row_id = cursor.split(':', 1)
+        return _EPOCH + timedelta(microseconds=int(us)), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail='Cursor non valido')
+
+def _like_escape(v: str) -> str:
+    return v.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
 @router.get('/admin/audit', response_model=list[AuditOut])
-def admin_audit_list(q: str | None = None, limit: int = 200, db: Session = Depends(get_db), _: User = Depends(require_admin)):
-    query = db.query(AuditLog).order_by(AuditLog.timestamp.desc())
+def admin_audit_list(
+    response: Response,
+    q: str | None = None,
+    action: str | None = None,
+    action_prefix: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cursor: str | None = None,
+    limit: int = 200,
+    db: Session = Depends(get_db),
+    _: User = Depends(require_admin),
+):
+    """Audit entries, newest first.
+
+    since/until bound the time range (uses the timestamp index and, on Postgres, prunes
+    monthly partitions); action matches exactly, action_prefix by prefix. Pagination is
+    keyset-based: pass the X-Next-Cursor response header back as ``cursor``. When
+    ``since`` reaches past the hot retention window, pages continue into the compressed
+    cold archive once the hot table is exhausted.
+    """
+    from sqlalchemy import and_
+    limit = max(1, min(limit, 1000))
+    query = db.query(AuditLog)
+    if since is not None:
+        query = query.filter(AuditLog.timestamp >= since)
+    if until is not None:
+        query = query.filter(AuditLog.timestamp < until)
+    if action:
+        query = query.filter(AuditLog.action == action)
+    elif action_prefix:
+        query = query.filter(AuditLog.action.like(_like_escape(action_prefix) + '%', escape='\\'))
     if q:
-        from sqlalchemy import func
-        like = f"%{q.lower()}%"
-        query = query.filter(func.lower(AuditLog.action).like(like) | func.lower(AuditLog.details).like(like))
-    rows = query.limit(limit).all()
-    return [AuditOut.model_validate(r) for r in rows]
+        like = f"%{_like_escape(q)}%"
+        query = query.filter(or_(AuditLog.action.ilike(like, escape='\\'), AuditLog.details.ilike(like, escape='\\')))
+    before = _parse_audit_cursor(cursor) if cursor else None
+    if before:
+        c_ts, c_id = before
+        query = query.filter(or_(AuditLog.timestamp < c_ts, and_(AuditLog.timestamp == c_ts, AuditLog.id < c_id)))
+    rows = query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(limit).all()
+    out = [AuditOut.model_validate(r) for r in rows]
+    if len(out) < limit and since is not None and (since if since.tzinfo else since.replace(tzinfo=timezone.utc)) < audit_hot_cutoff():
+        # archived rows are all older than what is left in the hot table
+        if out:
+            before = (out[-1].timestamp, out[-1].id)
+        for rec in audit_archive.iter_desc(since=since, until=until, action=action, action_prefix=None if action else action_prefix, q=q, before=before):
+            out.append(AuditOut.model_validate(rec))
+            if len(out) == limit:
+                break
+    if len(out) == limit:
+        response.headers['X-Next-Cursor'] = _audit_cursor(out[-1].timestamp, out[-1].id)
+    return out
+
+@router.get('/admin/audit/stats')
+def admin_audit_stats(_: User = Depends(require_admin)):
+    """Queue depth and counters of the background audit writer."""
+    return audit_writer.stats()
+
+@router.get('/admin/ws/stats')
+def admin_ws_stats(_: User = Depends(require_admin)):
+    """WebSocket connections per room with per-client queue depth, drops and send lag."""
+    return ws_manager.stats()
+
+@router.get('/admin/game/store/stats')
+def admin_game_store_stats(_: User = Depends(require_admin)):
+    """Game state snapshot writer: pending write, counters and last write time."""
+    return game_store.stats()
+
+@router.get('/admin/game/timers/stats')
+def admin_game_timers_stats(_: User = Depends(require_admin)):
+    """Game scheduler: games with a pending deadline, next deadline and wakeups so far."""
+    return _game_timers.stats()
+
+@router.get('/admin/notifications/stats')
+def admin_notifications_stats(_: User = Depends(require_admin)):
+    """Coalescer counters: sent immediately, held back and digests emitted."""
+    return notification_coalescer.stats()
+
+@router.post('/admin/audit/archive')
+def admin_audit_archive_run(current: User = Depends(require_admin)):
+    """Run the retention job now: move rows older than audit.retention_days to the archive."""
+    result = audit_archive.archive_before(audit_hot_cutoff())
+    result['archived_segments'] = len(audit_archive.segments())
+    audit_writer.log(current.id, 'audit.archive', f"rows={result['rows']}")
+    return result
 
 # Branding & PDF footer text
 class BrandingUpdate(BaseModel):
@@ -1496,13 +1770,10 @@ class BrandingUpdate(BaseModel):
 @router.post('/admin/branding')
 def admin_branding_set(data: BrandingUpdate, db: Session = Depends(get_db), current: User = Depends(require_admin)):
     if data.pdf_footer_text is not None:
-        row = db.query(AppSetting).filter(AppSetting.key == 'pdf.footer').first()
-        if row:
-            row.value = data.pdf_footer_text
-        else:
-            db.add(AppSetting(key='pdf.footer', value=data.pdf_footer_text))
-    db.add(AuditLog(user_id=current.id, action='branding.update', details='pdf.footer'))
-    db.commit(); return {"ok": True}
+        settings_cache.put(db, 'pdf.footer', data.pdf_footer_text)
+    db.commit()
+    audit_writer.log(current.id, 'branding.update', 'pdf.footer')
+    return {"ok": True}
 
 # Skating audio file manager (simple storage under /app/storage/audio/skating)
 
@@ -1564,14 +1835,13 @@ class ReportRequest(BaseModel):
 @router.post('/reports/generate')
 def reports_generate(data: ReportRequest, db: Session = Depends(get_db), current: User = Depends(get_current_user)):
     folder_id = ensure_archive_path(db, data.module)
-    footer = (db.query(AppSetting).filter(AppSetting.key == 'pdf.footer').first() or type('x',(),{'value':None}))
     pdf = render_pdf_bytes(
         title=data.title,
         subtitle=data.subtitle,
         table_headers=data.headers,
         table_rows=data.rows,
         logo_path=settings.report_logo_path,
-        footer_text=getattr(footer,'value',None),
+        footer_text=_get_setting_value(db, 'pdf.footer'),
     )
     name = data.file_name or f"Report_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.pdf"
     ver = save_pdf_to_archive(db, folder_id, name, pdf, author_id=current.id)
@@ -1738,11 +2008,55 @@ def swap_decide(req_id: int, data: SwapDecision, db: Session = Depends(get_db),
 
 # ===================== GAME (Match Control & Scoreboard) =====================
 
+def _ends_at(clock: Countdown) -> Optional[int]:
+    deadline = clock.deadline()
+    return game_clock.server_ms(deadline) if deadline is not None else None
+
+# Persisted form of a countdown: a running one by its deadline in server (epoch) time, so
+# the time the process was down counts as elapsed when it is restored
+def _clock_record(clock: Countdown) -> dict:
+    return {"ms": clock.remaining_ms(), "endsAt": _ends_at(clock)}
+
+def _restore_clock(clock: Countdown, record: dict, at: float) -> None:
+    ends_at = record.get("endsAt")
+    if ends_at is None:
+        clock.set_ms(record.get("ms", 0))
+        return
+    # overdue deadlines restore at 0 and fire on the scheduler's next pass
+    clock.set_ms(ends_at - game_clock.server_ms(at))
+    clock.start(at)
+
 class Penalty(BaseModel):
     id: int
     team: str  # 'home' | 'away'
     player_number: str
-    remaining: int  # seconds
+    # runs only while the game clock runs outside intervals (GameState keeps it in step)
+    _clock: Countdown = PrivateAttr(default_factory=Countdown)
+
+    def __init__(self, remaining: float = 0, **data):
+        super().__init__(**data)
+        self._clock = Countdown(remaining)
+
+    @property
+    def remaining(self) -> int:
+        """Seconds left, rounded up like the game clock."""
+        return self._clock.seconds()
+
+    @remaining.setter
+    def remaining(self, seconds: float) -> None:
+        self._clock.set(seconds)
+
+    def snapshot(self) -> dict:
+        return {**self.model_dump(), "remaining": self.remaining, "endsAt": _ends_at(self._clock)}
+
+    def to_record(self) -> dict:
+        return {**self.model_dump(), "clock": _clock_record(self._clock)}
+
+    @classmethod
+    def from_record(cls, record: dict, at: float) -> "Penalty":
+        pen = cls(**{k: v for k, v in record.items() if k in cls.model_fields})
+        _restore_clock(pen._clock, record.get("clock") or {}, at)
+        return pen
 
 class GameState(BaseModel):
     home_name: str = "Casa"
@@ -1756,46 +2070,545 @@ class GameState(BaseModel):
     score_away: int = 0
     shots_home: int = 0
     shots_away: int = 0
-    timeout_remaining: int = 0  # seconds, 0 when no timeout running
     siren_on: bool = False
     siren_every_minute: bool = False
     obs_visible: bool = True
-    timer_running: bool = False
-    timer_remaining: int = 20*60
-    in_interval: bool = False
     penalties: List[Penalty] = []
+    # Clocks are deadlines, not counters (services.game_clock): the *_remaining properties
+    # are whole seconds computed on demand, the Countdowns carry sub-second precision
+    _timer: Countdown = PrivateAttr(default_factory=lambda: Countdown(20*60))
+    _timeout: Countdown = PrivateAttr(default_factory=Countdown)
+    _in_interval: bool = PrivateAttr(default=False)
+    # timer ms of the last siren announced (or where the clock was started), so each pulse
+    # is announced once
+    _siren_mark: float = PrivateAttr(default=20*60*1000.0)
+    # (deadline, id, penalty) of the running penalties, earliest expiry on top; entries whose
+    # penalty stopped, moved or left no longer match its deadline and are skipped
+    _penalty_heap: list = PrivateAttr(default_factory=list)
 
     def period_label(self) -> str:
         return "OT" if self.period_index >= 4 else f"{self.period_index}°"
 
-game_state = GameState()
-game_lock = asyncio.Lock()
-_penalty_id_seq = 1
+    @property
+    def timer(self) -> Countdown:
+        return self._timer
 
-def _snapshot_state() -> dict:
+    @property
+    def timeout(self) -> Countdown:
+        return self._timeout
+
+    @property
+    def timer_running(self) -> bool:
+        return self._timer.running
+
+    @timer_running.setter
+    def timer_running(self, running: bool) -> None:
+        if running:
+            self.start_timer()
+        else:
+            self.stop_timer()
+
+    @property
+    def timer_remaining(self) -> int:
+        return self._timer.seconds()
+
+    @timer_remaining.setter
+    def timer_remaining(self, seconds: float) -> None:
+        self.set_timer_ms(seconds * 1000.0)
+
+    def set_timer_ms(self, ms: float, at: float | None = None) -> None:
+        self._timer.set_ms(ms, at)
+        self._siren_mark = self._timer.remaining_ms(at)
+        # penalties count whole seconds in step with the game clock
+        for p in self.penalties:
+            p._clock.set_ms(self._aligned_ms(p._clock.seconds(at) * 1000.0, at), at)
+        self._rebuild_penalty_heap()
+
+    @property
+    def timeout_remaining(self) -> int:
+        """Seconds, 0 when no timeout running (a timeout always runs once set)."""
+        return self._timeout.seconds()
+
+    @timeout_remaining.setter
+    def timeout_remaining(self, seconds: float) -> None:
+        self.set_timeout(seconds)
+
+    def set_timeout(self, seconds: float, at: float | None = None) -> None:
+        self._timeout.stop(at)
+        self._timeout.set(seconds, at)
+        if seconds > 0:
+            self._timeout.start(at)
+
+    @property
+    def in_interval(self) -> bool:
+        return self._in_interval
+
+    @in_interval.setter
+    def in_interval(self, value: bool) -> None:
+        self.set_in_interval(value)
+
+    def set_in_interval(self, value: bool, at: float | None = None) -> None:
+        self._in_interval = bool(value)
+        self._sync_penalties(at)
+
+    def start_timer(self, at: float | None = None) -> None:
+        if self._timer.remaining_ms() <= 0:
+            return  # nothing left to run (e.g. end of interval until the next period)
+        self._timer.start(at)
+        self._siren_mark = self._timer.remaining_ms(at)
+        self._sync_penalties(at)
+
+    def stop_timer(self, at: float | None = None) -> None:
+        self._timer.stop(at)
+        self._sync_penalties(at)
+
+    def add_penalty(self, pen: Penalty, at: float | None = None, align: bool = True) -> None:
+        # a penalty starts at the displayed second of the game clock, like on the score sheet
+        if align:
+            pen._clock.set_ms(self._aligned_ms(pen._clock.remaining_ms(), at))
+        self.penalties.append(pen)
+        if self._timer.running and not self._in_interval:
+            pen._clock.start(at)
+            heapq.heappush(self._penalty_heap, (pen._clock.deadline(), pen.id, pen))
+
+    def remove_penalties(self, ids: Set[int], at: float | None = None) -> None:
+        for p in [p for p in self.penalties if p.id in ids]:
+            p._clock.stop(at)  # retires its heap entry
+            self.penalties.remove(p)
+
+    def _aligned_ms(self, ms: float, at: float | None = None) -> float:
+        # shift ``ms`` to the game clock's sub-second phase so both change display together
+        t = self._timer.remaining_ms(at)
+        return max(0.0, ms - (math.ceil(t / 1000.0 - 1e-6) * 1000.0 - t))
+
+    def _sync_penalties(self, at: float | None = None) -> None:
+        run = self._timer.running and not self._in_interval
+        for p in self.penalties:
+            if run:
+                p._clock.start(at)
+            else:
+                p._clock.stop(at)
+        self._rebuild_penalty_heap()
+
+    def _rebuild_penalty_heap(self) -> None:
+        # after a start, stop or realignment every penalty moved (already an O(n) pass)
+        self._penalty_heap = [(p._clock.deadline(), p.id, p) for p in self.penalties if p._clock.running]
+        heapq.heapify(self._penalty_heap)
+
+    def next_penalty_expiry(self) -> Optional[float]:
+        """Monotonic deadline of the first running penalty to expire."""
+        heap = self._penalty_heap
+        while heap and heap[0][2]._clock.deadline() != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def expired_penalties(self, at: float) -> list[int]:
+        """Ids of the penalties expired by ``at``, O(log n) each; they leave the heap."""
+        return [pid for _, pid in self.penalty_expiries(at)]
+
+    def penalty_expiries(self, at: float) -> list[tuple[float, int]]:
+        """(deadline, id) of the penalties expired by ``at``, earliest first; they leave the heap."""
+        expiries = []
+        while (deadline := self.next_penalty_expiry()) is not None and deadline <= at:
+            expiries.append(heapq.heappop(self._penalty_heap)[:2])
+        return expiries
+
+    def _siren_targets(self, at: float, lead_ms: float) -> tuple[Optional[float], Optional[float]]:
+        """Timer ms of the newest siren due for announcement (sounding within ``lead_ms``)
+        and of the next one after it; sirens are the whole minutes if enabled and 0."""
+        if not self._timer.running or self._in_interval:
+            return None, None
+        horizon = min(self._timer.remaining_ms(at) - lead_ms, self._siren_mark)
+        if self.siren_every_minute:
+            step = math.ceil(horizon / 60000.0 - 1e-9) * 60000.0
+            due = max(0.0, step)
+            upcoming = step - 60000.0 if step > 0 else None
+        else:
+            due, upcoming = (0.0, None) if horizon <= 0 else (None, 0.0)
+        if due is not None and due >= self._siren_mark:
+            due = None
+        return due, upcoming
+
+    def announce_siren(self, at: float, lead_ms: float) -> Optional[float]:
+        """Monotonic play time of a siren to announce now, marking it announced."""
+        due, _ = self._siren_targets(at, lead_ms)
+        if due is None:
+            return None
+        self._siren_mark = due
+        return self._timer.time_at(due)
+
+    def next_siren_announce(self, at: float, lead_ms: float) -> Optional[float]:
+        """Monotonic time at which the next siren is to be announced (``at`` if one is overdue)."""
+        due, upcoming = self._siren_targets(at, lead_ms)
+        if due is not None:
+            return at
+        return None if upcoming is None else self._timer.time_at(upcoming + lead_ms)
+
+    def to_record(self) -> dict:
+        """Everything needed to rebuild this state in a new process (see restore_game_state)."""
+        return {
+            **self.model_dump(exclude={'penalties'}),
+            "timer": _clock_record(self._timer),
+            "timeout": _clock_record(self._timeout),
+            "inInterval": self._in_interval,
+            "penalties": [p.to_record() for p in self.penalties],
+        }
+
+    @classmethod
+    def from_record(cls, record: dict, at: float | None = None) -> "GameState":
+        t = game_clock.now() if at is None else at
+        fields = {k: v for k, v in record.items() if k in cls.model_fields and k != 'penalties'}
+        gs = cls(**fields)
+        gs._in_interval = bool(record.get("inInterval", False))
+        _restore_clock(gs._timer, record.get("timer") or {}, t)
+        _restore_clock(gs._timeout, record.get("timeout") or {}, t)
+        gs._siren_mark = gs._timer.remaining_ms(t)
+        gs.penalties = [Penalty.from_record(p, t) for p in record.get("penalties") or []]
+        gs._rebuild_penalty_heap()
+        return gs
+
+    def clock_snapshot(self, at: float | None = None) -> dict:
+        """Live clocks with tenth-of-a-second precision."""
+        t = game_clock.now() if at is None else at
+        return {
+            "timerRunning": self._timer.running,
+            "timerTenths": self._timer.tenths(t),
+            "inInterval": self._in_interval,
+            "timeoutTenths": self._timeout.tenths(t),
+            "penalties": [{"id": p.id, "tenths": p._clock.tenths(t)} for p in self.penalties],
+        }
+
+# ---- Game event log (services.game_events) ----
+# Every command on a game is an event: applied to its GameState by _apply_game_event and
+# appended to the game's current log, which can rebuild the state, undo and redo.
+_GAME_UNDOABLE = {'score', 'shots', 'config', 'timerSet', 'timerReset', 'periodNext', 'periodSet', 'penaltyAdd', 'penaltyRemove'}
+
+def _apply_game_event(gs: GameState, kind: str, data: dict, at: float) -> None:
+    """Apply one event at monotonic time ``at`` (live commands and rebuilds alike)."""
+    if kind == 'setup':
+        for field, value in data.items():
+            setattr(gs, field, value)
+        gs.period_index = 1
+        gs.score_home = gs.score_away = 0
+        gs.stop_timer(at)
+        gs.set_in_interval(False, at)
+        gs.set_timer_ms(gs.period_duration_seconds * 1000.0, at)
+        gs.penalties = []
+    elif kind == 'config':
+        for field, value in data['changes'].items():
+            setattr(gs, field, value)
+    elif kind in ('score', 'shots'):
+        field = f"{kind}_{data['team']}"
+        setattr(gs, field, getattr(gs, field) + data['delta'])
+    elif kind == 'timerStart':
+        gs.start_timer(at)
+    elif kind == 'timerStop':
+        gs.stop_timer(at)
+    elif kind in ('timerSet', 'timerReset'):
+        if data.get('running') is False:
+            gs.stop_timer(at)
+        if 'inInterval' in data:
+            gs.set_in_interval(data['inInterval'], at)
+        gs.set_timer_ms(data['ms'], at)
+        if data.get('running'):
+            gs.start_timer(at)
+    elif kind == 'intervalStart':
+        gs.set_in_interval(True, at)
+        if data.get('ms') is not None:
+            gs.set_timer_ms(data['ms'], at)
+        gs.start_timer(at)
+    elif kind in ('periodNext', 'periodSet'):
+        gs.period_index = data['period']
+        gs.stop_timer(at)
+        gs.set_in_interval(data['inInterval'], at)
+        gs.set_timer_ms(data['ms'], at)
+    elif kind == 'periodEnd':
+        # end of period → interval (stopped, ready to start)
+        gs.stop_timer(at)
+        gs.set_in_interval(True, at)
+        gs.set_timer_ms(gs.interval_duration_seconds * 1000.0, at)
+    elif kind == 'intervalEnd':
+        # stays at 0, the controller advances the period
+        gs.stop_timer(at)
+        gs.set_timer_ms(0, at)
+    elif kind == 'timeoutStart':
+        gs.set_timeout(data['seconds'], at)
+    elif kind in ('timeoutStop', 'timeoutEnd'):
+        gs.set_timeout(0, at)
+    elif kind == 'siren':
+        gs.siren_on = bool(data['on'])
+    elif kind == 'obs':
+        gs.obs_visible = bool(data['visible'])
+    elif kind == 'penaltyAdd':
+        pen = Penalty(id=data['id'], team=data['team'], player_number=data['player_number'], remaining=data['ms'] / 1000.0)
+        gs.add_penalty(pen, at, align=data.get('align', True))
+    elif kind == 'penaltyRemove':
+        gs.remove_penalties({data['id']}, at)
+    elif kind == 'penaltyExpired':
+        gs.remove_penalties(set(data['ids']), at)
+    else:
+        raise ValueError(f'unknown game event {kind!r}')
+
+def _inverse_game_event(gs: GameState, event: dict, at: float) -> tuple[str, dict]:
+    """The event that reverts ``event`` given the current state (undo, and redo of an undo).
+
+    Clock edits are reverted relative to the time run since, not to the old reading.
+    """
+    kind, data = event['type'], event['data']
+    if kind in ('score', 'shots'):
+        return kind, {"team": data['team'], "delta": -data['delta']}
+    if kind == 'config':
+        return 'config', {"changes": data['before'], "before": data['changes']}
+    if kind in ('timerSet', 'timerReset'):
+        current = gs.timer.remaining_ms(at)
+        inverse = {"ms": max(0.0, current + data['before'] - data['ms']), "before": current}
+        if 'beforeInInterval' in data:
+            inverse.update(inInterval=data['beforeInInterval'], beforeInInterval=gs.in_interval)
+        return 'timerSet', inverse
+    if kind in ('periodNext', 'periodSet'):
+        current = {"period": gs.period_index, "ms": gs.timer.remaining_ms(at), "inInterval": gs.in_interval}
+        return 'periodSet', {**data['before'], "before": current}
+    if kind == 'penaltyAdd':
+        pen = next((p for p in gs.penalties if p.id == data['id']), None)
+        ms = pen._clock.remaining_ms(at) if pen is not None else 0.0
+        return 'penaltyRemove', {"id": data['id'], "team": data['team'], "player_number": data['player_number'], "ms": ms}
+    if kind == 'penaltyRemove':
+        return 'penaltyAdd', {"id": data['id'], "team": data['team'], "player_number": data['player_number'], "ms": data['ms'], "align": False}
+    raise ValueError(f'game event {kind!r} cannot be reverted')
+
+def _new_game_log(state: GameState) -> GameEventLog:
+    # a log starts from a snapshot of the state it was opened on
+    log_id = uuid.uuid4().hex[:12]
+    log = GameEventLog(log_id, settings.game_events_path / f"{log_id}.jsonl", settings.game_event_snapshot_every)
+    log.snapshot(state.to_record(), game_clock.server_ms())
+    return log
+
+def _rebuild_game_state(log: GameEventLog, upto: int | None = None) -> GameState:
+    """Fold the log from its newest snapshot (up to event ``upto``)."""
+    seq, at_ms, record = log.base(upto)
+    gs = GameState.from_record(record, game_clock.from_server_ms(at_ms))
+    for event in log.since(seq, upto):
+        _apply_game_event(gs, event['type'], event['data'], game_clock.from_server_ms(event['at']))
+    return gs
+
+def _snapshot_state(gs: GameState) -> dict:
+    # running clocks travel as "ends at server time T" (clients sync with the timeSync probe
+    # and count down locally); *Remaining are the values at the time of the snapshot
     return {
-        "homeName": game_state.home_name,
-        "awayName": game_state.away_name,
-        "colorHome": game_state.color_home,
-        "colorAway": game_state.color_away,
-        "scoreHome": game_state.score_home,
-        "scoreAway": game_state.score_away,
-        "shotsHome": game_state.shots_home,
-        "shotsAway": game_state.shots_away,
-        "period": game_state.period_label(),
-        "periodIndex": game_state.period_index,
-        "timerRunning": game_state.timer_running,
-        "timerRemaining": game_state.timer_remaining,
-    "inInterval": game_state.in_interval,
-        "periodDuration": game_state.period_duration_seconds,
-        "intervalDuration": game_state.interval_duration_seconds,
-        "timeoutRemaining": game_state.timeout_remaining,
-        "sirenOn": game_state.siren_on,
-        "sirenEveryMinute": game_state.siren_every_minute,
-        "obsVisible": game_state.obs_visible,
-        "penalties": [p.model_dump() for p in game_state.penalties],
+        "homeName": gs.home_name,
+        "awayName": gs.away_name,
+        "colorHome": gs.color_home,
+        "colorAway": gs.color_away,
+        "scoreHome": gs.score_home,
+        "scoreAway": gs.score_away,
+        "shotsHome": gs.shots_home,
+        "shotsAway": gs.shots_away,
+        "period": gs.period_label(),
+        "periodIndex": gs.period_index,
+        "timerRunning": gs.timer_running,
+        "timerRemaining": gs.timer_remaining,
+        "timerEndsAt": _ends_at(gs.timer),
+        "inInterval": gs.in_interval,
+        "periodDuration": gs.period_duration_seconds,
+        "intervalDuration": gs.interval_duration_seconds,
+        "timeoutRemaining": gs.timeout_remaining,
+        "timeoutEndsAt": _ends_at(gs.timeout),
+        "sirenOn": gs.siren_on,
+        "sirenEveryMinute": gs.siren_every_minute,
+        "obsVisible": gs.obs_visible,
+        "penalties": [p.snapshot() for p in gs.penalties],
     }
 
+# ---- Game registry ----
+# Each rink runs its own game; the legacy /game/* routes and the 'game' room address the
+# default one
+DEFAULT_GAME_ID = 'main'
+_GAME_ID_RE = re.compile(r'^[a-z0-9][a-z0-9_-]{0,31}$')
+
+class Game:
+    """One game: its state, lock, event log and versioned delta stream (services.state_sync),
+    broadcast on room ``game:{id}``."""
+
+    def __init__(self, game_id: str, state: GameState | None = None, log: GameEventLog | None = None) -> None:
+        self.id = game_id
+        self.room = f"game:{game_id}"
+        self.state = state if state is not None else GameState()
+        self.lock = asyncio.Lock()
+        self.penalty_seq = 1
+        self.sync = VersionedState(keyframe_every=30)
+        self.log = log if log is not None else _new_game_log(self.state)
+
+    def synced(self) -> VersionedState:
+        # before the first broadcast there is nothing recorded yet
+        if self.sync.version == 0:
+            self.sync.update(_snapshot_state(self.state))
+        return self.sync
+
+    def keyframe(self) -> Frame:
+        return self.synced().keyframe()
+
+    def record(self) -> dict:
+        return {"state": self.state.to_record(), "penaltySeq": self.penalty_seq, "version": self.sync.version,
+                "logId": self.log.game_id, "eventSeq": self.log.seq}
+
+# ---- Game timers (services.game_timers) ----
+# One deadline per game in a heap: the earliest of its clocks' deadlines and its next siren
+# announcement, recomputed in O(log n) whenever the game changes
+_game_timers = DeadlineQueue()
+
+def _game_due(game: Game, now: float) -> Optional[float]:
+    """Monotonic time of the game's next clock deadline or siren announcement (None: idle)."""
+    gs = game.state
+    candidates = (gs.timer.deadline(), gs.timeout.deadline(),
+                  gs.next_siren_announce(now, settings.game_siren_lead_ms), gs.next_penalty_expiry())
+    return min((c for c in candidates if c is not None), default=None)
+
+def _reschedule_game(game: Game, now: float | None = None) -> None:
+    _game_timers.schedule(game.id, _game_due(game, game_clock.now() if now is None else now))
+
+class GameRegistry:
+    """Games by id; the default game always exists."""
+
+    def __init__(self) -> None:
+        self._games: Dict[str, Game] = {}
+        self.add(Game(DEFAULT_GAME_ID))
+
+    def get(self, game_id: str) -> Game | None:
+        return self._games.get(game_id)
+
+    def __getitem__(self, game_id: str) -> Game:
+        return self._games[game_id]
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+    @property
+    def default(self) -> Game:
+        return self._games[DEFAULT_GAME_ID]
+
+    def values(self) -> list[Game]:
+        # a copy: games may be added or removed while a caller awaits
+        return list(self._games.values())
+
+    def add(self, game: Game) -> Game:
+        self._games[game.id] = game
+        # sockets joining the room get the current keyframe straight away (no GET state needed);
+        # looked up at join time so a replaced game is never served stale
+        ws_manager.retain(game.room, 'state', lambda game_id=game.id: _game_keyframe(game_id))
+        _reschedule_game(game)
+        return game
+
+    def remove(self, game_id: str) -> Game | None:
+        game = self._games.pop(game_id, None)
+        if game is not None:
+            ws_manager.clear_retained(game.room)
+            _game_timers.cancel(game_id)
+        return game
+
+    def of_room(self, room: str) -> Game | None:
+        return self._games.get(room[5:]) if room.startswith('game:') else None
+
+games = GameRegistry()
+
+def _game_keyframe(game_id: str) -> Frame | None:
+    game = games.get(game_id)
+    return game.keyframe() if game is not None else None
+
+def _game(game_id: str, create: bool = False) -> Game:
+    """The game ``game_id`` (404 if unknown); with ``create`` a new game is registered."""
+    game = games.get(game_id)
+    if game is not None:
+        return game
+    if not create:
+        raise HTTPException(status_code=404, detail="Partita non trovata")
+    if not _GAME_ID_RE.match(game_id):
+        raise HTTPException(status_code=400, detail="Id partita non valido (minuscole, cifre, - e _)")
+    if len(games) >= settings.game_max_games:
+        raise HTTPException(status_code=409, detail="Numero massimo di partite raggiunto")
+    return games.add(Game(game_id))
+
+# every log is appended to disk by the game state store's writer, before each snapshot
+game_store.add_flusher(lambda: [game.log.flush() for game in games.values()])
+
+def _record_game_event(game: Game, kind: str, data: dict, at_ms: int | None = None,
+                       undoes: int | None = None, redoes: int | None = None) -> dict:
+    """Apply an event to the game's state and log it (caller holds game.lock and broadcasts)."""
+    at_ms = game_clock.server_ms() if at_ms is None else at_ms
+    # applied at the logged (whole ms) time, so a rebuild from the log is exact
+    at = game_clock.from_server_ms(at_ms)
+    gs, log = game.state, game.log
+    period = gs.period_index
+    _apply_game_event(gs, kind, data, at)
+    reverting = undoes is not None or redoes is not None
+    event = log.append(kind, data, at_ms, period, undoable=kind in _GAME_UNDOABLE and not reverting,
+                       undoes=undoes, redoes=redoes)
+    if log.due_snapshot():
+        log.snapshot(gs.to_record(), at_ms)
+    _reschedule_game(game)
+    return event
+
+async def _game_command(game: Game, kind: str, **data) -> dict:
+    event = _record_game_event(game, kind, data)
+    await _broadcast_state(game)
+    return event
+
+async def _game_commands(game: Game, events: list[tuple[str, dict]], at_ms: int | None = None) -> list[dict]:
+    """Record ``events`` (possibly none) and broadcast the result once (caller holds game.lock)."""
+    recorded = [_record_game_event(game, kind, data, at_ms) for kind, data in events]
+    await _broadcast_state(game)
+    return recorded
+
+def _games_record() -> dict:
+    return {"games": {game.id: game.record() for game in games.values()}}
+
+async def _broadcast_state(game: Game) -> None:
+    # only changed fields go out; encoded once and shared by every socket in the room
+    frame = game.sync.update(_snapshot_state(game.state))
+    # write-behind: the store debounces and writes off the event loop, never per click
+    game_store.save(_games_record())
+    if frame is not None:
+        # versions, keyframes and retained state are this process's: never on the bus
+        await ws_manager.broadcast(game.room, frame, local=True)
+
+def _restore_game(game_id: str, record: dict) -> Game:
+    log = None
+    log_id = record.get("logId") or record.get("gameId")  # gameId: single-game snapshots
+    if log_id:
+        log = GameEventLog.load(log_id, settings.game_events_path / f"{log_id}.jsonl", settings.game_event_snapshot_every)
+    if log is not None and log.seq > int(record.get("eventSeq", 0)):
+        state = _rebuild_game_state(log)
+    else:
+        state = GameState.from_record(record["state"])
+    game = Game(game_id, state, log)
+    game.penalty_seq = max(1, int(record.get("penaltySeq", 1)))
+    # versions continue where the old process stopped; the first one is a full keyframe
+    game.sync.resume(int(record.get("version", 0)))
+    game.sync.update(_snapshot_state(state))
+    return game
+
+def restore_game_state() -> bool:
+    """Reload the games from the last snapshot (startup); running clocks resume from their
+    stored deadlines. Returns whether a snapshot was restored.
+
+    Each game's event log comes back with it; if the log got further than the snapshot
+    (crash between the two writes) the state is rebuilt from the log instead.
+    """
+    document = game_store.load()
+    if not document:
+        return False
+    # snapshots from before the registry hold the default game only
+    records = document.get("games") if "games" in document else {DEFAULT_GAME_ID: document}
+    restored = 0
+    for game_id, record in (records or {}).items():
+        if not isinstance(record, dict) or not isinstance(record.get("state"), dict):
+            continue
+        try:
+            games.add(_restore_game(game_id, record))
+            restored += 1
+        except Exception:
+            logger.exception("Game %s could not be restored from its snapshot; starting from defaults", game_id)
+    return restored > 0
+
 class GameSetupRequest(BaseModel):
     home_name: str
     away_name: str
@@ -1812,32 +2625,46 @@ def _parse_mmss(v: str) -> int:
     except Exception:
         raise HTTPException(status_code=400, detail="Formato durata non valido (usa MM:SS)")
 
-@router.post("/game/setup")
-async def game_setup(data: GameSetupRequest, _: User = Depends(require_permission('game.control'))):
-    global game_state
-    async with game_lock:
-        secs = _parse_mmss(data.period_duration)
-        game_state.home_name = data.home_name
-        game_state.away_name = data.away_name
-        game_state.period_duration_seconds = secs
-        if data.interval_duration:
-            game_state.interval_duration_seconds = _parse_mmss(data.interval_duration)
-        if data.color_home:
-            game_state.color_home = data.color_home
-        if data.color_away:
-            game_state.color_away = data.color_away
-        if data.siren_every_minute is not None:
-            game_state.siren_every_minute = bool(data.siren_every_minute)
-        game_state.period_index = 1
-        game_state.score_home = 0
-        game_state.score_away = 0
-        game_state.timer_running = False
-        game_state.in_interval = False
-        game_state.timer_remaining = secs
-        game_state.penalties = []
-        await ws_manager.broadcast('game', {"type": "state", "payload": _snapshot_state()})
+# Game routes exist twice: /games/{game_id}/... and the legacy /game/... (the default game,
+# or ?game_id=)
+@router.get("/games")
+def games_list():
+    """Games currently registered (public, so displays can pick their rink)."""
+    return [{"id": g.id, "room": g.room, "homeName": g.state.home_name, "awayName": g.state.away_name,
+             "timerRunning": g.state.timer_running} for g in games.values()]
+
+@router.delete("/games/{game_id}")
+async def games_remove(game_id: str, _: User = Depends(require_permission('game.control'))):
+    if game_id == DEFAULT_GAME_ID:
+        raise HTTPException(status_code=400, detail="La partita principale non può essere rimossa")
+    game = _game(game_id)
+    async with game.lock:
+        games.remove(game_id)
+        game_store.save(_games_record())
     return {"ok": True}
 
+@router.post("/game/setup")
+@router.post("/games/{game_id}/setup")
+async def game_setup(data: GameSetupRequest, _: User = Depends(require_permission('game.control')),
+                     game_id: str = DEFAULT_GAME_ID):
+    """Start a new game; on an unknown ``game_id`` the game is created."""
+    game = _game(game_id, create=True)
+    async with game.lock:
+        gs = game.state
+        fields = {
+            "home_name": data.home_name,
+            "away_name": data.away_name,
+            "period_duration_seconds": _parse_mmss(data.period_duration),
+            "interval_duration_seconds": _parse_mmss(data.interval_duration) if data.interval_duration else gs.interval_duration_seconds,
+            "color_home": data.color_home or gs.color_home,
+            "color_away": data.color_away or gs.color_away,
+            "siren_every_minute": bool(data.siren_every_minute) if data.siren_every_minute is not None else gs.siren_every_minute,
+        }
+        # a new game gets its own event log
+        game.log = _new_game_log(gs)
+        await _game_command(game, 'setup', **fields)
+    return {"ok": True, "gameId": game.id}
+
 class GameConfigPatch(BaseModel):
     home_name: str | None = None
     away_name: str | None = None
@@ -1847,24 +2674,26 @@ class GameConfigPatch(BaseModel):
     interval_duration: str | None = None
     siren_every_minute: bool | None = None
 
+# Game operations: each turns a request into the events to record, given the state it applies
+# to (the live one, or the scratch copy a batch is checked on, see _plan_game_ops)
+def _op_config(game: Game, gs: GameState, data: GameConfigPatch, at: float) -> list[tuple[str, dict]]:
+    changes = {k: v for k, v in (("home_name", data.home_name), ("away_name", data.away_name),
+                                 ("color_home", data.color_home), ("color_away", data.color_away)) if v is not None}
+    if data.period_duration is not None:
+        changes["period_duration_seconds"] = _parse_mmss(data.period_duration)
+    if data.interval_duration is not None:
+        changes["interval_duration_seconds"] = _parse_mmss(data.interval_duration)
+    if data.siren_every_minute is not None:
+        changes["siren_every_minute"] = bool(data.siren_every_minute)
+    return [('config', {"changes": changes, "before": {k: getattr(gs, k) for k in changes}})] if changes else []
+
 @router.patch("/game/config")
-async def game_config_patch(data: GameConfigPatch, _: User = Depends(require_permission('game.control'))):
-    async with game_lock:
-        if data.home_name is not None:
-            game_state.home_name = data.home_name
-        if data.away_name is not None:
-            game_state.away_name = data.away_name
-        if data.color_home is not None:
-            game_state.color_home = data.color_home
-        if data.color_away is not None:
-            game_state.color_away = data.color_away
-        if data.period_duration is not None:
-            game_state.period_duration_seconds = _parse_mmss(data.period_duration)
-        if data.interval_duration is not None:
-            game_state.interval_duration_seconds = _parse_mmss(data.interval_duration)
-        if data.siren_every_minute is not None:
-            game_state.siren_every_minute = bool(data.siren_every_minute)
-        await ws_manager.broadcast('game', {"type":"state","payload": _snapshot_state()})
+@router.patch("/games/{game_id}/config")
+async def game_config_patch(data: GameConfigPatch, _: User = Depends(require_permission('game.control')),
+                            game_id: str = DEFAULT_GAME_ID):
+    game = _game(game_id)
+    async with game.lock:
+        await _game_commands(game, _op_config(game, game.state, data, game_clock.now()))
     return {"ok": True}
 
 # Admin: Ticket Categories CRUD
@@ -1895,7 +2724,7 @@ def categories_public_list(db: Session = Depends(get_db), _: User = Depends(get_
 def categories_create(data: CategoryIn, db: Session = Depends(get_db), current: User = Depends(require_admin)):
     c = TicketCategory(name=data.name, color=data.color, sort_order=data.sort_order or 0)
     db.add(c); db.commit(); db.refresh(c)
-    db.add(AuditLog(user_id=current.id, action='ticket.category.create', details=c.name)); db.commit()
+    audit_writer.log(current.id, 'ticket.category.create', c.name)
     return CategoryOut.model_validate(c)
 
 @router.patch('/admin/tickets/categories/{cat_id}', response_model=CategoryOut)
@@ -1906,14 +2735,14 @@ def categories_update(cat_id: int, data: CategoryIn, db: Session = Depends(get_d
     if data.color is not None: c.color = data.color
     if data.sort_order is not None: c.sort_order = data.sort_order
     db.commit(); db.refresh(c)
-    db.add(AuditLog(user_id=current.id, action='ticket.category.update', details=c.name)); db.commit()
+    audit_writer.log(current.id, 'ticket.category.update', c.name)
     return CategoryOut.model_validate(c)
 
 @router.delete('/admin/tickets/categories/{cat_id}')
 def categories_delete(cat_id: int, db: Session = Depends(get_db), current: User = Depends(require_admin)):
     c = db.query(TicketCategory).get(cat_id)
     if not c: return {"ok": True}
-    db.delete(c); db.commit(); db.add(AuditLog(user_id=current.id, action='ticket.category.delete', details=str(cat_id))); db.commit()
+    db.delete(c); db.commit(); audit_writer.log(current.id, 'ticket.category.delete', str(cat_id))
     return {"ok": True}
 
 # Admin: Backup list & download
@@ -1956,15 +2785,11 @@ async def backup_scheduler():
     import subprocess
     while True:
         try:
-            db = SessionLocal()
-            # read settings
-            def get(key: str, default: str | None = None) -> str | None:
-                row = db.query(AppSetting).filter(AppSetting.key == key).first()
-                return row.value if row else default
-            enabled = (get('backup.enabled', 'false') or 'false').lower() in ('1','true','yes','on')
-            hours = int(get('backup.interval_hours', '24') or '24')
-            retention_days = int(get('backup.retention_days', '14') or '14')
-            retention_count = int(get('backup.retention_count', '10') or '10')
+            # read settings (cached; no DB session held across the sleep)
+            enabled = settings_cache.get_bool('backup.enabled', False)
+            hours = settings_cache.get_int('backup.interval_hours', 24)
+            retention_days = settings_cache.get_int('backup.retention_days', 14)
+            retention_count = settings_cache.get_int('backup.retention_count', 10)
             if not enabled:
                 # sleep a bit and re-check later
                 await asyncio.sleep(300)
@@ -2009,6 +2834,19 @@ async def backup_scheduler():
             # never crash
             await asyncio.sleep(300)
 
+# Audit log maintenance: keep monthly partitions created ahead of time and move
+# rows past the retention window into the cold archive
+async def audit_maintenance_scheduler():
+    """Background task that runs daily audit log housekeeping (partitions, retention)."""
+    from ...db.session import engine
+    while True:
+        try:
+            await asyncio.to_thread(ensure_audit_partitions, engine)
+            await asyncio.to_thread(audit_archive.archive_before, audit_hot_cutoff())
+        except Exception as e:
+            logger.error(f"Error in audit_maintenance_scheduler: {e}", exc_info=True)
+        await asyncio.sleep(24*3600)
+
 # Admin: Scoreboard logos upload
 @router.post('/admin/scoreboard/logo/{side}')
 def scoreboard_logo_upload(side: str, file: UploadFile = File(...), db: Session = Depends(get_db), current: User = Depends(require_admin)):
@@ -2022,26 +2860,23 @@ def scoreboard_logo_upload(side: str, file: UploadFile = File(...), db: Session
     with open(dest, 'wb') as fh:
         shutil.copyfileobj(file.file, fh)
     key = f'scoreboard.{side}_logo_path'
-    row = db.query(AppSetting).filter(AppSetting.key == key).first()
-    if row: row.value = dest
-    else: db.add(AppSetting(key=key, value=dest))
-    db.add(AuditLog(user_id=current.id, action='scoreboard.logo.upload', details=key))
+    settings_cache.put(db, key, dest)
     db.commit()
+    audit_writer.log(current.id, 'scoreboard.logo.upload', key)
     return {"ok": True, "path": dest}
 
 @router.get('/admin/scoreboard/logo/{side}')
 def scoreboard_logo_get(side: str, db: Session = Depends(get_db), _: User = Depends(require_admin)):
     if side not in ('home','away'):
         raise HTTPException(status_code=400, detail='Side non valido')
-    key = f'scoreboard.{side}_logo_path'
-    row = db.query(AppSetting).filter(AppSetting.key == key).first()
-    if not row or not row.value or not os.path.exists(row.value):
+    path = _get_setting_value(db, f'scoreboard.{side}_logo_path')
+    if not path or not os.path.exists(path):
         raise HTTPException(status_code=404, detail='Logo non trovato')
     # try to guess media type from extension
-    ext = os.path.splitext(row.value)[1].lower()
+    ext = os.path.splitext(path)[1].lower()
     mt = 'image/png' if ext in ('.png','.apng') else 'image/jpeg' if ext in ('.jpg','.jpeg') else 'application/octet-stream'
-    name = os.path.basename(row.value)
-    return FileResponse(row.value, media_type=mt, filename=name)
+    name = os.path.basename(path)
+    return FileResponse(path, media_type=mt, filename=name)
 
 # Admin: Scoreboard siren audio upload and public fetch
 @router.post('/admin/scoreboard/siren')
@@ -2057,11 +2892,10 @@ def scoreboard_siren_upload(file: UploadFile = File(...), db: Session = Depends(
     with open(dest, 'wb') as fh:
         shutil.copyfileobj(file.file, fh)
     key = 'scoreboard.siren_path'
-    row = db.query(AppSetting).filter(AppSetting.key == key).first()
-    if row: row.value = dest
-    else: db.add(AppSetting(key=key, value=dest))
-    db.add(AuditLog(user_id=current.id, action='scoreboard.siren.upload', details=name))
-    db.commit(); return {"ok": True, "path": dest}
+    settings_cache.put(db, key, dest)
+    db.commit()
+    audit_writer.log(current.id, 'scoreboard.siren.upload', name)
+    return {"ok": True, "path": dest}
 
 @router.get('/scoreboard/siren')
 def scoreboard_siren_get(db: Session = Depends(get_db)):
@@ -2080,17 +2914,16 @@ def scoreboard_siren_get(db: Session = Depends(get_db)):
     except Exception:
         pass
     # 2) Admin-uploaded siren path from settings
-    key = 'scoreboard.siren_path'
-    row = db.query(AppSetting).filter(AppSetting.key == key).first()
-    if row and row.value and os.path.exists(row.value):
-        ext = os.path.splitext(row.value)[1].lower()
+    uploaded = _get_setting_value(db, 'scoreboard.siren_path')
+    if uploaded and os.path.exists(uploaded):
+        ext = os.path.splitext(uploaded)[1].lower()
         mt = 'audio/mpeg' if ext == '.mp3' else 'audio/wav' if ext == '.wav' else 'audio/ogg' if ext == '.ogg' else 'application/octet-stream'
-        name = os.path.basename(row.value)
+        name = os.path.basename(uploaded)
         try:
-            logger.info(f"Serving scoreboard siren from uploaded path: {row.value}")
+            logger.info(f"Serving scoreboard siren from uploaded path: {uploaded}")
         except Exception:
             pass
-        return FileResponse(row.value, media_type=mt, filename=name, headers={'Cache-Control': 'public, max-age=86400', 'X-Siren-Source': 'uploaded'})
+        return FileResponse(uploaded, media_type=mt, filename=name, headers={'Cache-Control': 'public, max-age=86400', 'X-Siren-Source': 'uploaded'})
     # 3) Generated built-in siren as last resort
     data = siren_wav_bytes()
     try:
@@ -2112,10 +2945,9 @@ def scoreboard_siren_info(db: Session = Depends(get_db), _: User = Depends(get_c
                 return {'source': 'static', 'path': p, 'size': os.path.getsize(p)}
     except Exception:
         pass
-    key = 'scoreboard.siren_path'
-    row = db.query(AppSetting).filter(AppSetting.key == key).first()
-    if row and getattr(row,'value',None) and os.path.exists(row.value):
-        return {'source': 'uploaded', 'path': row.value, 'size': os.path.getsize(row.value)}
+    uploaded = _get_setting_value(db, 'scoreboard.siren_path')
+    if uploaded and os.path.exists(uploaded):
+        return {'source': 'uploaded', 'path': uploaded, 'size': os.path.getsize(uploaded)}
     # fallback generated
     data = siren_wav_bytes()
     return {'source': 'generated', 'path': None, 'size': len(data)}
@@ -2129,35 +2961,25 @@ class ObsSceneMapping(BaseModel):
 
 @router.get('/admin/obs/mapping')
 def obs_mapping_get(db: Session = Depends(get_db), _: User = Depends(require_admin)):
-    row = db.query(AppSetting).filter(AppSetting.key == 'obs.mapping').first()
-    if not row or not row.value:
-        return {'activate_scene': None, 'deactivate_scene': None}
-    import json
-    try:
-        val = json.loads(row.value)
-        return {'activate_scene': val.get('activate_scene'), 'deactivate_scene': val.get('deactivate_scene')}
-    except Exception:
+    val = settings_cache.get_json('obs.mapping', None, db)
+    if not isinstance(val, dict):
         return {'activate_scene': None, 'deactivate_scene': None}
+    return {'activate_scene': val.get('activate_scene'), 'deactivate_scene': val.get('deactivate_scene')}
 
 
 @router.put('/admin/obs/mapping')
 def obs_mapping_set(data: ObsSceneMapping, db: Session = Depends(get_db), current: User = Depends(require_admin)):
     import json
-    row = db.query(AppSetting).filter(AppSetting.key == 'obs.mapping').first()
     payload = json.dumps({'activate_scene': data.activate_scene, 'deactivate_scene': data.deactivate_scene})
-    if row:
-        row.value = payload
-    else:
-        db.add(AppSetting(key='obs.mapping', value=payload))
-    db.add(AuditLog(user_id=current.id, action='obs.mapping.update', details=payload))
+    settings_cache.put(db, 'obs.mapping', payload)
     db.commit()
+    audit_writer.log(current.id, 'obs.mapping.update', payload)
     return {'ok': True}
 
 # Admin: DALI mapping settings (JSON)
 @router.get('/admin/dali/mapping')
 def dali_mapping_get(db: Session = Depends(get_db), _: User = Depends(require_admin)):
-    row = db.query(AppSetting).filter(AppSetting.key == 'dali.mapping').first()
-    return {"mapping": row.value if row else '[]'}
+    return {"mapping": _get_setting_value(db, 'dali.mapping', '[]')}
 
 @router.put('/admin/dali/mapping')
 def dali_mapping_set(payload: dict, db: Session = Depends(get_db), current: User = Depends(require_admin)):
@@ -2168,11 +2990,10 @@ def dali_mapping_set(payload: dict, db: Session = Depends(get_db), current: User
         value = json.dumps(raw)
     else:
         value = str(raw or '[]')
-    row = db.query(AppSetting).filter(AppSetting.key == 'dali.mapping').first()
-    if row: row.value = value
-    else: db.add(AppSetting(key='dali.mapping', value=value))
-    db.add(AuditLog(user_id=current.id, action='dali.mapping.update', details=None))
-    db.commit(); return {"ok": True}
+    settings_cache.put(db, 'dali.mapping', value)
+    db.commit()
+    audit_writer.log(current.id, 'dali.mapping.update', None)
+    return {"ok": True}
 
 # ===================== DALI (Lighting) =====================
 
@@ -2201,40 +3022,87 @@ def dali_recall_scene(scene_id: int, _: User = Depends(require_admin)):
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/game/state")
-def game_get_state():
-    """Get current game state (public endpoint for scoreboard display)"""
-    return _snapshot_state()
+@router.get("/games/{game_id}/state")
+async def game_get_state(request: Request, after: int | None = None, timeout: float = Query(25.0, ge=0, le=60),
+                         game_id: str = DEFAULT_GAME_ID):
+    """Get current game state (public endpoint for scoreboard display).
+
+    ``version`` is the last version broadcast on the game's room; WS deltas apply on top.
+    The body is the state as last broadcast, encoded once per version, and its ``ETag``
+    is that version: ``If-None-Match`` with the current one gets 304 and no body.
+
+    With ``after=<version>`` this is a long-poll for displays without WebSockets: it
+    answers as soon as the version is newer than ``after`` (at once if it already is),
+    or with 204 after ``timeout`` seconds without changes.
+    """
+    game = _game(game_id)
+    sync = game.synced()
+    if after is not None and sync.version <= after:
+        # woken by the same broadcasts that reach the game's sockets
+        with ws_manager.listen(game.room, replay=False) as listener:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            while sync.version <= after:
+                remaining = deadline - loop.time()
+                if remaining <= 0 or await listener.get(remaining) is None:
+                    return Response(status_code=204)
+    # clients and proxies may keep the body but must revalidate it every time
+    headers = {"ETag": sync.etag(), "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(sync.current_json(), media_type="application/json", headers=headers)
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    # weak comparison, as RFC 9110 asks for If-None-Match
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+@router.get("/game/clock")
+@router.get("/games/{game_id}/clock")
+def game_get_clock(game_id: str = DEFAULT_GAME_ID):
+    """Live game, timeout and penalty clocks in tenths of a second, computed per request."""
+    return _game(game_id).state.clock_snapshot()
 
 class ScoreUpdate(BaseModel):
     team: str  # 'home'|'away'
     delta: int  # +1 or -1
 
-@router.post("/game/score")
-async def game_update_score(data: ScoreUpdate, _: User = Depends(require_permission('game.control'))):
-    async with game_lock:
-        if data.team not in ("home","away"):
-            raise HTTPException(status_code=400, detail="Team non valido")
-        if data.team == 'home':
-            game_state.score_home = max(0, game_state.score_home + data.delta)
-        else:
-            game_state.score_away = max(0, game_state.score_away + data.delta)
-        await ws_manager.broadcast('game', {"type": "state", "payload": _snapshot_state()})
-    return {"ok": True}
-
 class ShotsUpdate(BaseModel):
     team: str  # 'home'|'away'
     delta: int  # +1 or -1
 
+def _op_counter(kind: str, gs: GameState, data: ScoreUpdate | ShotsUpdate) -> list[tuple[str, dict]]:
+    if data.team not in ("home","away"):
+        raise HTTPException(status_code=400, detail="Team non valido")
+    # the applied change (never below 0) is what gets logged and undone
+    current = getattr(gs, f"{kind}_{data.team}")
+    delta = max(0, current + data.delta) - current
+    return [(kind, {"team": data.team, "delta": delta})] if delta else []
+
+def _op_score(game: Game, gs: GameState, data: ScoreUpdate, at: float) -> list[tuple[str, dict]]:
+    return _op_counter('score', gs, data)
+
+def _op_shots(game: Game, gs: GameState, data: ShotsUpdate, at: float) -> list[tuple[str, dict]]:
+    return _op_counter('shots', gs, data)
+
+@router.post("/game/score")
+@router.post("/games/{game_id}/score")
+async def game_update_score(data: ScoreUpdate, _: User = Depends(require_permission('game.control')),
+                            game_id: str = DEFAULT_GAME_ID):
+    game = _game(game_id)
+    async with game.lock:
+        await _game_commands(game, _op_score(game, game.state, data, game_clock.now()))
+    return {"ok": True}
+
 @router.post("/game/shots")
-async def game_update_shots(data: ShotsUpdate, _: User = Depends(require_permission('game.control'))):
-    async with game_lock:
-        if data.team not in ("home","away"):
-            raise HTTPException(status_code=400, detail="Team non valido")
-        if data.team == 'home':
-            game_state.shots_home = max(0, game_state.shots_home + data.delta)
-        else:
-            game_state.shots_away = max(0, game_state.shots_away + data.delta)
-        await ws_manager.broadcast('game', {"type": "state", "payload": _snapshot_state()})
+@router.post("/games/{game_id}/shots")
+async def game_update_shots(data: ShotsUpdate, _: User = Depends(require_permission('game.control')),
+                            game_id: str = DEFAULT_GAME_ID):
+    game = _game(game_id)
+    async with game.lock:
+        await _game_commands(game, _op_shots(game, game.state, data, game_clock.now()))
     return {"ok": True}
 
 # ===================== TICKET ATTACHMENTS =====================
@@ -2267,12 +3135,7 @@ def ticket_attachments_download(att_id: int, db: Session = Depends(get_db), _: U
 # ===================== LOCKER ROOM MONITORS =====================
 @router.get('/monitors/presets')
 def monitors_presets(db: Session = Depends(get_db), _: User = Depends(require_admin)):
-    row = db.query(AppSetting).filter(AppSetting.key == 'monitors.presets').first()
-    import json
-    try:
-        return {"items": json.loads(row.value) if row and row.value else []}
-    except Exception:
-        return {"items": []}
+    return {"items": settings_cache.get_json('monitors.presets', [], db)}
 
 @router.put('/monitors/presets')
 def monitors_presets_set(payload: dict, db: Session = Depends(get_db), _: User = Depends(require_admin)):
@@ -2282,9 +3145,7 @@ def monitors_presets_set(payload: dict, db: Session = Depends(get_db), _: User =
         raw = json.dumps(items or [])
     except Exception:
         raw = '[]'
-    row = db.query(AppSetting).filter(AppSetting.key == 'monitors.presets').first()
-    if row: row.value = raw
-    else: db.add(AppSetting(key='monitors.presets', value=raw))
+    settings_cache.put(db, 'monitors.presets', raw)
     db.commit(); return {"ok": True}
 
 @router.get('/monitors/{name}')
@@ -2323,95 +3184,134 @@ def monitors_clear_all(db: Session = Depends(get_db), _: User = Depends(require_
                 pass
     return {"ok": True}
 
+def _op_simple(kind: str, **data):
+    return lambda game, gs, req, at: [(kind, dict(data))]
+
+_op_timer_start = _op_simple('timerStart')
+_op_timer_stop = _op_simple('timerStop')
+_op_timeout_start = _op_simple('timeoutStart', seconds=30)
+_op_timeout_stop = _op_simple('timeoutStop')
+
 @router.post("/game/timer/start")
-async def game_timer_start(_: User = Depends(require_permission('game.control'))):
-    async with game_lock:
-        game_state.timer_running = True
-        await ws_manager.broadcast('game', {"type": "state", "payload": _snapshot_state()})
+@router.post("/games/{game_id}/timer/start")
+async def game_timer_start(_: User = Depends(require_permission('game.control')), game_id: str = DEFAULT_GAME_ID):
+    game = _game(game_id)
+    async with game.lock:
+        await _game_commands(game, _op_timer_start(game, game.state, None, game_clock.now()))
     return {"ok": True}
 
 @router.post("/game/timer/stop")
-async def game_timer_stop(_: User = Depends(require_permission('game.control'))):
-    async with game_lock:
-        game_state.timer_running = False
-        await ws_manager.broadcast('game', {"type": "state", "payload": _snapshot_state()})
+@router.post("/games/{game_id}/timer/stop")
+async def game_timer_stop(_: User = Depends(require_permission('game.control')), game_id: str = DEFAULT_GAME_ID):
+    game = _game(game_id)
+    async with game.lock:
+        await _game_commands(game, _op_timer_stop(game, game.state, None, game_clock.now()))
     return {"ok": True}
 
 @router.post("/game/timeout/start")
-async def game_timeout_start(_: User = Depends(require_permission('game.control'))):
-    async with game_lock:
-        game_state.timeout_remaining = 30
-        await ws_manager.broadcast('game', {"type":"state","payload": _snapshot_state()})
+@router.post("/games/{game_id}/timeout/start")
+async def game_timeout_start(_: User = Depends(require_permission('game.control')), game_id: str = DEFAULT_GAME_ID):
+    game = _game(game_id)
+    async with game.lock:
+        await _game_commands(game, _op_timeout_start(game, game.state, None, game_clock.now()))
     return {"ok": True}
 
 @router.post("/game/timeout/stop")
-async def game_timeout_stop(_: User = Depends(require_permission('game.control'))):
-    async with game_lock:
-        game_state.timeout_remaining = 0
-        await ws_manager.broadcast('game', {"type":"state","payload": _snapshot_state()})
+@router.post("/games/{game_id}/timeout/stop")
+async def game_timeout_stop(_: User = Depends(require_permission('game.control')), game_id: str = DEFAULT_GAME_ID):
+    game = _game(game_id)
+    async with game.lock:
+        await _game_commands(game, _op_timeout_stop(game, game.state, None, game_clock.now()))
     return {"ok": True}
 
 class SirenToggle(BaseModel):
     on: bool
 
+def _op_siren(game: Game, gs: GameState, data: SirenToggle, at: float) -> list[tuple[str, dict]]:
+    return [('siren', {"on": bool(data.on)})]
+
 @router.post("/game/siren")
-async def game_siren_set(data: SirenToggle, _: User = Depends(require_permission('game.control'))):
-    async with game_lock:
-        game_state.siren_on = bool(data.on)
-        await ws_manager.broadcast('game', {"type":"state","payload": _snapshot_state()})
+@router.post("/games/{game_id}/siren")
+async def game_siren_set(data: SirenToggle, _: User = Depends(require_permission('game.control')),
+                         game_id: str = DEFAULT_GAME_ID):
+    game = _game(game_id)
+    async with game.lock:
+        await _game_commands(game, _op_siren(game, game.state, data, game_clock.now()))
     return {"ok": True}
 
 class ObsToggle(BaseModel):
     visible: bool
 
+def _op_obs(game: Game, gs: GameState, data: ObsToggle, at: float) -> list[tuple[str, dict]]:
+    return [('obs', {"visible": bool(data.visible)})]
+
 @router.post("/game/obs")
-async def game_obs_set(data: ObsToggle, _: User = Depends(require_permission('game.control'))):
-    async with game_lock:
-        game_state.obs_visible = bool(data.visible)
-        await ws_manager.broadcast('game', {"type":"state","payload": _snapshot_state()})
+@router.post("/games/{game_id}/obs")
+async def game_obs_set(data: ObsToggle, _: User = Depends(require_permission('game.control')),
+                       game_id: str = DEFAULT_GAME_ID):
+    game = _game(game_id)
+    async with game.lock:
+        await _game_commands(game, _op_obs(game, game.state, data, game_clock.now()))
     return {"ok": True}
 
+def _op_timer_reset(game: Game, gs: GameState, req: None, at: float) -> list[tuple[str, dict]]:
+    return [('timerReset', {"ms": gs.period_duration_seconds * 1000.0, "before": gs.timer.remaining_ms(at),
+                            "running": False, "inInterval": False, "beforeInInterval": gs.in_interval})]
+
 @router.post("/game/timer/reset")
-async def game_timer_reset(_: User = Depends(require_permission('game.control'))):
-    async with game_lock:
-        game_state.timer_running = False
-        game_state.in_interval = False
-        game_state.timer_remaining = game_state.period_duration_seconds
-        await ws_manager.broadcast('game', {"type": "state", "payload": _snapshot_state()})
+@router.post("/games/{game_id}/timer/reset")
+async def game_timer_reset(_: User = Depends(require_permission('game.control')), game_id: str = DEFAULT_GAME_ID):
+    game = _game(game_id)
+    async with game.lock:
+        await _game_commands(game, _op_timer_reset(game, game.state, None, game_clock.now()))
     return {"ok": True}
 
 class TimerSetRequest(BaseModel):
     seconds: int
     running: bool | None = None
 
+def _op_timer_set(game: Game, gs: GameState, req: TimerSetRequest, at: float) -> list[tuple[str, dict]]:
+    data = {"ms": max(0, int(req.seconds)) * 1000.0, "before": gs.timer.remaining_ms(at)}
+    if req.running is not None:
+        data["running"] = bool(req.running)
+    return [('timerSet', data)]
+
 @router.post("/game/timer/set")
-async def game_timer_set(req: TimerSetRequest, _: User = Depends(require_permission('game.control'))):
-    async with game_lock:
-        game_state.timer_remaining = max(0, int(req.seconds))
-        if req.running is not None:
-            game_state.timer_running = bool(req.running)
-        await ws_manager.broadcast('game', {"type": "state", "payload": _snapshot_state()})
-    return {"ok": True, "timerRemaining": game_state.timer_remaining, "timerRunning": game_state.timer_running}
+@router.post("/games/{game_id}/timer/set")
+async def game_timer_set(req: TimerSetRequest, _: User = Depends(require_permission('game.control')),
+                         game_id: str = DEFAULT_GAME_ID):
+    game = _game(game_id)
+    async with game.lock:
+        gs = game.state
+        await _game_commands(game, _op_timer_set(game, gs, req, game_clock.now()))
+    return {"ok": True, "timerRemaining": gs.timer_remaining, "timerRunning": gs.timer_running}
+
+def _op_interval_start(game: Game, gs: GameState, req: None, at: float) -> list[tuple[str, dict]]:
+    # preload to interval duration if not already set at end-of-period
+    ms = None
+    if gs.timer_remaining <= 0 or gs.timer_remaining > gs.interval_duration_seconds:
+        ms = gs.interval_duration_seconds * 1000.0
+    return [('intervalStart', {"ms": ms})]
 
 @router.post("/game/interval/start")
-async def game_interval_start(_: User = Depends(require_permission('game.control'))):
-    async with game_lock:
-        game_state.in_interval = True
-        game_state.timer_running = True
-        # preload to interval duration if not already set at end-of-period
-        if game_state.timer_remaining <= 0 or game_state.timer_remaining > game_state.interval_duration_seconds:
-            game_state.timer_remaining = game_state.interval_duration_seconds
-        await ws_manager.broadcast('game', {"type": "state", "payload": _snapshot_state()})
+@router.post("/games/{game_id}/interval/start")
+async def game_interval_start(_: User = Depends(require_permission('game.control')), game_id: str = DEFAULT_GAME_ID):
+    game = _game(game_id)
+    async with game.lock:
+        await _game_commands(game, _op_interval_start(game, game.state, None, game_clock.now()))
     return {"ok": True}
 
+def _op_period_next(game: Game, gs: GameState, req: None, at: float) -> list[tuple[str, dict]]:
+    before = {"period": gs.period_index, "ms": gs.timer.remaining_ms(at), "inInterval": gs.in_interval}
+    return [('periodNext', {"period": min(4, gs.period_index + 1), "ms": gs.period_duration_seconds * 1000.0,
+                            "inInterval": False, "before": before})]
+
 @router.post("/game/period/next")
-async def game_period_next(_: User = Depends(require_permission('game.control'))):
-    async with game_lock:
-        game_state.period_index = min(4, game_state.period_index + 1)
-        game_state.timer_running = False
-        game_state.in_interval = False
-        game_state.timer_remaining = game_state.period_duration_seconds
-        await ws_manager.broadcast('game', {"type": "state", "payload": _snapshot_state()})
+@router.post("/games/{game_id}/period/next")
+async def game_period_next(_: User = Depends(require_permission('game.control')), game_id: str = DEFAULT_GAME_ID):
+    game = _game(game_id)
+    async with game.lock:
+        await _game_commands(game, _op_period_next(game, game.state, None, game_clock.now()))
     return {"ok": True}
 
 class AddPenaltyRequest(BaseModel):
@@ -2419,79 +3319,308 @@ class AddPenaltyRequest(BaseModel):
     player_number: str
     minutes: int  # 2 or 5
 
+def _op_penalty_add(game: Game, gs: GameState, data: AddPenaltyRequest, at: float) -> list[tuple[str, dict]]:
+    if data.team not in ("home","away"):
+        raise HTTPException(status_code=400, detail="Team non valido")
+    pid = game.penalty_seq
+    game.penalty_seq += 1
+    return [('penaltyAdd', {"id": pid, "team": data.team, "player_number": data.player_number,
+                            "ms": data.minutes * 60000.0, "minutes": data.minutes})]
+
 @router.post("/game/penalties")
-async def game_add_penalty(data: AddPenaltyRequest, _: User = Depends(require_admin)):
-    global _penalty_id_seq
-    async with game_lock:
-        if data.team not in ("home","away"):
-            raise HTTPException(status_code=400, detail="Team non valido")
-        pid = _penalty_id_seq
-        _penalty_id_seq += 1
-        pen = Penalty(id=pid, team=data.team, player_number=data.player_number, remaining=data.minutes*60)
-        game_state.penalties.append(pen)
-        await ws_manager.broadcast('game', {"type": "state", "payload": _snapshot_state()})
-    return {"id": pid}
+@router.post("/games/{game_id}/penalties")
+async def game_add_penalty(data: AddPenaltyRequest, _: User = Depends(require_admin), game_id: str = DEFAULT_GAME_ID):
+    game = _game(game_id)
+    async with game.lock:
+        events = _op_penalty_add(game, game.state, data, game_clock.now())
+        await _game_commands(game, events)
+    return {"id": events[0][1]["id"]}
+
+class RemovePenaltyRequest(BaseModel):
+    id: int
+
+def _op_penalty_remove(game: Game, gs: GameState, data: RemovePenaltyRequest, at: float) -> list[tuple[str, dict]]:
+    pen = next((p for p in gs.penalties if p.id == data.id), None)
+    if pen is None:
+        return []
+    return [('penaltyRemove', {"id": pen.id, "team": pen.team, "player_number": pen.player_number,
+                               "ms": pen._clock.remaining_ms(at)})]
 
 @router.delete("/game/penalties/{penalty_id}")
-async def game_remove_penalty(penalty_id: int, _: User = Depends(require_permission('game.control'))):
-    async with game_lock:
-        game_state.penalties = [p for p in game_state.penalties if p.id != penalty_id]
-        await ws_manager.broadcast('game', {"type": "state", "payload": _snapshot_state()})
+@router.delete("/games/{game_id}/penalties/{penalty_id}")
+async def game_remove_penalty(penalty_id: int, _: User = Depends(require_permission('game.control')),
+                              game_id: str = DEFAULT_GAME_ID):
+    game = _game(game_id)
+    async with game.lock:
+        await _game_commands(game, _op_penalty_remove(game, game.state, RemovePenaltyRequest(id=penalty_id), game_clock.now()))
     return {"ok": True}
 
+@router.post("/game/undo")
+@router.post("/games/{game_id}/undo")
+async def game_undo(_: User = Depends(require_permission('game.control')), game_id: str = DEFAULT_GAME_ID):
+    """Revert the last undoable command (score, shots, penalties, clock and period edits)."""
+    game = _game(game_id)
+    async with game.lock:
+        target = game.log.undo_target()
+        if target is None:
+            raise HTTPException(status_code=409, detail="Niente da annullare")
+        kind, data = _inverse_game_event(game.state, target, game_clock.now())
+        event = _record_game_event(game, kind, data, undoes=target["seq"])
+        await _broadcast_state(game)
+    return {"ok": True, "seq": event["seq"], "undone": {"seq": target["seq"], "type": target["type"]}}
+
+@router.post("/game/redo")
+@router.post("/games/{game_id}/redo")
+async def game_redo(_: User = Depends(require_permission('game.control')), game_id: str = DEFAULT_GAME_ID):
+    game = _game(game_id)
+    async with game.lock:
+        target = game.log.redo_target()
+        if target is None:
+            raise HTTPException(status_code=409, detail="Niente da ripristinare")
+        kind, data = _inverse_game_event(game.state, target, game_clock.now())
+        event = _record_game_event(game, kind, data, redoes=target["seq"])
+        await _broadcast_state(game)
+        redone = game.log.event(target["undoes"])
+    return {"ok": True, "seq": event["seq"], "redone": {"seq": redone["seq"], "type": redone["type"]}}
+
+@router.get("/game/events")
+@router.get("/games/{game_id}/events")
+def game_events(after: int = Query(0, ge=0), limit: int = Query(500, ge=1, le=5000),
+                _: User = Depends(require_permission('game.control')), game_id: str = DEFAULT_GAME_ID):
+    """Events of the game's current log after seq ``after`` (oldest first)."""
+    log = _game(game_id).log
+    return {"gameId": log.game_id, "seq": log.seq, "events": log.since(after)[:limit]}
+
+@router.get("/game/stats")
+@router.get("/games/{game_id}/stats")
+def game_stats(_: User = Depends(require_permission('game.control')), game_id: str = DEFAULT_GAME_ID):
+    """Goals, shots and penalty minutes per period of the current game (kept up to date per event)."""
+    return _game(game_id).log.stats()
+
+# ---- Batched commands ----
+# op name → (request model of its single endpoint, or None; operation)
+_GAME_OPS = {
+    'config': (GameConfigPatch, _op_config),
+    'score': (ScoreUpdate, _op_score),
+    'shots': (ShotsUpdate, _op_shots),
+    'timerStart': (None, _op_timer_start),
+    'timerStop': (None, _op_timer_stop),
+    'timerReset': (None, _op_timer_reset),
+    'timerSet': (TimerSetRequest, _op_timer_set),
+    'timeoutStart': (None, _op_timeout_start),
+    'timeoutStop': (None, _op_timeout_stop),
+    'siren': (SirenToggle, _op_siren),
+    'obs': (ObsToggle, _op_obs),
+    'intervalStart': (None, _op_interval_start),
+    'periodNext': (None, _op_period_next),
+    'penaltyAdd': (AddPenaltyRequest, _op_penalty_add),
+    'penaltyRemove': (RemovePenaltyRequest, _op_penalty_remove),
+}
+
+def _plan_game_ops(game: Game, ops: list[tuple[str, dict]], at: float) -> list[tuple[str, dict]]:
+    """Events for ``ops`` in order, each op seeing the effect of the ones before it.
+
+    They are applied to a scratch copy of the state as they are planned, so an op that
+    fails rejects the whole batch (400 naming it) before anything is recorded.
+    """
+    scratch = GameState.from_record(game.state.to_record(), at)
+    penalty_seq = game.penalty_seq
+    events: list[tuple[str, dict]] = []
+    try:
+        for i, (name, args) in enumerate(ops, start=1):
+            spec = _GAME_OPS.get(name)
+            if spec is None:
+                raise HTTPException(status_code=400, detail=f"Comando {i}: operazione '{name}' sconosciuta")
+            model, op = spec
+            try:
+                req = model(**args) if model is not None else None
+                planned = op(game, scratch, req, at)
+                for kind, data in planned:
+                    _apply_game_event(scratch, kind, data, at)
+            except HTTPException as e:
+                raise HTTPException(status_code=e.status_code, detail=f"Comando {i}: {e.detail}")
+            except (ValidationError, TypeError, ValueError, KeyError):
+                raise HTTPException(status_code=400, detail=f"Comando {i} ({name}) non valido")
+            events += planned
+    except HTTPException:
+        game.penalty_seq = penalty_seq  # ids handed out to the rejected batch are reused
+        raise
+    return events
+
+async def _run_game_ops(game: Game, ops: list[tuple[str, dict]]) -> list[dict]:
+    """Apply ``ops`` all or nothing with one broadcast; caller holds game.lock."""
+    # the whole batch happens at one instant, so planned clock readings stay exact
+    at_ms = game_clock.server_ms()
+    events = _plan_game_ops(game, ops, game_clock.from_server_ms(at_ms))
+    return await _game_commands(game, events, at_ms)
+
+class GameCommand(BaseModel):
+    """``{"op": <name>, ...}`` with the fields of the op's own endpoint body."""
+    model_config = ConfigDict(extra='allow')
+    op: str
+
+class GameCommandsRequest(BaseModel):
+    commands: List[GameCommand]
+
+_GAME_BATCH_MAX = 50
+
+@router.post("/game/commands")
+@router.post("/games/{game_id}/commands")
+async def game_commands(req: GameCommandsRequest, user: User = Depends(require_permission('game.control')),
+                        game_id: str = DEFAULT_GAME_ID):
+    """Apply an ordered list of operations (e.g. a goal: score then shots) atomically under
+    one lock acquisition, with a single broadcast. Ops are those of the single endpoints:
+    config, score, shots, timerStart/Stop/Reset/Set, timeoutStart/Stop, siren, obs,
+    intervalStart, periodNext, penaltyAdd, penaltyRemove ({"op": "penaltyRemove", "id": 3})."""
+    is_admin = any(r.name == 'admin' for r in user.roles)
+    return await _game_batch(_game(game_id), req.commands, is_admin)
+
+async def _game_batch(game: Game, commands: List[GameCommand], is_admin: bool) -> dict:
+    """Shared by /game/commands and socket commands: the caller already holds game.control."""
+    if not commands or len(commands) > _GAME_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Da 1 a {_GAME_BATCH_MAX} comandi per richiesta")
+    # penalties need admin on their own endpoint too
+    if not is_admin and any(c.op == 'penaltyAdd' for c in commands):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Permesso negato")
+    async with game.lock:
+        events = await _run_game_ops(game, [(c.op, c.model_extra or {}) for c in commands])
+    return {"ok": True, "version": game.sync.version,
+            "events": [{"seq": e["seq"], "type": e["type"], "data": e["data"]} for e in events]}
+
+class _WSControl:
+    """Game control state of one socket, fixed at connect: the principal's rights, the
+    last command ``seq`` and a token bucket of ``ws_command_rate`` commands per second
+    (``ws_command_burst`` back to back)."""
+
+    def __init__(self, principal: "_WSPrincipal | None") -> None:
+        self.allowed = principal is not None and principal.can('game.control')
+        self.is_admin = principal is not None and principal.is_admin
+        self.seq = 0
+        self.tokens = float(settings.ws_command_burst)
+        self.refilled_at = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(float(settings.ws_command_burst), self.tokens + (now - self.refilled_at) * settings.ws_command_rate)
+        self.refilled_at = now
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+class WSGameCommand(BaseModel):
+    """``{"type": "command", "seq": 7, "commands": [{"op": "score", ...}], "game": "main"}``"""
+    type: str
+    seq: int
+    commands: List[GameCommand]
+    game: str | None = None
+
+async def _ws_game_command(ws: WebSocket, control: _WSControl | None, data: dict, game_id: str | None) -> None:
+    """Run a socket's command batch and answer with an ack carrying its ``seq``.
+
+    The ack goes through the socket's queue, after the state broadcast it caused, so
+    a client that sees ``{"type": "ack", "ok": true}`` already has the new state.
+    A ``seq`` not above the last one applied on the socket is a resend and is not applied
+    again; a command that was rejected (rate limit, invalid op) can be resent as it was.
+    """
+    seq = data.get('seq')
+
+    def nack(code: int, detail: str) -> None:
+        ws_manager.send(ws, {"type": "ack", "seq": seq, "ok": False, "status": code, "detail": detail})
+
+    if control is None or not control.allowed:
+        nack(status.HTTP_403_FORBIDDEN, "Permesso 'game.control' richiesto")
+        return
+    try:
+        cmd = WSGameCommand.model_validate(data)
+    except ValidationError:
+        nack(400, "Comando non valido")
+        return
+    if not control.take():
+        nack(429, "Troppi comandi")  # not applied: may be resent with the same seq
+        return
+    if cmd.seq <= control.seq:
+        nack(409, "Sequenza non valida")
+        return
+    try:
+        game = _game(cmd.game or game_id or '')
+        result = await _game_batch(game, cmd.commands, control.is_admin)
+    except HTTPException as e:
+        nack(e.status_code, e.detail)
+        return
+    control.seq = cmd.seq
+    ws_manager.send(ws, {"type": "ack", "seq": seq, **result})
+
+# penalties due this close after the period's end (float rounding of aligned clocks) end with it
+_PENALTY_END_SLACK = 0.001
+
+def _advance_game_clock(game: Game, now: float) -> tuple[bool, list[float]]:
+    """Apply the clock events of ``game`` due by ``now``, each at its exact deadline.
+
+    Returns whether the state changed (period or interval end, timeout end, expired
+    penalties: running clocks need no broadcast, clients count down from their deadlines)
+    and the monotonic play times of siren pulses to announce now.
+    """
+    gs = game.state
+    timer = gs.timer
+    pulses: list[float] = []
+    changed = False
+    # penalties run with the game clock and leave when they reach 0 (popped off their heap),
+    # before the period end that would stop them: one ending with the period must not stay at 0
+    until = now
+    if timer.running and timer.remaining_ms(now) <= 0:
+        until = min(now, timer.deadline() + _PENALTY_END_SLACK)
+    expiries: dict[float, list[int]] = {}
+    for deadline, pid in gs.penalty_expiries(until):
+        expiries.setdefault(deadline, []).append(pid)
+    for deadline, ids in expiries.items():
+        _record_game_event(game, 'penaltyExpired', {"ids": ids}, game_clock.server_ms(deadline))
+        changed = True
+    if timer.running:
+        # announced ahead of time, played by every display at the same instant
+        play = gs.announce_siren(now, settings.game_siren_lead_ms)
+        if play is not None:
+            pulses.append(play)
+        if timer.remaining_ms(now) <= 0:
+            changed = True
+            # logged at the exact deadline, however late the scheduler woke
+            _record_game_event(game, 'intervalEnd' if gs.in_interval else 'periodEnd', {}, game_clock.server_ms(timer.deadline()))
+    # timeout countdown (always runs once started)
+    if gs.timeout.running and gs.timeout.remaining_ms(now) <= 0:
+        _record_game_event(game, 'timeoutEnd', {}, game_clock.server_ms(gs.timeout.deadline()))
+        changed = True
+    _reschedule_game(game, now)
+    return changed, pulses
+
+def _next_game_wakeup(now: float) -> Optional[float]:
+    """Seconds until the next deadline of any game; None when no clock runs anywhere."""
+    due = _game_timers.next_deadline()
+    return None if due is None else max(0.0, due - now) + 0.001
+
 async def game_scheduler():
+    """One timer queue drives every game: the loop sleeps until the earliest deadline (period
+    or interval end, timeout end, penalty expiry, siren announcement) and wakes for nothing
+    else; with no clock running it waits with no timeout at all. Commands reschedule their
+    game, waking the loop only if that moves the next deadline earlier."""
     while True:
-        await asyncio.sleep(1)
-        changed = False
-        just_pulsed = False
-        period_end_pulse = False
-        removed_ids: List[int] = []
-        async with game_lock:
-            if game_state.timer_running and game_state.timer_remaining > 0:
-                game_state.timer_remaining -= 1
-                if game_state.timer_remaining <= 0:
-                    game_state.timer_remaining = 0
-                    game_state.timer_running = False
-                    if not game_state.in_interval:
-                        # end of period → switch to interval (stopped, ready to start)
-                        game_state.in_interval = True
-                        game_state.timer_remaining = game_state.interval_duration_seconds
-                        # trigger siren at end of period
-                        period_end_pulse = True
-                    else:
-                        # end of interval: keep at 0, controller will advance period
-                        game_state.in_interval = True
-                changed = True
-                # siren pulse each minute if option enabled
-                if game_state.siren_every_minute and (not game_state.in_interval) and game_state.timer_remaining % 60 == 0:
-                    just_pulsed = True
-            # timeout countdown (always runs once started)
-            if game_state.timeout_remaining > 0:
-                game_state.timeout_remaining -= 1
-                if game_state.timeout_remaining < 0:
-                    game_state.timeout_remaining = 0
-                changed = True
-            # penalties: decrement ONLY when main timer is running (not during interval)
-            if game_state.timer_running and (not game_state.in_interval):
-                for p in list(game_state.penalties):
-                    if p.remaining > 0:
-                        p.remaining -= 1
-                        if p.remaining <= 0:
-                            removed_ids.append(p.id)
-                            changed = True
-            if removed_ids:
-                game_state.penalties = [p for p in game_state.penalties if p.id not in removed_ids]
-        if changed:
-            try:
-                await ws_manager.broadcast('game', {"type": "state", "payload": _snapshot_state()})
-            except Exception:
-                pass
-        # trigger siren pulse event, outside lock
-        if just_pulsed or period_end_pulse:
-            try:
-                await ws_manager.broadcast('game', {"type": "sirenPulse", "payload": {"at": int(datetime.now(timezone.utc).timestamp())}})
-            except Exception:
-                pass
+        for game_id in await _game_timers.wait(game_clock.now):
+            game = games.get(game_id)
+            if game is None:
+                continue
+            async with game.lock:
+                changed, pulses = _advance_game_clock(game, game_clock.now())
+            if changed:
+                try:
+                    await _broadcast_state(game)
+                except Exception:
+                    pass
+            # siren pulses, outside lock: 'play_at' is the server time (ms) the siren sounds at
+            for play in pulses:
+                try:
+                    play_at = game_clock.server_ms(play)
+                    await ws_manager.broadcast(game.room, {"type": "sirenPulse", "payload": {"at": play_at // 1000, "play_at": play_at}}, local=True)
+                except Exception:
+                    pass
 
 # ===================== OBS BROWSER SOURCE OVERLAYS =====================
 
@@ -2575,7 +3704,11 @@ body {
     Timeout · <span id="timeoutSeconds">30</span>s
 </div>
 <script>
-const ws = new WebSocket(`ws://${window.location.host}/api/v1/ws/game`);
+// ?game=<id> shows another rink's game (default: the main one)
+const gameId = new URLSearchParams(window.location.search).get('game');
+const ws = new WebSocket(`ws://${window.location.host}/api/v1/ws/${gameId ? 'game:' + encodeURIComponent(gameId) : 'game'}`);
+let current = {};
+let version = 0;
 const overlay = document.getElementById('overlay');
 const timeoutIndicator = document.getElementById('timeoutIndicator');
 
@@ -2585,6 +3718,37 @@ function formatTime(seconds) {
     return `${m}:${s}`;
 }
 
+// Clock sync: offset = ((t1 - t0) + (t2 - t3)) / 2 from the probe with the smallest RTT
+let offset = 0, bestRtt = Infinity;
+const clientNow = () => performance.timeOrigin + performance.now();
+const serverNow = () => clientNow() + offset;
+function probe() {
+    if (ws.readyState === WebSocket.OPEN) ws.send(JSON.stringify({ type: 'timeSync', t0: clientNow() }));
+}
+ws.onopen = () => {
+    for (let i = 0; i < 5; i++) setTimeout(probe, i * 200);
+    // re-measure from scratch now and then: the best RTT is only meaningful recently
+    setInterval(() => { bestRtt = Infinity; probe(); }, 30000);
+};
+
+// Running clocks arrive as deadlines (server ms): count them down locally every frame
+function secondsLeft(endsAt, fallback) {
+    if (typeof endsAt !== 'number') return fallback ?? 0;
+    return Math.max(0, Math.ceil((endsAt - serverNow()) / 1000 - 1e-6));
+}
+function renderClocks() {
+    document.getElementById('timer').textContent = formatTime(secondsLeft(current.timerEndsAt, current.timerRemaining));
+    const timeout = secondsLeft(current.timeoutEndsAt, current.timeoutRemaining);
+    if (timeout > 0) {
+        document.getElementById('timeoutSeconds').textContent = timeout;
+        timeoutIndicator.style.display = 'block';
+    } else {
+        timeoutIndicator.style.display = 'none';
+    }
+    requestAnimationFrame(renderClocks);
+}
+requestAnimationFrame(renderClocks);
+
 function updateState(state) {
     document.getElementById('homeName').textContent = state.homeName || 'Casa';
     document.getElementById('awayName').textContent = state.awayName || 'Ospiti';
@@ -2593,7 +3757,6 @@ function updateState(state) {
     document.getElementById('homeShots').textContent = state.shotsHome ?? 0;
     document.getElementById('awayShots').textContent = state.shotsAway ?? 0;
     document.getElementById('period').textContent = (state.period || '1°') + ' Periodo';
-    document.getElementById('timer').textContent = formatTime(state.timerRemaining ?? 0);
     
     // Visibility control
     if (state.obsVisible === false) {
@@ -2601,32 +3764,45 @@ function updateState(state) {
     } else {
         overlay.classList.remove('hidden');
     }
-    
-    // Timeout indicator
-    if (state.timeoutRemaining && state.timeoutRemaining > 0) {
-        document.getElementById('timeoutSeconds').textContent = state.timeoutRemaining;
-        timeoutIndicator.style.display = 'block';
-    } else {
-        timeoutIndicator.style.display = 'none';
-    }
+    // timer and timeout indicator: renderClocks
 }
 
 ws.onmessage = (event) => {
     try {
         const msg = JSON.parse(event.data);
+        if (msg.type === 'ping') {
+            ws.send(JSON.stringify({ type: 'pong', ts: msg.ts }));
+            return;
+        }
+        if (msg.type === 'timeSync') {
+            const t3 = clientNow();
+            const rtt = (t3 - msg.t0) - (msg.t2 - msg.t1);
+            if (rtt < bestRtt) {
+                bestRtt = rtt;
+                offset = ((msg.t1 - msg.t0) + (msg.t2 - t3)) / 2;
+            }
+            return;
+        }
         if (msg.type === 'state' && msg.payload) {
-            updateState(msg.payload);
+            current = msg.payload;
+            version = msg.v ?? version;
+            updateState(current);
+        } else if (msg.type === 'delta') {
+            if (msg.v <= version) return;
+            if (msg.v !== version + 1) {
+                // missed an update: ask for a full keyframe
+                ws.send(JSON.stringify({ type: 'resync' }));
+                return;
+            }
+            current = Object.assign({}, current, msg.changes);
+            version = msg.v;
+            updateState(current);
         }
     } catch (e) {
         console.error('WS parse error:', e);
     }
 };
-
-// Initial fetch
-fetch('/api/v1/game/state')
-    .then(r => r.json())
-    .then(state => updateState(state))
-    .catch(e => console.error('Initial fetch failed:', e));
+// No initial fetch: the server replays the current keyframe as soon as the socket joins 'game'
 </script>
 </body>
 </html>"""
@@ -2735,6 +3911,10 @@ function formatTime(seconds) {
 ws.onmessage = (event) => {
     try {
         const msg = JSON.parse(event.data);
+        if (msg.type === 'ping') {
+            ws.send(JSON.stringify({ type: 'pong', ts: msg.ts }));
+            return;
+        }
         if (msg.type === 'showView') {
             const view = msg.payload?.view;
             if (view === 'message') {
@@ -2847,28 +4027,88 @@ async def recurring_tasks_scheduler():
 
 
 # ---- Notifications System ----
-async def send_notification(user_id: int | None, message: str, notification_type: str = "info", data: dict | None = None):
+async def send_notification(user_id: int | None, message: str, notification_type: str = "info", data: dict | None = None, coalesce_key: str | None = None):
     """
     Send notification to a specific user or broadcast to all
     notification_type: info|success|warning|danger
+
+    Goes through the coalescer: bursts with the same ``coalesce_key`` (and anything over
+    the per-recipient rate cap) are folded into one digest per window.
     """
-    payload = {
-        "type": "notification",
-        "notification_type": notification_type,
-        "message": message,
-        "data": data or {},
-        "timestamp": datetime.now(timezone.utc).isoformat()
-    }
+    await notification_coalescer.submit(user_id, message, notification_type, data, coalesce_key)
+
+
+async def _deliver_notification(user_id: int | None, message: str, notification_type: str = "info", data: dict | None = None):
+    """Store the notification (inbox + replay buffer) and push it to the user's room.
+
+    Stored first, so clients that are offline now get it when they reconnect.
+    """
+    try:
+        payload = await asyncio.to_thread(notification_hub.store, user_id, message, notification_type, data)
+    except Exception as e:
+        # never lose the live notification because the DB is unavailable
+        logger.error(f"Failed to store notification: {e}")
+        payload = {
+            "type": "notification",
+            "notification_type": notification_type,
+            "message": message,
+            "data": data or {},
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }
     
+    frame = Frame.encode(payload)
     if user_id:
         # Send to specific user's room (notifications_user_{id})
-        await ws_manager.broadcast(f"notifications_user_{user_id}", payload)
+        await ws_manager.broadcast(f"notifications_user_{user_id}", frame)
     else:
         # Broadcast to all connected users (notifications_all)
-        await ws_manager.broadcast("notifications_all", payload)
+        await ws_manager.broadcast("notifications_all", frame)
     
     logger.info(f"Notification sent - user: {user_id or 'all'}, type: {notification_type}, message: {message}")
 
+notification_coalescer = NotificationCoalescer(_deliver_notification)
+
+
+@router.get("/notifications")
+def notifications_inbox(
+    response: Response,
+    before_id: int | None = None,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current: User = Depends(get_current_user),
+):
+    """Inbox of the current user (own + broadcast), newest first.
+
+    Keyset pagination: pass the X-Next-Cursor header back as ``before_id``.
+    X-Unread-Count carries the unread counter.
+    """
+    limit = max(1, min(limit, 200))
+    items = notification_hub.page(db, current.id, before_id, limit)
+    cur = notification_hub.cursor(db, current.id)
+    for it in items:
+        it["read"] = it["id"] <= cur.last_read_id
+    if len(items) == limit:
+        response.headers['X-Next-Cursor'] = str(items[-1]["id"])
+    response.headers['X-Unread-Count'] = str(cur.unread)
+    return items
+
+
+@router.get("/notifications/unread")
+def notifications_unread(db: Session = Depends(get_db), current: User = Depends(get_current_user)):
+    cur = notification_hub.cursor(db, current.id)
+    return {"unread": cur.unread, "last_read_id": cur.last_read_id}
+
+
+class NotificationsReadRequest(BaseModel):
+    up_to_id: int | None = None
+
+
+@router.post("/notifications/read")
+def notifications_mark_read(body: NotificationsReadRequest, db: Session = Depends(get_db), current: User = Depends(get_current_user)):
+    """Mark everything up to ``up_to_id`` (default: all) as read."""
+    cur = notification_hub.mark_read(db, current.id, body.up_to_id)
+    return {"unread": cur.unread, "last_read_id": cur.last_read_id}
+
 
 @router.post("/notifications/test")
 async def test_notification(current: User = Depends(get_current_user)):
@@ -3021,7 +4261,7 @@ async def skates_rentals_create(data: SkateRentalCreate, db: Session = Depends(g
     logger.info(f"Skate rented: {skate.size} to {rental.customer_name}")
     
     # Send notification to admins
-    await send_notification(None, f"Noleggio pattini taglia {skate.size} a {rental.customer_name}", "info", {"rental_id": rental.id})
+    await send_notification(None, f"Noleggio pattini taglia {skate.size} a {rental.customer_name}", "info", {"rental_id": rental.id}, coalesce_key="skates.rental")
     
     return rental
 
@@ -3044,7 +4284,7 @@ async def skates_rentals_return(rental_id: int, db: Session = Depends(get_db), c
     logger.info(f"Skate returned: rental_id {rental_id}")
     
     # Send notification
-    await send_notification(None, f"Restituzione pattini taglia {rental.skate.size} da {rental.customer_name}", "success", {"rental_id": rental_id})
+    await send_notification(None, f"Restituzione pattini taglia {rental.skate.size} da {rental.customer_name}", "success", {"rental_id": rental_id}, coalesce_key="skates.return")
     
     return {"ok": True, "returned_at": rental.returned_at}
 
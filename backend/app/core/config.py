@@ -73,7 +73,53 @@ class Settings:
         # Rate limiting
         self.rate_limit_requests: int = int(os.getenv("RATE_LIMIT_REQUESTS", "100"))
         self.rate_limit_window: int = int(os.getenv("RATE_LIMIT_WINDOW", "60"))
-        
+
+        # In-process AppSetting cache: seconds before a full reload (picks up writes from other workers)
+        self.settings_cache_ttl: float = float(os.getenv("SETTINGS_CACHE_TTL", "30"))
+
+        # Audit log writer: bounded queue flushed in batches off the request path
+        self.audit_queue_size: int = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+        self.audit_flush_interval_ms: int = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "250"))
+        self.audit_batch_size: int = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+        # Cold archive for audit rows older than the AppSetting audit.retention_days
+        self.audit_archive_path: Path = Path(os.getenv("AUDIT_ARCHIVE_PATH", str(Path(self.storage_path) / "audit_archive")))
+        self.audit_archive_batch_size: int = int(os.getenv("AUDIT_ARCHIVE_BATCH_SIZE", "5000"))
+
+        # WebSocket fan-out: per-connection outbound queue and what to do when it is full
+        # (drop_oldest | coalesce | disconnect)
+        self.ws_send_queue_size: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "64"))
+        self.ws_overflow_policy: str = os.getenv("WS_OVERFLOW_POLICY", "coalesce").lower()
+        # Server-initiated ping every WS_PING_INTERVAL idle seconds; no pong within WS_PONG_TIMEOUT evicts
+        self.ws_ping_interval: float = float(os.getenv("WS_PING_INTERVAL", "20"))
+        self.ws_pong_timeout: float = float(os.getenv("WS_PONG_TIMEOUT", "10"))
+        # Cross-worker fan-out for broadcasts: local | unix | postgres
+        self.ws_bus: str = os.getenv("WS_BUS", "local").lower()
+        self.ws_bus_socket: str = os.getenv("WS_BUS_SOCKET", "/tmp/palafeltre-ws.sock")
+        # Limits for authenticated multiplexed sockets (/ws?token=...)
+        self.ws_max_rooms: int = int(os.getenv("WS_MAX_ROOMS", "512"))
+        self.ws_max_subscriptions: int = int(os.getenv("WS_MAX_SUBSCRIPTIONS", "16"))
+        # Game commands sent over a socket: sustained per second and burst, per connection
+        self.ws_command_rate: float = float(os.getenv("WS_COMMAND_RATE", "10"))
+        self.ws_command_burst: int = int(os.getenv("WS_COMMAND_BURST", "20"))
+
+        # Notification inbox: in-memory replay buffer per user and how many users to keep buffers for
+        self.notification_buffer_size: int = int(os.getenv("NOTIFICATION_BUFFER_SIZE", "100"))
+        self.notification_buffer_users: int = int(os.getenv("NOTIFICATION_BUFFER_USERS", "500"))
+        # Coalescing: bursts of the same kind within the window become one digest; per-recipient send cap
+        self.notification_coalesce_window: float = float(os.getenv("NOTIFICATION_COALESCE_WINDOW", "30"))
+        self.notification_rate_per_minute: int = int(os.getenv("NOTIFICATION_RATE_PER_MINUTE", "20"))
+
+        # Game sirens are announced this many ms before they sound, so every display plays them together
+        self.game_siren_lead_ms: int = int(os.getenv("GAME_SIREN_LEAD_MS", "500"))
+        # Live game state survives restarts: snapshot file written (fsync'd) this long after the last change
+        self.game_state_path: Path = Path(os.getenv("GAME_STATE_PATH", str(Path(self.storage_path) / "game_state.json")))
+        self.game_state_debounce_ms: int = int(os.getenv("GAME_STATE_DEBOUNCE_MS", "200"))
+        # Append-only event log per game (JSON lines), with a full state snapshot every N events
+        self.game_events_path: Path = Path(os.getenv("GAME_EVENTS_PATH", str(Path(self.storage_path) / "game_events")))
+        self.game_event_snapshot_every: int = int(os.getenv("GAME_EVENT_SNAPSHOT_EVERY", "50"))
+        # Games that can run at the same time (main rink, training rink, ...), each on room game:{id}
+        self.game_max_games: int = int(os.getenv("GAME_MAX_GAMES", "8"))
+
         # Ensure directories exist
         Path(self.storage_path).mkdir(exist_ok=True)
         self.documents_path.mkdir(exist_ok=True)
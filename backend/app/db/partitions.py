@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, timezone
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from ..models.settings import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Parent table for Postgres. The primary key must include the partition key.
+_AUDIT_PARENT_DDL = """
+CREATE TABLE audit_logs (
+    id SERIAL NOT NULL,
+    "timestamp" TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    user_id INTEGER,
+    action VARCHAR(120) NOT NULL,
+    details TEXT,
+    PRIMARY KEY (id, "timestamp")
+) PARTITION BY RANGE ("timestamp")
+"""
+
+_AUDIT_PG_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS ix_audit_logs_timestamp ON audit_logs ("timestamp")',
+    'CREATE INDEX IF NOT EXISTS ix_audit_logs_action_timestamp ON audit_logs (action, "timestamp")',
+    # varchar_pattern_ops lets `action LIKE 'obs.%'` use the index regardless of collation
+    'CREATE INDEX IF NOT EXISTS ix_audit_logs_action_prefix ON audit_logs (action varchar_pattern_ops)',
+)
+
+
+def _month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _add_months(d: date, n: int) -> date:
+    m = d.month - 1 + n
+    return date(d.year + m // 12, m % 12 + 1, 1)
+
+
+def _pg_relkind(conn, name: str) -> str | None:
+    return conn.execute(
+        text(
+            "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE c.relname = :name AND n.nspname = current_schema()"
+        ),
+        {'name': name},
+    ).scalar()
+
+
+def ensure_audit_log_schema(engine: Engine) -> None:
+    """Create audit_logs and its search indexes.
+
+    On Postgres the table is range-partitioned by month on ``timestamp`` so time-bounded
+    queries only touch the partitions they need. An existing non-partitioned table is left
+    alone (converting it is a manual migration) but still gets the indexes. On other
+    backends this only makes sure the model's indexes exist on older databases.
+    """
+    if engine.dialect.name != 'postgresql':
+        if inspect(engine).has_table(AuditLog.__tablename__):
+            for idx in AuditLog.__table__.indexes:
+                idx.create(bind=engine, checkfirst=True)
+        return
+    with engine.begin() as conn:
+        kind = _pg_relkind(conn, 'audit_logs')
+        if kind is None:
+            conn.execute(text(_AUDIT_PARENT_DDL))
+            conn.execute(text('CREATE TABLE IF NOT EXISTS audit_logs_default PARTITION OF audit_logs DEFAULT'))
+            logger.info('Created partitioned audit_logs table')
+        elif kind != 'p':
+            logger.warning('audit_logs is not partitioned; keeping the existing table (migrate manually to enable monthly partitions)')
+        for ddl in _AUDIT_PG_INDEXES:
+            conn.execute(text(ddl))
+    _ensure_details_search_index(engine)
+    ensure_audit_partitions(engine)
+
+
+def _ensure_details_search_index(engine: Engine) -> None:
+    # Trigram GIN index serves `details ILIKE '%foo%'`; it needs the pg_trgm extension.
+    try:
+        with engine.begin() as conn:
+            conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_audit_logs_details_trgm ON audit_logs USING gin (details gin_trgm_ops)'))
+        return
+    except Exception as e:
+        logger.warning(f'pg_trgm not available ({e}); falling back to a full-text index on audit_logs.details')
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_audit_logs_details_fts ON audit_logs USING gin (to_tsvector('simple', coalesce(details, '')))"))
+    except Exception:
+        logger.exception('Could not create a search index on audit_logs.details')
+
+
+def ensure_audit_partitions(engine: Engine, months_ahead: int = 2, now: datetime | None = None) -> list[str]:
+    """Create monthly partitions from the current month up to ``months_ahead`` months ahead.
+
+    Safe to call repeatedly; run it at startup and periodically so rows never have to
+    land in the DEFAULT partition. Returns the names of partitions created.
+    """
+    if engine.dialect.name != 'postgresql':
+        return []
+    created: list[str] = []
+    start = _month_start((now or datetime.now(timezone.utc)).date())
+    with engine.begin() as conn:
+        if _pg_relkind(conn, 'audit_logs') != 'p':
+            return []
+        for i in range(months_ahead + 1):
+            lo = _add_months(start, i)
+            hi = _add_months(lo, 1)
+            name = f'audit_logs_y{lo.year:04d}m{lo.month:02d}'
+            if _pg_relkind(conn, name) is not None:
+                continue
+            conn.execute(text(
+                f"CREATE TABLE {name} PARTITION OF audit_logs "
+                f"FOR VALUES FROM ('{lo.isoformat()} 00:00:00+00') TO ('{hi.isoformat()} 00:00:00+00')"
+            ))
+            created.append(name)
+    if created:
+        logger.info(f"Created audit_logs partitions: {', '.join(created)}")
+    return created
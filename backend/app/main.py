@@ -7,10 +7,15 @@ from .api.v1.router import api_router
 from .db.session import Base, engine, SessionLocal
 from .models.rbac import User, Role
 from .models.skates import SkateInventory, SkateRental
-from .models.settings import AppSetting
 from .core.security import hash_password
-from .api.v1.endpoints import skating_scheduler, game_scheduler, backup_scheduler, recurring_tasks_scheduler
+from .api.v1.endpoints import skating_scheduler, game_scheduler, backup_scheduler, recurring_tasks_scheduler, audit_maintenance_scheduler, notification_coalescer, restore_game_state
+from .db.partitions import ensure_audit_log_schema
 from .services.obs_v5 import obs_manager
+from .services.settings_cache import settings_cache
+from .services.audit import audit_writer
+from .services.game_store import game_store
+from .services.ws_manager import ws_manager
+from .services.notifications import notification_hub
 import asyncio
 import os
 from datetime import datetime, timezone
@@ -90,6 +95,11 @@ app.include_router(api_router, prefix="/api/v1")
 @app.on_event("startup")
 def on_startup():
     logger.info("Starting application initialization...")
+    # audit_logs first: on Postgres it is a partitioned table that create_all can't express
+    try:
+        ensure_audit_log_schema(engine)
+    except Exception:
+        logger.exception("Failed to prepare audit_logs schema")
     Base.metadata.create_all(bind=engine)
     # seed admin user and role if not exist
     db = SessionLocal()
@@ -131,6 +141,12 @@ def on_startup():
             logger.info("Bound admin role to admin user")
     finally:
         db.close()
+    # a restart mid-match picks the game up where it was (clocks from their stored deadlines)
+    try:
+        if restore_game_state():
+            logger.info("Restored game state from snapshot")
+    except Exception:
+        logger.exception("Failed to restore game state")
     # start background scheduler
     logger.info("Starting background schedulers...")
     loop = asyncio.get_event_loop()
@@ -138,24 +154,44 @@ def on_startup():
     loop.create_task(game_scheduler())
     loop.create_task(backup_scheduler())
     loop.create_task(recurring_tasks_scheduler())
+    loop.create_task(audit_maintenance_scheduler())
+    loop.create_task(ws_manager.heartbeat_loop())
+    loop.create_task(_start_ws_bus())
+    audit_writer.start()
     # Start OBS manager if obs settings stored
     try:
-        db = SessionLocal()
-        try:
-            row = db.query(AppSetting).filter(AppSetting.key=='obs.host').first()
-            host = getattr(row, 'value', None) if row else None
-            row = db.query(AppSetting).filter(AppSetting.key=='obs.port').first()
-            port = getattr(row, 'value', None) if row else None
-            row = db.query(AppSetting).filter(AppSetting.key=='obs.password').first()
-            pwd = getattr(row, 'value', None) if row else None
-            if host and port:
-                try:
-                    obs_manager.set_config(host, int(port), pwd or '')
-                    logger.info('OBS manager started with saved settings')
-                except Exception:
-                    logger.warning('Failed to start OBS manager on startup')
-        finally:
-            db.close()
+        # warm the settings cache with a single query; later reads are served from memory
+        settings_cache.reload()
+        host = settings_cache.get('obs.host')
+        port = settings_cache.get('obs.port')
+        pwd = settings_cache.get('obs.password')
+        if host and port:
+            try:
+                obs_manager.set_config(host, int(port), pwd or '')
+                logger.info('OBS manager started with saved settings')
+            except Exception:
+                logger.warning('Failed to start OBS manager on startup')
     except Exception:
         pass
     logger.info("Application startup complete")
+
+
+async def _start_ws_bus():
+    await ws_manager.start_bus()
+    if ws_manager.bus is not None:
+        # other workers store notifications too: replay from the shared table only
+        notification_hub.memory_replay = False
+        logger.warning("WS_BUS=%s: game state and game rooms are per worker and not forwarded; "
+                       "route /api/v1/game*, /api/v1/games* and /api/v1/ws/game* to a single worker", ws_manager.bus.name)
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # write out any audit entries still queued in memory
+    audit_writer.stop()
+    # and the latest game state snapshot, if its debounce had not elapsed yet
+    game_store.stop()
+    # send held-back notification digests instead of dropping them
+    await notification_coalescer.flush_all()
+    # release the bus (a unix broker frees its lock so another worker takes over)
+    await ws_manager.stop_bus()
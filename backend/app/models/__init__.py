@@ -10,6 +10,7 @@ from .scheduling import Shift, AvailabilityBlock, ShiftSwapRequest
 from .documents import Document
 from .settings import AppSetting
 from .skates import SkateInventory, SkateRental
+from .notifications import Notification, NotificationCursor
 
 __all__ = [
     "User",
@@ -30,4 +31,6 @@ __all__ = [
     "AppSetting",
     "SkateInventory",
     "SkateRental",
+    "Notification",
+    "NotificationCursor",
 ]
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from sqlalchemy import Integer, String, Text, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from ..db.session import Base
+
+
+class Notification(Base):
+    """Append-only notification log; user_id NULL means broadcast to everyone."""
+    __tablename__ = 'notifications'
+    __table_args__ = (
+        Index('ix_notifications_user_id_id', 'user_id', 'id'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    user_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    type: Mapped[str] = mapped_column(String(20), nullable=False, default='info')
+    message: Mapped[str] = mapped_column(Text, nullable=False)
+    data: Mapped[str] = mapped_column(Text, nullable=True)  # JSON
+
+
+class NotificationCursor(Base):
+    """Per-user read position and unread counter (kept in step with inserts)."""
+    __tablename__ = 'notification_cursors'
+
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    last_read_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    unread: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
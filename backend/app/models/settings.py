@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from sqlalchemy import Integer, String, Text, DateTime
+from sqlalchemy import Integer, String, Text, DateTime, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from ..db.session import Base
 
@@ -17,6 +17,11 @@ class AppSetting(Base):
 
 class AuditLog(Base):
     __tablename__ = 'audit_logs'
+    # On Postgres the table is created by db.partitions.ensure_audit_log_schema (monthly range
+    # partitions + prefix/trigram indexes); these indexes cover the other backends.
+    __table_args__ = (
+        Index('ix_audit_logs_action_timestamp', 'action', 'timestamp'),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), index=True)
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import threading
+import time
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from ..core.config import settings
+from ..db.session import SessionLocal
+from ..models.settings import AuditLog
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    """Background writer for AuditLog rows.
+
+    Request handlers call ``log()`` which only appends to a bounded in-memory queue
+    (thread-safe, never touches the DB, safe from both sync and async handlers). A
+    daemon thread drains the queue every ``flush_interval_ms`` (or sooner once a full
+    batch is waiting) and writes each batch with a single multi-row INSERT.
+
+    When the queue is full new entries are dropped and counted rather than blocking
+    the request path; failed batches are put back at the head of the queue and retried.
+    """
+
+    def __init__(self, max_queue: int = 10000, flush_interval_ms: int = 250, batch_size: int = 500) -> None:
+        self._max_queue = max(1, max_queue)
+        self._interval = max(10, flush_interval_ms) / 1000.0
+        self._batch_size = max(1, batch_size)
+        self._queue: Deque[Dict[str, object]] = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._writing = 0
+        # counters
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failures = 0
+        self.max_depth = 0
+        self.last_flush_ms: float | None = None
+
+    # ---- producer side ----
+    def log(self, user_id: int | None, action: str, details: str | None = None) -> bool:
+        """Queue an audit entry. Returns False if it was dropped because the queue is full."""
+        entry = {
+            'timestamp': datetime.now(timezone.utc),
+            'user_id': user_id,
+            'action': action,
+            'details': details,
+        }
+        with self._cond:
+            if len(self._queue) >= self._max_queue:
+                self.dropped += 1
+                # wake the writer early: a full queue is the backpressure signal
+                self._cond.notify()
+                return False
+            self._queue.append(entry)
+            self.enqueued += 1
+            depth = len(self._queue)
+            if depth > self.max_depth:
+                self.max_depth = depth
+            if depth >= self._batch_size:
+                self._cond.notify()
+        self._ensure_started()
+        return True
+
+    # ---- lifecycle ----
+    def _ensure_started(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the background thread and write whatever is still queued."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self.flush()
+
+    def flush(self) -> int:
+        """Synchronously drain the queue (shutdown, tests). Returns rows written."""
+        total = 0
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                break
+            if not self._write(batch):
+                break
+            total += len(batch)
+        return total
+
+    # ---- consumer side ----
+    def _take_batch(self) -> List[Dict[str, object]]:
+        with self._cond:
+            n = min(self._batch_size, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(n)]
+            self._writing += n
+            return batch
+
+    def _requeue(self, batch: List[Dict[str, object]]) -> None:
+        with self._cond:
+            room = self._max_queue - len(self._queue)
+            keep = batch[:max(0, room)]
+            self.dropped += len(batch) - len(keep)
+            self._queue.extendleft(reversed(keep))
+
+    def _write(self, batch: List[Dict[str, object]]) -> bool:
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            db.execute(insert(AuditLog), batch)
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._cond:
+                self.failures += 1
+                self._writing -= len(batch)
+            logger.exception('Audit batch write failed (%d rows); will retry', len(batch))
+            self._requeue(batch)
+            return False
+        finally:
+            db.close()
+        with self._cond:
+            self.written += len(batch)
+            self.batches += 1
+            self._writing -= len(batch)
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with self._cond:
+                if len(self._queue) < self._batch_size:
+                    self._cond.wait(timeout=self._interval)
+            if self._stop.is_set():
+                break
+            batch = self._take_batch()
+            if batch and not self._write(batch):
+                # back off a little so a DB outage doesn't turn into a hot loop
+                self._stop.wait(min(5.0, self._interval * 10))
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            return {
+                'queued': len(self._queue),
+                'in_flight': self._writing,
+                'capacity': self._max_queue,
+                'enqueued': self.enqueued,
+                'written': self.written,
+                'dropped': self.dropped,
+                'batches': self.batches,
+                'failures': self.failures,
+                'max_depth': self.max_depth,
+                'last_flush_ms': self.last_flush_ms,
+                'running': bool(self._thread and self._thread.is_alive()),
+            }
+
+
+audit_writer = AuditWriter(
+    max_queue=settings.audit_queue_size,
+    flush_interval_ms=settings.audit_flush_interval_ms,
+    batch_size=settings.audit_batch_size,
+)
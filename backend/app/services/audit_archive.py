@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..db.session import SessionLocal
+from ..models.settings import AuditLog
+
+logger = logging.getLogger(__name__)
+
+_SEGMENT_SUFFIX = '.ndjson.gz'
+_INDEX_SUFFIX = '.idx.json'
+# the daily scheduler and POST /admin/audit/archive may run at once: one archiver at a time
+_archive_lock = threading.Lock()
+
+
+def _utc(ts: datetime) -> datetime:
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class AuditArchive:
+    """Cold storage for audit rows that fell out of the hot table.
+
+    Each archive batch becomes one immutable gzip-compressed NDJSON segment (rows in
+    ascending (timestamp, id) order) plus a small JSON sidecar with the time range, id
+    range and per-action counts. Readers only trust segments that have a sidecar; the
+    sidecar is written after the rows are deleted from the DB, so a crash in between is
+    repaired on the next run instead of producing duplicates.
+    """
+
+    def __init__(self, base_dir: Path, session_factory: Callable[[], Session] = SessionLocal) -> None:
+        self.base_dir = Path(base_dir)
+        self._session_factory = session_factory
+
+    # ---- writing ----
+    def archive_before(self, cutoff: datetime, batch_size: int | None = None) -> Dict[str, int]:
+        """Move rows with ``timestamp < cutoff`` into segments, deleting them batch by batch."""
+        with _archive_lock:
+            return self._archive_before(cutoff, max(1, batch_size or settings.audit_archive_batch_size))
+
+    def _archive_before(self, cutoff: datetime, batch_size: int) -> Dict[str, int]:
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self._recover()
+        segments = rows = 0
+        while True:
+            db = self._session_factory()
+            try:
+                batch = db.execute(
+                    select(AuditLog.id, AuditLog.timestamp, AuditLog.user_id, AuditLog.action, AuditLog.details)
+                    .where(AuditLog.timestamp < cutoff)
+                    .order_by(AuditLog.timestamp.asc(), AuditLog.id.asc())
+                    .limit(batch_size)
+                ).all()
+                if not batch:
+                    break
+                records = [
+                    {'id': r.id, 'timestamp': _utc(r.timestamp).isoformat(), 'user_id': r.user_id, 'action': r.action, 'details': r.details}
+                    for r in batch
+                ]
+                seg = self._write_segment(records)
+                self._delete_ids(db, [r['id'] for r in records])
+                self._write_index(seg, records)
+            finally:
+                db.close()
+            segments += 1
+            rows += len(records)
+            if len(batch) < batch_size:
+                break
+        if rows:
+            logger.info(f'Archived {rows} audit rows into {segments} segment(s)')
+        return {'segments': segments, 'rows': rows}
+
+    def _write_segment(self, records: List[Dict[str, object]]) -> Path:
+        first, last = records[0], records[-1]
+        stamp = lambda iso: datetime.fromisoformat(str(iso)).strftime('%Y%m%dT%H%M%S%f')
+        name = f"audit_{stamp(first['timestamp'])}_{stamp(last['timestamp'])}_{first['id']}{_SEGMENT_SUFFIX}"
+        path = self.base_dir / name
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as gz:
+                for rec in records:
+                    gz.write(json.dumps(rec, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+                    gz.write(b'\n')
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, path)
+        _fsync_dir(self.base_dir)
+        return path
+
+    def _write_index(self, seg: Path, records: List[Dict[str, object]]) -> None:
+        idx = {
+            'segment': seg.name,
+            'count': len(records),
+            'min_ts': records[0]['timestamp'],
+            'max_ts': records[-1]['timestamp'],
+            'min_id': min(int(r['id']) for r in records),
+            'max_id': max(int(r['id']) for r in records),
+            'actions': dict(Counter(str(r['action']) for r in records)),
+        }
+        path = self._index_path(seg)
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(idx, fh, separators=(',', ':'))
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+        _fsync_dir(self.base_dir)
+
+    def _delete_ids(self, db: Session, ids: List[int], chunk: int = 1000) -> None:
+        for i in range(0, len(ids), chunk):
+            db.execute(delete(AuditLog).where(AuditLog.id.in_(ids[i:i + chunk])))
+        db.commit()
+
+    def _recover(self) -> None:
+        """Finish segments whose rows may not have been deleted (no sidecar yet)."""
+        for seg in sorted(self.base_dir.glob('*' + _SEGMENT_SUFFIX)):
+            if self._index_path(seg).exists():
+                continue
+            records = list(self._read_segment(seg))
+            if not records:
+                seg.unlink(missing_ok=True)
+                continue
+            db = self._session_factory()
+            try:
+                self._delete_ids(db, [int(r['id']) for r in records])
+            finally:
+                db.close()
+            self._write_index(seg, records)
+            logger.warning(f'Recovered interrupted audit archive segment {seg.name}')
+        for tmp in self.base_dir.glob('*.tmp'):
+            tmp.unlink(missing_ok=True)
+
+    # ---- reading ----
+    @staticmethod
+    def _index_path(seg: Path) -> Path:
+        return seg.with_name(seg.name[:-len(_SEGMENT_SUFFIX)] + _INDEX_SUFFIX)
+
+    def segments(self) -> List[Dict[str, object]]:
+        """Sidecar indexes of all committed segments, newest first."""
+        if not self.base_dir.exists():
+            return []
+        items = []
+        for p in self.base_dir.glob('*' + _INDEX_SUFFIX):
+            try:
+                with open(p, 'r', encoding='utf-8') as fh:
+                    items.append(json.load(fh))
+            except Exception:
+                logger.warning(f'Skipping unreadable audit archive index {p.name}')
+        items.sort(key=lambda i: (str(i['max_ts']), int(i['max_id'])), reverse=True)
+        return items
+
+    def _read_segment(self, seg: Path) -> Iterator[Dict[str, object]]:
+        with gzip.open(seg, 'rt', encoding='utf-8') as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+    def iter_desc(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        action: Optional[str] = None,
+        action_prefix: Optional[str] = None,
+        q: Optional[str] = None,
+        before: Optional[tuple[datetime, int]] = None,
+    ) -> Iterator[Dict[str, object]]:
+        """Yield archived rows newest first, skipping segments via their sidecar index.
+
+        Segments are decompressed one at a time, so memory is bounded by segment size.
+        """
+        since = _utc(since) if since else None
+        until = _utc(until) if until else None
+        before = (_utc(before[0]), before[1]) if before else None
+        needle = q.lower() if q else None
+        for idx in self.segments():
+            lo = datetime.fromisoformat(str(idx['min_ts']))
+            hi = datetime.fromisoformat(str(idx['max_ts']))
+            if since and hi < since:
+                continue
+            if until and lo >= until:
+                continue
+            if before and lo > before[0]:
+                continue
+            actions: Dict[str, int] = idx.get('actions') or {}
+            if action and action not in actions:
+                continue
+            if action_prefix and not any(a.startswith(action_prefix) for a in actions):
+                continue
+            matches = []
+            for rec in self._read_segment(self.base_dir / str(idx['segment'])):
+                ts = datetime.fromisoformat(str(rec['timestamp']))
+                if since and ts < since:
+                    continue
+                if until and ts >= until:
+                    continue
+                if before and (ts, int(rec['id'])) >= before:
+                    continue
+                act = str(rec['action'])
+                if action and act != action:
+                    continue
+                if action_prefix and not act.startswith(action_prefix):
+                    continue
+                if needle and needle not in act.lower() and needle not in str(rec.get('details') or '').lower():
+                    continue
+                rec['timestamp'] = ts
+                matches.append(rec)
+            yield from reversed(matches)
+
+
+def audit_hot_cutoff(now: datetime | None = None) -> datetime:
+    """Oldest timestamp kept in the hot table (AppSetting audit.retention_days, default 90)."""
+    from .settings_cache import settings_cache
+    days = settings_cache.get_int('audit.retention_days', 90)
+    return (now or datetime.now(timezone.utc)) - timedelta(days=max(1, days))
+
+
+audit_archive = AuditArchive(settings.audit_archive_path)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import math
+import time
+from typing import Optional
+
+# Time source for every countdown; tests replace it with a virtual clock
+monotonic = time.monotonic
+# "Server time" sent to clients is the monotonic clock shifted once to the Unix epoch, so
+# deadlines and time-sync replies share one timescale that wall-clock steps cannot move
+_EPOCH_OFFSET = time.time() - time.monotonic()
+
+
+def now() -> float:
+    return monotonic()
+
+
+def server_ms(at: float | None = None) -> int:
+    """Server time in Unix milliseconds for monotonic time ``at`` (default: now)."""
+    return int(round(((now() if at is None else at) + _EPOCH_OFFSET) * 1000.0))
+
+
+def from_server_ms(ms: float) -> float:
+    """Monotonic time of server time ``ms`` (inverse of :func:`server_ms`)."""
+    return ms / 1000.0 - _EPOCH_OFFSET
+
+
+class Countdown:
+    """A countdown kept as "running since monotonic T with X ms remaining".
+
+    Nothing ticks: the remaining time is computed from the clock when asked, so it
+    cannot drift with event-loop lag, and stop/start keeps the fractional second.
+    Display values round up (a clock showing 19:59 has between 1199 and 1200 s left).
+    """
+
+    __slots__ = ('_ms', '_since')
+
+    def __init__(self, seconds: float = 0.0) -> None:
+        self._ms = max(0.0, float(seconds) * 1000.0)
+        self._since: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._since is not None
+
+    def remaining_ms(self, at: float | None = None) -> float:
+        if self._since is None:
+            return self._ms
+        t = now() if at is None else at
+        return max(0.0, self._ms - (t - self._since) * 1000.0)
+
+    def seconds(self, at: float | None = None) -> int:
+        # the small tolerance keeps float noise at an exact boundary from rounding up
+        return max(0, math.ceil(self.remaining_ms(at) / 1000.0 - 1e-6))
+
+    def tenths(self, at: float | None = None) -> int:
+        return max(0, math.ceil(self.remaining_ms(at) / 100.0 - 1e-5))
+
+    def start(self, at: float | None = None) -> None:
+        if self._since is None:
+            self._since = now() if at is None else at
+
+    def stop(self, at: float | None = None) -> None:
+        if self._since is not None:
+            self._ms = self.remaining_ms(at)
+            self._since = None
+
+    def set_ms(self, ms: float, at: float | None = None) -> None:
+        """Load a new remaining time; a running countdown keeps running from ``at``."""
+        self._ms = max(0.0, float(ms))
+        if self._since is not None:
+            self._since = now() if at is None else at
+
+    def set(self, seconds: float, at: float | None = None) -> None:
+        self.set_ms(float(seconds) * 1000.0, at)
+
+    def time_at(self, ms: float) -> Optional[float]:
+        """Monotonic time at which the remaining time equals ``ms`` (running only)."""
+        if self._since is None:
+            return None
+        return self._since + (self._ms - ms) / 1000.0
+
+    def deadline(self) -> Optional[float]:
+        return self.time_at(0.0)
+
+    def next_change(self, at: float | None = None, step_ms: float = 1000.0) -> Optional[float]:
+        """When the displayed value (rounded up to ``step_ms``) next changes, if running."""
+        if self._since is None:
+            return None
+        r = self.remaining_ms(at)
+        if r <= 0:
+            return self.deadline()
+        shown = math.ceil(r / step_ms - 1e-6)
+        return self.time_at((shown - 1) * step_ms)
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TEAMS = ('home', 'away')
+STAT_KEYS = ('goals', 'shots', 'penaltyMinutes')
+
+
+class GameEventLog:
+    """Append-only log of the commands applied to one game.
+
+    Events are plain dicts ``{"seq", "at", "type", "data", "period"}`` (``at`` in server
+    ms, ``period`` the period index when the command was given); the state is the fold of
+    the events over the newest snapshot before them. A snapshot of the full state record
+    is taken every ``snapshot_every`` events, so a rebuild folds at most that many.
+
+    Undo and redo are O(1): the undo stack holds the seqs of undoable events whose effect
+    is live, the redo stack the seqs of the undo events. Undoing appends the inverse of
+    the top event (``"undoes": seq``), redoing the inverse of the undo (``"redoes": seq``);
+    the log itself is never rewritten. Per-period stats are updated as events arrive, an
+    undo or redo subtracting what the event it reverts contributed.
+
+    Persistence is a JSON-lines file per game; new lines are buffered and appended by
+    :meth:`flush`, called from the game state store's writer thread.
+    """
+
+    def __init__(self, game_id: str, path: str | Path | None = None, snapshot_every: int = 50) -> None:
+        self.game_id = game_id
+        self.path = Path(path) if path is not None else None
+        self.snapshot_every = max(1, snapshot_every)
+        self.events: List[Dict[str, Any]] = []
+        # (seq, at, state record): the state right after event ``seq``
+        self.snapshots: List[Tuple[int, int, Dict[str, Any]]] = []
+        self._undo: List[int] = []
+        self._redo: List[int] = []
+        self._stats: Dict[int, Dict[str, Dict[str, int]]] = {}
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+
+    @property
+    def seq(self) -> int:
+        return len(self.events)
+
+    # ---- writing ----
+    def snapshot(self, record: Dict[str, Any], at: int) -> None:
+        """Record the full state as of the current seq (the base of a new log, or periodic)."""
+        self._ingest({"snapshot": self.seq, "at": at, "state": record})
+
+    def append(self, kind: str, data: Dict[str, Any], at: int, period: int, undoable: bool = False,
+               undoes: Optional[int] = None, redoes: Optional[int] = None) -> Dict[str, Any]:
+        event: Dict[str, Any] = {"seq": self.seq + 1, "at": at, "type": kind, "data": data, "period": period}
+        if undoable:
+            event["undoable"] = True
+        if undoes is not None:
+            event["undoes"] = undoes
+        if redoes is not None:
+            event["redoes"] = redoes
+        self._ingest(event)
+        return event
+
+    def due_snapshot(self) -> bool:
+        return self.seq > 0 and self.seq % self.snapshot_every == 0 and (not self.snapshots or self.snapshots[-1][0] != self.seq)
+
+    def _ingest(self, line: Dict[str, Any], persist: bool = True) -> None:
+        if "snapshot" in line:
+            self.snapshots.append((int(line["snapshot"]), int(line["at"]), line["state"]))
+        else:
+            self.events.append(line)
+            if "undoes" in line:
+                self._undo.pop()
+                self._redo.append(line["seq"])
+            elif "redoes" in line:
+                self._redo.pop()
+                self._undo.append(line["seq"])
+            elif line.get("undoable"):
+                self._undo.append(line["seq"])
+                self._redo = []
+            for period, key, team, n in self._contribution(line):
+                periods = self._stats.setdefault(period, {k: {t: 0 for t in TEAMS} for k in STAT_KEYS})
+                periods[key][team] += n
+        if persist and self.path is not None:
+            text = json.dumps(line, separators=(',', ':'))
+            with self._lock:
+                self._pending.append(text)
+
+    # ---- undo / redo ----
+    def event(self, seq: int) -> Dict[str, Any]:
+        return self.events[seq - 1]
+
+    def undo_target(self) -> Optional[Dict[str, Any]]:
+        """Event the next undo reverts."""
+        return self.event(self._undo[-1]) if self._undo else None
+
+    def redo_target(self) -> Optional[Dict[str, Any]]:
+        """Undo event the next redo reverts."""
+        return self.event(self._redo[-1]) if self._redo else None
+
+    # ---- stats ----
+    def _contribution(self, event: Dict[str, Any]) -> List[Tuple[int, str, str, int]]:
+        reverts = event.get("undoes", event.get("redoes"))
+        if reverts is not None:
+            return [(p, k, t, -n) for p, k, t, n in self._contribution(self.event(reverts))]
+        data, kind = event.get("data") or {}, event.get("type")
+        team = data.get("team")
+        if team not in TEAMS:
+            return []
+        if kind == "score":
+            return [(event["period"], "goals", team, int(data.get("delta", 0)))]
+        if kind == "shots":
+            return [(event["period"], "shots", team, int(data.get("delta", 0)))]
+        if kind == "penaltyAdd" and data.get("minutes"):
+            return [(event["period"], "penaltyMinutes", team, int(data["minutes"]))]
+        return []
+
+    def stats(self) -> Dict[str, Any]:
+        """Goals, shots and penalty minutes per period index and in total."""
+        totals = {k: {t: 0 for t in TEAMS} for k in STAT_KEYS}
+        for period in self._stats.values():
+            for k in STAT_KEYS:
+                for t in TEAMS:
+                    totals[k][t] += period[k][t]
+        return {
+            "gameId": self.game_id,
+            "periods": {str(p): self._stats[p] for p in sorted(self._stats)},
+            "totals": totals,
+            "canUndo": bool(self._undo),
+            "canRedo": bool(self._redo),
+        }
+
+    # ---- rebuild ----
+    def base(self, upto: Optional[int] = None) -> Tuple[int, int, Dict[str, Any]]:
+        """Newest snapshot at or before ``upto`` (default: the end of the log)."""
+        limit = self.seq if upto is None else upto
+        for snap in reversed(self.snapshots):
+            if snap[0] <= limit:
+                return snap
+        raise LookupError(f'game {self.game_id}: no snapshot before seq {limit}')
+
+    def since(self, seq: int, upto: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.events[seq:self.seq if upto is None else upto]
+
+    # ---- persistence ----
+    def flush(self) -> None:
+        """Append the buffered lines to the log file and fsync it."""
+        if self.path is None:
+            return
+        with self._lock:
+            lines, self._pending = self._pending, []
+        if not lines:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception:
+            with self._lock:
+                self._pending[:0] = lines
+            raise
+
+    @classmethod
+    def load(cls, game_id: str, path: str | Path, snapshot_every: int = 50) -> Optional["GameEventLog"]:
+        """Read a log back from its file; None if there is no such log."""
+        log = cls(game_id, path, snapshot_every)
+        try:
+            with open(log.path, 'r', encoding='utf-8') as f:
+                for raw in f:
+                    raw = raw.strip()
+                    if not raw:
+                        continue
+                    try:
+                        line = json.loads(raw)
+                    except ValueError:
+                        # a torn last line after a crash: everything before it is intact
+                        logger.warning('Ignoring unreadable line in game log %s', log.path)
+                        break
+                    log._ingest(line, persist=False)
+        except FileNotFoundError:
+            return None
+        return log if log.snapshots else None
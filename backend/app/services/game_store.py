@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class GameStateStore:
+    """Write-behind persistence of the live game state to a local JSON file.
+
+    ``save()`` only keeps a reference to the latest document and wakes a daemon thread
+    (never touches the disk, safe from the event loop). The thread waits ``debounce_ms``
+    so a burst of clicks becomes one write, then writes the newest document to a temp
+    file, fsyncs it and renames it over the old one: a crash leaves either the previous
+    or the new snapshot on disk, never a torn one.
+
+    Flushers registered with :meth:`add_flusher` (the game event log) run in the same
+    pass, before the snapshot is written.
+    """
+
+    def __init__(self, path: str | Path, debounce_ms: int = 200) -> None:
+        self.path = Path(path)
+        self._debounce = max(0, debounce_ms) / 1000.0
+        self._pending: Optional[Dict[str, Any]] = None
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._flushers: List[Callable[[], None]] = []
+        # counters
+        self.saves = 0
+        self.writes = 0
+        self.failures = 0
+        self.last_write_ms: float | None = None
+
+    # ---- producer side ----
+    def save(self, document: Dict[str, Any]) -> None:
+        """Queue ``document`` for writing; supersedes any document not yet written."""
+        with self._cond:
+            self._pending = document
+            self.saves += 1
+            self._cond.notify()
+        self._ensure_started()
+
+    def add_flusher(self, flush: Callable[[], None]) -> None:
+        self._flushers.append(flush)
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Last snapshot written, or None if there is none (or it is unreadable)."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.exception('Unreadable game state snapshot %s; starting from defaults', self.path)
+            return None
+
+    # ---- lifecycle ----
+    def _ensure_started(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='game-state-store', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the background thread and write the pending document, if any."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self.flush()
+
+    def flush(self) -> bool:
+        """Synchronously write the pending document (shutdown, tests)."""
+        with self._cond:
+            document, self._pending = self._pending, None
+        return document is None or self._write(document)
+
+    # ---- consumer side ----
+    def _write(self, document: Dict[str, Any]) -> bool:
+        started = time.perf_counter()
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        try:
+            for flush in self._flushers:
+                flush()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(document, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            # make the rename itself durable
+            try:
+                fd = os.open(self.path.parent, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except OSError:
+                pass  # directories cannot be fsync'd on every platform
+        except Exception:
+            with self._cond:
+                self.failures += 1
+                # keep it for the next attempt unless a newer document arrived meanwhile
+                if self._pending is None:
+                    self._pending = document
+            logger.exception('Game state snapshot write failed; will retry')
+            return False
+        with self._cond:
+            self.writes += 1
+            self.last_write_ms = round((time.perf_counter() - started) * 1000, 2)
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with self._cond:
+                if self._pending is None:
+                    self._cond.wait()
+            if self._stop.is_set():
+                break
+            # debounce: later saves in the window replace the pending document
+            self._stop.wait(self._debounce)
+            if not self.flush():
+                # back off a little so a full or read-only disk doesn't turn into a hot loop
+                self._stop.wait(1.0)
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            return {
+                'path': str(self.path),
+                'pending': self._pending is not None,
+                'saves': self.saves,
+                'writes': self.writes,
+                'failures': self.failures,
+                'last_write_ms': self.last_write_ms,
+                'running': bool(self._thread and self._thread.is_alive()),
+            }
+
+
+game_store = GameStateStore(settings.game_state_path, debounce_ms=settings.game_state_debounce_ms)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+_REMOVED = object()
+
+
+class DeadlineQueue:
+    """Keys with one deadline each (monotonic seconds), kept in a min-heap.
+
+    :meth:`schedule` sets, moves or cancels a key's deadline in O(log n): the superseded
+    heap entry stays where it is and is skipped when it surfaces (lazy deletion).
+    :meth:`wait` sleeps until the earliest deadline, or until :meth:`schedule` moves it
+    earlier, and returns the keys that are due; with nothing scheduled it waits with no
+    timeout at all, so an idle queue costs no wakeups.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[list] = []
+        self._entries: Dict[Hashable, list] = {}
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        # counters
+        self.wakeups = 0
+        self.fired = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def schedule(self, key: Hashable, when: float | None) -> None:
+        """Set ``key`` to fire at ``when``; None cancels it."""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            old[2] = _REMOVED
+        if when is None:
+            return
+        entry = [when, next(self._seq), key]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry and self._wakeup is not None:
+            self._wakeup.set()  # earlier than what the waiter sleeps towards
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            # mostly superseded entries: drop them in one O(n) pass
+            self._heap = [e for e in self._heap if e[2] is not _REMOVED]
+            heapq.heapify(self._heap)
+
+    def cancel(self, key: Hashable) -> None:
+        self.schedule(key, None)
+
+    def deadline(self, key: Hashable) -> Optional[float]:
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def next_deadline(self) -> Optional[float]:
+        heap = self._heap
+        while heap and heap[0][2] is _REMOVED:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_due(self, now: float) -> List[Any]:
+        """Remove and return the keys whose deadline is at or before ``now`` (earliest first)."""
+        due = []
+        while (when := self.next_deadline()) is not None and when <= now:
+            key = heapq.heappop(self._heap)[2]
+            del self._entries[key]
+            due.append(key)
+        self.fired += len(due)
+        return due
+
+    async def wait(self, clock: Callable[[], float]) -> List[Any]:
+        """Sleep until at least one key is due on ``clock`` and return the due keys."""
+        while True:
+            # a fresh event per wait: the queue outlives the event loops it is awaited in
+            self._wakeup = asyncio.Event()
+            now = clock()
+            due = self.pop_due(now)
+            if due:
+                return due
+            when = self.next_deadline()
+            # 1ms past the deadline so it is already due when we wake
+            timeout = None if when is None else max(0.0, when - now) + 0.001
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._wakeup = None
+            self.wakeups += 1
+
+    def stats(self) -> Dict[str, object]:
+        return {'scheduled': len(self._entries), 'heap': len(self._heap), 'next': self.next_deadline(),
+                'wakeups': self.wakeups, 'fired': self.fired}
@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..db.session import SessionLocal
+from ..models.notifications import Notification, NotificationCursor
+
+logger = logging.getLogger(__name__)
+
+
+def notification_payload(n: Notification) -> Dict[str, Any]:
+    """WS/REST shape of a stored notification (same keys the frontend already reads)."""
+    ts = n.created_at
+    if ts is not None and ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return {
+        "type": "notification",
+        "id": n.id,
+        "notification_type": n.type,
+        "message": n.message,
+        "data": json.loads(n.data) if n.data else {},
+        "timestamp": ts.isoformat() if ts else None,
+        "broadcast": n.user_id is None,
+    }
+
+
+class _Ring:
+    """Bounded buffer that knows how far back it is complete.
+
+    Every payload with id > ``floor`` that belongs to this buffer is in ``items``.
+    """
+
+    __slots__ = ('items', 'floor', 'size')
+
+    def __init__(self, size: int, floor: int) -> None:
+        self.items: Deque[Dict[str, Any]] = deque()
+        self.floor = floor
+        self.size = size
+
+    def append(self, payload: Dict[str, Any]) -> None:
+        # ids come from concurrent DB inserts and may arrive out of order: keep items sorted
+        pid = payload['id']
+        if pid <= self.floor:
+            return  # older than the buffer reaches back: replay reads it from the table
+        i = len(self.items)
+        while i and self.items[i - 1]['id'] > pid:
+            i -= 1
+        self.items.insert(i, payload)
+        while len(self.items) > self.size:
+            self.floor = self.items.popleft()['id']
+
+    def after(self, after_id: int) -> List[Dict[str, Any]]:
+        return [p for p in self.items if p['id'] > after_id]
+
+
+class NotificationHub:
+    """Stores notifications and serves replay after a reconnect.
+
+    Every notification is appended to the ``notifications`` table and to a bounded ring
+    buffer (the user's own, or the shared broadcast one). Replay after a client's last
+    seen id is answered from memory when the buffers reach back far enough, otherwise
+    from the table. The number of per-user buffers is capped (LRU).
+    """
+
+    def __init__(
+        self,
+        buffer_size: int | None = None,
+        max_users: int | None = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ) -> None:
+        self.buffer_size = buffer_size or settings.notification_buffer_size
+        self.max_users = max_users or settings.notification_buffer_users
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._users: "OrderedDict[int, _Ring]" = OrderedDict()
+        self._broadcast: Optional[_Ring] = None
+        # highest id already in the table when the hub started, and the newest id of any
+        # per-user buffer dropped by the LRU; replay older than these goes to the DB
+        self._start_floor: Optional[int] = None
+        self._lru_floor = 0
+        self.replayed_from_memory = 0
+        self.replayed_from_db = 0
+        # off with several workers: the buffers only see this process's notifications
+        self.memory_replay = True
+
+    def _ensure_floor(self, db: Session) -> None:
+        if self._start_floor is None:
+            self._start_floor = db.query(func.max(Notification.id)).scalar() or 0
+            self._broadcast = _Ring(self.buffer_size, self._start_floor)
+
+    # ---- write ----
+    def store(self, user_id: int | None, message: str, notification_type: str = 'info', data: dict | None = None) -> Dict[str, Any]:
+        """Persist a notification, bump unread counters and return its payload."""
+        db = self._session_factory()
+        try:
+            with self._lock:
+                self._ensure_floor(db)
+            n = Notification(
+                user_id=user_id,
+                type=notification_type,
+                message=message,
+                data=json.dumps(data, separators=(',', ':'), default=str) if data else None,
+                created_at=datetime.now(timezone.utc),
+            )
+            db.add(n)
+            db.flush()
+            # users without a cursor row get theirs computed on first read
+            stmt = update(NotificationCursor).values(unread=NotificationCursor.unread + 1)
+            if user_id is not None:
+                stmt = stmt.where(NotificationCursor.user_id == user_id)
+            db.execute(stmt)
+            db.commit()
+            payload = notification_payload(n)
+        finally:
+            db.close()
+        self._remember(user_id, payload)
+        return payload
+
+    def _remember(self, user_id: int | None, payload: Dict[str, Any]) -> None:
+        with self._lock:
+            if user_id is None:
+                self._broadcast.append(payload)
+                return
+            ring = self._users.get(user_id)
+            if ring is None:
+                ring = self._users[user_id] = _Ring(self.buffer_size, max(self._start_floor or 0, self._lru_floor))
+                while len(self._users) > self.max_users:
+                    _, old = self._users.popitem(last=False)
+                    if old.items:
+                        self._lru_floor = max(self._lru_floor, old.items[-1]['id'])
+            else:
+                self._users.move_to_end(user_id)
+            ring.append(payload)
+
+    # ---- replay ----
+    def replay(self, user_id: int, after_id: int, limit: int = 200) -> List[Dict[str, Any]]:
+        """Notifications for ``user_id`` (own + broadcast) with id > ``after_id``, oldest first."""
+        with self._lock:
+            if self._broadcast is not None and self.memory_replay:
+                own = self._users.get(user_id)
+                own_floor = own.floor if own else max(self._start_floor or 0, self._lru_floor)
+                if after_id >= own_floor and after_id >= self._broadcast.floor:
+                    items = (own.after(after_id) if own else []) + self._broadcast.after(after_id)
+                    items.sort(key=lambda p: p['id'])
+                    self.replayed_from_memory += 1
+                    return items[:limit]
+        db = self._session_factory()
+        try:
+            self.replayed_from_db += 1
+            rows = (
+                db.query(Notification)
+                .filter(Notification.id > after_id)
+                .filter(or_(Notification.user_id == user_id, Notification.user_id.is_(None)))
+                .order_by(Notification.id.asc())
+                .limit(limit)
+                .all()
+            )
+            return [notification_payload(n) for n in rows]
+        finally:
+            db.close()
+
+    # ---- inbox ----
+    def cursor(self, db: Session, user_id: int) -> NotificationCursor:
+        cur = db.get(NotificationCursor, user_id)
+        if cur is None:
+            cur = NotificationCursor(user_id=user_id, last_read_id=0, unread=self._count_unread(db, user_id, 0))
+            db.add(cur)
+            db.commit()
+        return cur
+
+    def _count_unread(self, db: Session, user_id: int, last_read_id: int) -> int:
+        return (
+            db.query(func.count(Notification.id))
+            .filter(Notification.id > last_read_id)
+            .filter(or_(Notification.user_id == user_id, Notification.user_id.is_(None)))
+            .scalar()
+        ) or 0
+
+    def mark_read(self, db: Session, user_id: int, up_to_id: int | None = None) -> NotificationCursor:
+        """Move the read cursor to ``up_to_id`` (default: latest) and recount unread."""
+        cur = self.cursor(db, user_id)
+        if up_to_id is None:
+            up_to_id = db.query(func.max(Notification.id)).scalar() or 0
+        if up_to_id > cur.last_read_id:
+            cur.last_read_id = up_to_id
+            cur.unread = self._count_unread(db, user_id, up_to_id)
+            db.commit()
+        return cur
+
+    def page(self, db: Session, user_id: int, before_id: int | None = None, limit: int = 50) -> List[Dict[str, Any]]:
+        q = db.query(Notification).filter(or_(Notification.user_id == user_id, Notification.user_id.is_(None)))
+        if before_id is not None:
+            q = q.filter(Notification.id < before_id)
+        return [notification_payload(n) for n in q.order_by(Notification.id.desc()).limit(limit).all()]
+
+
+notification_hub = NotificationHub()
+
+
+# Plural labels used in digest messages, by coalesce key
+DIGEST_LABELS = {
+    'skates.rental': 'noleggi',
+    'skates.return': 'restituzioni',
+    'tasks.assigned': 'nuovi incarichi',
+}
+_SEVERITY = {'info': 0, 'success': 1, 'warning': 2, 'danger': 3}
+
+Deliver = Callable[[Optional[int], str, str, Optional[dict]], Awaitable[None]]
+
+
+class _Target:
+    __slots__ = ('tokens', 'refilled_at', 'open_keys', 'pending', 'flush_handle')
+
+    def __init__(self, capacity: float, now: float) -> None:
+        self.tokens = capacity
+        self.refilled_at = now
+        self.open_keys: set = set()
+        self.pending: List[tuple] = []
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+
+
+class NotificationCoalescer:
+    """Groups bursts of notifications per recipient into periodic digests.
+
+    For each recipient (a user id, or None for everyone):
+
+    * the first event of a coalesce key goes out immediately and opens a window;
+      further events with that key inside the window are held back;
+    * a token bucket caps immediate sends at ``rate_per_minute``; over the cap,
+      events (with or without key) are held back too;
+    * when the window closes, held events are sent as one digest, e.g.
+      "12 noleggi, 9 restituzioni negli ultimi 30s", with every original event listed
+      in ``data.items`` so nothing is lost.
+    """
+
+    def __init__(self, deliver: Deliver, window_s: float | None = None, rate_per_minute: int | None = None, max_items: int = 200) -> None:
+        self.deliver = deliver
+        self.window_s = window_s if window_s is not None else settings.notification_coalesce_window
+        self.rate_per_minute = rate_per_minute if rate_per_minute is not None else settings.notification_rate_per_minute
+        self.max_items = max_items
+        self._targets: Dict[Optional[int], _Target] = {}
+        self.sent = 0
+        self.held = 0
+        self.digests = 0
+
+    def _allow(self, t: _Target, now: float) -> bool:
+        if self.rate_per_minute <= 0:
+            return True
+        t.tokens = min(float(self.rate_per_minute), t.tokens + (now - t.refilled_at) * self.rate_per_minute / 60.0)
+        t.refilled_at = now
+        if t.tokens >= 1.0:
+            t.tokens -= 1.0
+            return True
+        return False
+
+    async def submit(self, user_id: int | None, message: str, notification_type: str = 'info', data: dict | None = None, key: str | None = None) -> bool:
+        """Send now or hold for the next digest; returns True if sent immediately."""
+        if self.window_s <= 0:
+            await self.deliver(user_id, message, notification_type, data)
+            self.sent += 1
+            return True
+        now = time.monotonic()
+        t = self._targets.get(user_id)
+        if t is None:
+            t = self._targets[user_id] = _Target(float(max(1, self.rate_per_minute)), now)
+        if (key is None or key not in t.open_keys) and self._allow(t, now):
+            if key is not None:
+                t.open_keys.add(key)
+                self._schedule(user_id, t)
+            await self.deliver(user_id, message, notification_type, data)
+            self.sent += 1
+            return True
+        t.pending.append((key or notification_type, message, notification_type, data))
+        self.held += 1
+        self._schedule(user_id, t)
+        return False
+
+    def _schedule(self, user_id: int | None, t: _Target) -> None:
+        if t.flush_handle is None:
+            loop = asyncio.get_running_loop()
+            t.flush_handle = loop.call_later(self.window_s, lambda: loop.create_task(self.flush(user_id)))
+
+    async def flush(self, user_id: int | None) -> None:
+        """Close the window for ``user_id`` and send its digest if anything was held."""
+        t = self._targets.get(user_id)
+        if t is None:
+            return
+        if t.flush_handle is not None:
+            t.flush_handle.cancel()
+            t.flush_handle = None
+        pending, t.pending = t.pending, []
+        t.open_keys.clear()
+        if not pending:
+            now = time.monotonic()
+            if t.tokens + (now - t.refilled_at) * self.rate_per_minute / 60.0 >= self.rate_per_minute:
+                self._targets.pop(user_id, None)  # idle with a full bucket: forget the recipient
+            return
+        counts: Dict[str, int] = {}
+        for key, *_ in pending:
+            counts[key] = counts.get(key, 0) + 1
+        parts = [f"{n} {DIGEST_LABELS.get(k, k)}" for k, n in counts.items()]
+        window = int(self.window_s) if float(self.window_s).is_integer() else self.window_s
+        message = f"{', '.join(parts)} negli ultimi {window}s"
+        ntype = max((p[2] for p in pending), key=lambda v: _SEVERITY.get(v, 0))
+        items = [{'message': m, 'type': nt, 'data': d or {}} for _, m, nt, d in pending[: self.max_items]]
+        data = {'digest': True, 'counts': counts, 'items': items, 'truncated': max(0, len(pending) - self.max_items)}
+        self.digests += 1
+        await self.deliver(user_id, message, ntype, data)
+
+    async def flush_all(self) -> None:
+        for user_id in list(self._targets):
+            await self.flush(user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'window_s': self.window_s,
+            'rate_per_minute': self.rate_per_minute,
+            'recipients': len(self._targets),
+            'pending': sum(len(t.pending) for t in self._targets.values()),
+            'sent': self.sent,
+            'held': self.held,
+            'digests': self.digests,
+        }
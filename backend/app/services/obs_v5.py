@@ -81,7 +81,6 @@ class ObsManager:
             except Exception:
                 logger.warning('OBS client library not available in this environment')
                 try:
-                    global OBS_AVAILABLE
                     OBS_AVAILABLE = False
                 except Exception:
                     pass
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Mapping, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..db.session import SessionLocal
+from ..models.settings import AppSetting
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = 'settings_cache.pending'
+
+
+class SettingsCache:
+    """In-process cache of the AppSetting table.
+
+    All rows are loaded with a single query and kept in a dict. Writers go through
+    ``put``/``put_many`` which perform one bulk upsert in the caller's session; the
+    cached values are updated only after that session commits (write-through), so a
+    rolled back request never leaks into the cache. A TTL forces a periodic reload so
+    changes made by other processes are eventually picked up.
+    """
+
+    def __init__(self, ttl_seconds: float = 30.0) -> None:
+        self._values: Dict[str, str] = {}
+        self._loaded_at: Optional[float] = None
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+
+    # ---- loading ----
+    def reload(self, db: Session | None = None) -> None:
+        own = db is None
+        session = db or SessionLocal()
+        try:
+            rows = session.query(AppSetting.key, AppSetting.value).all()
+        finally:
+            if own:
+                session.close()
+        with self._lock:
+            self._values = {k: v for k, v in rows}
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_loaded(self, db: Session | None) -> None:
+        loaded = self._loaded_at
+        if loaded is None or (self._ttl > 0 and time.monotonic() - loaded > self._ttl):
+            try:
+                self.reload(db)
+            except Exception:
+                # keep serving the previous snapshot if the DB is briefly unavailable
+                if loaded is None:
+                    raise
+                logger.warning('Settings cache reload failed; serving stale values')
+
+    # ---- typed getters ----
+    def get(self, key: str, default: str | None = None, db: Session | None = None) -> str | None:
+        self._ensure_loaded(db)
+        return self._values.get(key, default)
+
+    def get_int(self, key: str, default: int, db: Session | None = None) -> int:
+        raw = self.get(key, None, db)
+        try:
+            return int(raw) if raw not in (None, '') else default
+        except (TypeError, ValueError):
+            return default
+
+    def get_bool(self, key: str, default: bool = False, db: Session | None = None) -> bool:
+        raw = self.get(key, None, db)
+        if raw is None or raw == '':
+            return default
+        return raw.strip().lower() in ('1', 'true', 'yes', 'on')
+
+    def get_json(self, key: str, default: Any = None, db: Session | None = None) -> Any:
+        raw = self.get(key, None, db)
+        if not raw:
+            return default
+        try:
+            return json.loads(raw)
+        except Exception:
+            return default
+
+    def items(self, db: Session | None = None) -> Dict[str, str]:
+        self._ensure_loaded(db)
+        return dict(self._values)
+
+    # ---- writes ----
+    def put(self, db: Session, key: str, value: str) -> None:
+        self.put_many(db, {key: value})
+
+    def put_many(self, db: Session, items: Mapping[str, str]) -> None:
+        """Upsert ``items`` in one statement; the cache is updated when ``db`` commits."""
+        if not items:
+            return
+        _bulk_upsert(db, items)
+        pending: Dict[str, str] = db.info.setdefault(_PENDING_KEY, {})
+        pending.update(items)
+
+    def _apply(self, items: Mapping[str, str]) -> None:
+        with self._lock:
+            self._values.update(items)
+
+
+def _bulk_upsert(db: Session, items: Mapping[str, str]) -> None:
+    now = datetime.now(timezone.utc)
+    dialect = db.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(AppSetting).values([{'key': k, 'value': v, 'updated_at': now} for k, v in items.items()])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AppSetting.key],
+            set_={'value': stmt.excluded.value, 'updated_at': stmt.excluded.updated_at},
+        )
+        db.execute(stmt)
+        return
+    # generic fallback: one SELECT for all keys, then update/insert in the same flush
+    existing = {r.key: r for r in db.query(AppSetting).filter(AppSetting.key.in_(list(items))).all()}
+    for k, v in items.items():
+        row = existing.get(k)
+        if row:
+            row.value = v
+            row.updated_at = now
+        else:
+            db.add(AppSetting(key=k, value=v, updated_at=now))
+
+
+settings_cache = SettingsCache(ttl_seconds=settings.settings_cache_ttl)
+
+
+@event.listens_for(Session, 'after_commit')
+def _settings_after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        settings_cache._apply(pending)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _settings_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import secrets
+from typing import Any, Dict, Optional
+
+from .ws_manager import Frame, dumps
+
+_MISSING = object()
+
+
+class VersionedState:
+    """Turns successive snapshots of a flat state dict into versioned WS messages.
+
+    Every change bumps ``version``. Clients get either a full keyframe
+    ``{"type": "state", "v": N, "payload": {...}}`` or a delta
+    ``{"type": "delta", "v": N, "changes": {...}}`` holding only the keys whose value
+    changed since version N-1. A keyframe goes out every ``keyframe_every`` versions so
+    late or lossy clients converge; a client whose version is not N-1 asks for a resync
+    and gets :meth:`keyframe`.
+    """
+
+    def __init__(self, keyframe_every: int = 30) -> None:
+        self.keyframe_every = max(1, keyframe_every)
+        self.version = 0
+        self._last: Optional[Dict[str, Any]] = None
+        self._since_keyframe = 0
+        self._json: Optional[tuple[int, bytes]] = None
+        # versions resume after a restart; the epoch keeps ETags of an earlier process from matching
+        self.epoch = secrets.token_hex(4)
+
+    def update(self, snapshot: Dict[str, Any]) -> Optional[Frame]:
+        """Record ``snapshot``; returns the frame to broadcast, or None if nothing changed."""
+        if self._last is None:
+            changes = dict(snapshot)
+        else:
+            changes = {k: v for k, v in snapshot.items() if self._last.get(k, _MISSING) != v}
+            for k in self._last.keys() - snapshot.keys():
+                changes[k] = None
+            if not changes:
+                return None
+        self.version += 1
+        self._last = dict(snapshot)
+        self._since_keyframe += 1
+        if self._since_keyframe >= self.keyframe_every or len(changes) == len(snapshot):
+            self._since_keyframe = 0
+            return self.keyframe()
+        # deltas must never be coalesced away by a send queue, so they carry no type
+        message = {"type": "delta", "v": self.version, "changes": changes}
+        return Frame(dumps(message), None, message)
+
+    def resume(self, version: int) -> None:
+        """Continue numbering after ``version`` (state restored after a restart), so clients
+        that kept their socket's version never see the stream go backwards."""
+        self.version = max(self.version, int(version))
+
+    def keyframe(self) -> Frame:
+        """Full state at the current version (also used to answer a client resync)."""
+        return Frame.encode({"type": "state", "v": self.version, "payload": self._last or {}})
+
+    def current_json(self) -> bytes:
+        """Last recorded state with ``version`` attached, as UTF-8 JSON encoded once per version.
+
+        Lets pollers be answered without rebuilding or re-encoding the snapshot.
+        """
+        if self._json is None or self._json[0] != self.version:
+            self._json = (self.version, dumps({**(self._last or {}), "version": self.version}).encode('utf-8'))
+        return self._json[1]
+
+    def etag(self) -> str:
+        """Strong ETag of :meth:`current_json`: changes with every version."""
+        return f'"{self.epoch}-{self.version}"'
+
+    def versioned(self, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        """``snapshot`` with the current version attached, for REST responses."""
+        return {**snapshot, "version": self.version}
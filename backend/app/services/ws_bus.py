@@ -0,0 +1,368 @@
+"""Cross-process fan-out for WSManager broadcasts.
+
+With several uvicorn workers every worker owns its own sockets. A broadcast is delivered
+to the local sockets first and then published once on a bus; the other workers deliver it
+to theirs. Backends:
+
+* ``local``    – single process, publish is a no-op (default)
+* ``unix``     – a Unix-socket broker; the first worker to take the lock file binds the
+                 socket and relays frames, every worker (broker included) connects to it
+* ``postgres`` – LISTEN/NOTIFY on the application database
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import logging
+import os
+import struct
+import threading
+import uuid
+from pathlib import Path
+from queue import Empty, SimpleQueue
+from typing import Callable, Optional, Set
+
+from ..core.config import settings
+from .ws_manager import Frame
+
+try:
+    import fcntl
+except Exception:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+OnMessage = Callable[[str, Frame], None]
+
+_HEADER = struct.Struct('>I')
+_MAX_FRAME = 16 * 1024 * 1024
+
+
+def encode_wire(room: str, frame: Frame) -> bytes:
+    """length | flags(1) | type_len(1) | type | room_len(2) | room | data"""
+    is_bytes = isinstance(frame.data, (bytes, bytearray))
+    data = bytes(frame.data) if is_bytes else frame.data.encode('utf-8')
+    kind = (frame.type or '').encode('utf-8')[:255]
+    room_b = room.encode('utf-8')
+    body = bytes([1 if is_bytes else 0, len(kind)]) + kind + struct.pack('>H', len(room_b)) + room_b + data
+    return _HEADER.pack(len(body)) + body
+
+
+def decode_wire(body: bytes) -> tuple[str, Frame]:
+    is_bytes, klen = body[0], body[1]
+    kind = body[2:2 + klen].decode('utf-8') or None
+    off = 2 + klen
+    (rlen,) = struct.unpack_from('>H', body, off)
+    off += 2
+    room = body[off:off + rlen].decode('utf-8')
+    data = body[off + rlen:]
+    return room, Frame(data if is_bytes else data.decode('utf-8'), kind)
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    if size > _MAX_FRAME:
+        raise ConnectionError(f'bus frame too large ({size} bytes)')
+    return await reader.readexactly(size)
+
+
+class LocalBus:
+    """Single-process deployments: nothing to forward."""
+
+    name = 'local'
+
+    def __init__(self, on_message: OnMessage) -> None:
+        self.on_message = on_message
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def publish(self, room: str, frame: Frame) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {'backend': self.name}
+
+
+class UnixSocketBus:
+    """Broker-over-Unix-socket bus; whoever holds the lock file is the broker."""
+
+    name = 'unix'
+
+    def __init__(self, on_message: OnMessage, path: str | Path, reconnect_delay: float = 0.5) -> None:
+        self.on_message = on_message
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + '.lock')
+        self.reconnect_delay = reconnect_delay
+        self.is_broker = False
+        self.published = 0
+        self.received = 0
+        self._lock_fd: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Set[asyncio.StreamWriter] = set()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+        self._stopped = False
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def wait_connected(self, timeout: float = 5.0) -> None:
+        await asyncio.wait_for(self._connected.wait(), timeout)
+
+    async def stop(self) -> None:
+        self._stopped = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._close_client()
+        if self._server is not None:
+            self._server.close()
+            for peer in list(self._peers):
+                peer.close()
+            try:
+                await self._server.wait_closed()
+            except Exception:
+                pass
+            self._server = None
+            try:
+                self.path.unlink()
+            except OSError:
+                pass
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        self.is_broker = False
+
+    def publish(self, room: str, frame: Frame) -> None:
+        # never blocks the caller: StreamWriter buffers, the loop flushes
+        if self._writer is None:
+            return
+        try:
+            self._writer.write(encode_wire(room, frame))
+            self.published += 1
+        except Exception:
+            self._close_client()
+
+    # ---- broker ----
+    async def _try_become_broker(self) -> None:
+        if self._server is not None or fcntl is None:
+            return
+        fd = os.open(str(self.lock_path), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return
+        self._lock_fd = fd
+        try:
+            self.path.unlink()  # stale socket from a broker that died
+        except OSError:
+            pass
+        self._server = await asyncio.start_unix_server(self._serve_peer, path=str(self.path))
+        self.is_broker = True
+        logger.info(f'WS bus broker listening on {self.path} (pid {os.getpid()})')
+
+    async def _serve_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._peers.add(writer)
+        try:
+            while True:
+                body = await _read_frame(reader)
+                packet = _HEADER.pack(len(body)) + body
+                for peer in list(self._peers):
+                    if peer is not writer:
+                        try:
+                            peer.write(packet)
+                        except Exception:
+                            self._peers.discard(peer)
+        except (asyncio.IncompleteReadError, ConnectionError, OSError):
+            pass
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+    # ---- client ----
+    async def _run(self) -> None:
+        while not self._stopped:
+            try:
+                await self._try_become_broker()
+                reader, writer = await asyncio.open_unix_connection(str(self.path))
+                self._writer = writer
+                self._connected.set()
+                while True:
+                    room, frame = decode_wire(await _read_frame(reader))
+                    self.received += 1
+                    try:
+                        self.on_message(room, frame)
+                    except Exception:
+                        logger.exception('WS bus delivery failed')
+            except asyncio.CancelledError:
+                raise
+            except (asyncio.IncompleteReadError, ConnectionError, FileNotFoundError, OSError) as e:
+                logger.debug(f'WS bus connection lost: {e}')
+            finally:
+                self._close_client()
+            # the broker may have died: next loop iteration races for the lock again
+            await asyncio.sleep(self.reconnect_delay)
+
+    def _close_client(self) -> None:
+        self._connected.clear()
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except Exception:
+                pass
+            self._writer = None
+
+    def stats(self) -> dict:
+        return {
+            'backend': self.name,
+            'path': str(self.path),
+            'broker': self.is_broker,
+            'peers': len(self._peers),
+            'connected': self._writer is not None,
+            'published': self.published,
+            'received': self.received,
+        }
+
+
+class PostgresBus:
+    """LISTEN/NOTIFY bus. One dedicated connection in a thread both listens and notifies.
+
+    NOTIFY payloads are capped at 8000 bytes by Postgres; larger frames are delivered
+    locally only and counted in ``oversize``.
+    """
+
+    name = 'postgres'
+    MAX_PAYLOAD = 7900
+
+    def __init__(self, on_message: OnMessage, dsn: str, channel: str = 'ws_fanout') -> None:
+        self.on_message = on_message
+        self.dsn = dsn
+        self.channel = channel
+        self.origin = uuid.uuid4().hex[:12]
+        self.published = 0
+        self.received = 0
+        self.oversize = 0
+        self._outbox: SimpleQueue = SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self) -> None:
+        if self._thread is None:
+            self._loop = asyncio.get_running_loop()
+            self._thread = threading.Thread(target=self._run, name='ws-bus-pg', daemon=True)
+            self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join, 2.0)
+
+    def publish(self, room: str, frame: Frame) -> None:
+        msg = {'o': self.origin, 'r': room, 't': frame.type}
+        if isinstance(frame.data, (bytes, bytearray)):
+            msg['b'] = base64.b64encode(bytes(frame.data)).decode('ascii')
+        else:
+            msg['d'] = frame.data
+        payload = json.dumps(msg, separators=(',', ':'))
+        if len(payload.encode('utf-8')) > self.MAX_PAYLOAD:
+            self.oversize += 1
+            logger.warning(f"WS frame for room '{room}' too large for NOTIFY; delivered locally only")
+            return
+        self._outbox.put(payload)
+
+    def _deliver(self, payload: str) -> None:
+        try:
+            msg = json.loads(payload)
+        except ValueError:
+            return
+        if msg.get('o') == self.origin:
+            return
+        data = base64.b64decode(msg['b']) if 'b' in msg else msg.get('d', '')
+        self.received += 1
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.on_message, msg['r'], Frame(data, msg.get('t')))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                logger.warning(f'WS Postgres bus disconnected: {e}')
+                self._stop.wait(2.0)
+
+    def _listen(self) -> None:
+        try:
+            import psycopg2
+            import select
+        except ImportError:
+            psycopg2 = None
+        if psycopg2 is not None:
+            conn = psycopg2.connect(self.dsn)
+            conn.set_session(autocommit=True)
+            try:
+                cur = conn.cursor()
+                cur.execute(f'LISTEN {self.channel}')
+                while not self._stop.is_set():
+                    self._flush_outbox(cur)
+                    if select.select([conn], [], [], 0.05) != ([], [], []):
+                        conn.poll()
+                        while conn.notifies:
+                            self._deliver(conn.notifies.pop(0).payload)
+            finally:
+                conn.close()
+            return
+        import psycopg  # psycopg 3 on newer Pythons
+        with psycopg.connect(self.dsn, autocommit=True) as conn:
+            conn.execute(f'LISTEN {self.channel}')
+            while not self._stop.is_set():
+                self._flush_outbox(conn)
+                for n in conn.notifies(timeout=0.05, stop_after=100):
+                    self._deliver(n.payload)
+
+    def _flush_outbox(self, cur) -> None:
+        while True:
+            try:
+                payload = self._outbox.get_nowait()
+            except Empty:
+                return
+            cur.execute('SELECT pg_notify(%s, %s)', (self.channel, payload))
+            self.published += 1
+
+    def stats(self) -> dict:
+        return {
+            'backend': self.name,
+            'channel': self.channel,
+            'published': self.published,
+            'received': self.received,
+            'oversize': self.oversize,
+            'pending': self._outbox.qsize(),
+        }
+
+
+def create_bus(on_message: OnMessage, backend: str | None = None):
+    backend = (backend or settings.ws_bus).lower()
+    if backend == 'unix':
+        return UnixSocketBus(on_message, settings.ws_bus_socket)
+    if backend == 'postgres':
+        from sqlalchemy.engine import make_url
+        url = make_url(settings.database_url)
+        if not url.drivername.startswith('postgresql'):
+            logger.warning('WS_BUS=postgres needs a PostgreSQL DATABASE_URL; using the local bus')
+            return LocalBus(on_message)
+        dsn = url.set(drivername='postgresql').render_as_string(hide_password=False)
+        return PostgresBus(on_message, dsn)
+    if backend != 'local':
+        logger.warning(f"Unknown WS_BUS '{backend}', using the local bus")
+    return LocalBus(on_message)
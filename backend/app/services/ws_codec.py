@@ -0,0 +1,80 @@
+"""Wire encodings a WebSocket client can negotiate with ``?encoding=``.
+
+* ``json``    – text frames, the default
+* ``msgpack`` – every data message as a MessagePack binary frame (needs ``msgpack``;
+                without it the connection stays on JSON)
+* ``struct``  – the siren pulse of the 'game' room as a fixed-layout binary frame,
+                everything else as JSON text:
+
+  ====  ==========================  ===============================================
+  op    layout (big endian)         message
+  ====  ==========================  ===============================================
+  0x10  B Q                         ``sirenPulse``: payload.play_at (server ms)
+  ====  ==========================  ===============================================
+
+  Running clocks travel as deadlines, so there are no per-second clock deltas to pack;
+  game deltas (with their full version) stay JSON.
+
+Control messages (ping, time sync, subscribe acks, errors, hello) stay JSON text in every
+encoding, so heartbeat and handshake code does not depend on the negotiated encoding.
+"""
+from __future__ import annotations
+
+import struct
+from typing import Any
+
+try:
+    import msgpack
+except Exception:  # pragma: no cover - optional dependency
+    msgpack = None
+
+ENCODINGS = ('json', 'msgpack', 'struct')
+CONTROL_TYPES = frozenset({'ping', 'hello', 'subscribed', 'error', 'timeSync'})
+
+OP_SIREN = 0x10
+
+_SIREN = struct.Struct('>BQ')
+
+
+def negotiate(requested: str | None) -> str:
+    """Encoding to use for a client that asked for ``requested``."""
+    enc = (requested or 'json').lower()
+    if enc not in ENCODINGS:
+        return 'json'
+    if enc == 'msgpack' and msgpack is None:
+        return 'json'
+    return enc
+
+
+def pack_struct(message: Any) -> bytes | None:
+    """Fixed-layout frame for ``message``, or None if it has no compact layout."""
+    if not isinstance(message, dict):
+        return None
+    if message.get('type') == 'sirenPulse':
+        payload = message.get('payload') or {}
+        play_at = payload.get('play_at')
+        # ``at`` is play_at in whole seconds, so only play_at travels
+        exact = len(message) == 2 and len(payload) == 2 and isinstance(play_at, int)
+        if exact and play_at >= 0 and payload.get('at') == play_at // 1000:
+            return _SIREN.pack(OP_SIREN, play_at)
+    return None
+
+
+def unpack_struct(data: bytes) -> dict:
+    """Inverse of :func:`pack_struct`."""
+    op = data[0]
+    if op == OP_SIREN:
+        _, play_at = _SIREN.unpack(data)
+        return {'type': 'sirenPulse', 'payload': {'at': play_at // 1000, 'play_at': play_at}}
+    raise ValueError(f'unknown struct opcode 0x{op:02x}')
+
+
+def encode(message: Any, encoding: str) -> bytes | None:
+    """Binary form of ``message`` for ``encoding``; None means "send the JSON text"."""
+    if encoding == 'json' or (isinstance(message, dict) and message.get('type') in CONTROL_TYPES):
+        return None
+    if encoding == 'struct':
+        return pack_struct(message)
+    if encoding == 'msgpack' and msgpack is not None:
+        return msgpack.packb(message, use_bin_type=True)
+    return None
@@ -0,0 +1,539 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+from ..core.config import settings
+from . import ws_codec
+
+try:
+    import orjson
+except Exception:  # pragma: no cover - optional speedup
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop_oldest', 'coalesce', 'disconnect')
+# Rooms reachable without authentication, with the rooms of registered games ('game:{id}')
+PUBLIC_ROOMS = frozenset({'player', 'display'})
+# Rooms that always exist; 'control' (OBS scene commands) needs a token with obs.control
+_FIXED_ROOMS = PUBLIC_ROOMS | {'control'}
+
+
+def dumps(message: Any) -> str:
+    """Encode a message as compact JSON text (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(message, separators=(',', ':'), ensure_ascii=False)
+
+
+class Frame:
+    """An encoded message shared by every connection it is queued on.
+
+    ``type`` is kept alongside the payload so queues can coalesce without decoding.
+    ``data`` is the JSON text; other wire encodings (see ``ws_codec``) are built on first
+    use and cached, so each encoding is still computed once per broadcast.
+    """
+
+    __slots__ = ('data', 'type', 'message', '_wire')
+
+    def __init__(self, data: str | bytes, type: str | None = None, message: Any = None) -> None:
+        self.data = data
+        self.type = type
+        self.message = message
+        self._wire: Optional[Dict[str, str | bytes]] = None
+
+    @classmethod
+    def encode(cls, message: Any) -> 'Frame':
+        if isinstance(message, Frame):
+            return message
+        if isinstance(message, (str, bytes)):
+            return cls(message)
+        kind = message.get('type') if isinstance(message, dict) else None
+        return cls(dumps(message), kind if isinstance(kind, str) else None, message)
+
+    def wire(self, encoding: str) -> str | bytes:
+        """What to send to a client that negotiated ``encoding``."""
+        if encoding == 'json' or not isinstance(self.data, str):
+            return self.data
+        if self._wire is None:
+            self._wire = {}
+        data = self._wire.get(encoding)
+        if data is None:
+            message = self.message
+            if message is None:
+                try:
+                    message = json.loads(self.data)  # pre-encoded or from the bus
+                except ValueError:
+                    message = None
+            data = ws_codec.encode(message, encoding) if message is not None else None
+            data = self._wire[encoding] = data if data is not None else self.data
+        return data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+class _Connection:
+    """One client socket with its own bounded outbound queue and writer task.
+
+    Broadcasts only append to the queue; the writer task drains it, so a slow client
+    never holds up delivery to the others.
+    """
+
+    def __init__(
+        self,
+        ws: WebSocket,
+        max_queue: int,
+        policy: str,
+        on_close: Optional[Callable[['_Connection'], None]] = None,
+        encoding: str = 'json',
+    ) -> None:
+        self.ws = ws
+        self.encoding = encoding
+        self._on_close = on_close
+        self.max_queue = max(1, max_queue)
+        self.policy = policy
+        self.rooms: Set[str] = set()
+        self.queue: Deque[Tuple[float, Frame]] = deque()
+        self.closed = False
+        self.sent = 0
+        self.bytes_sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.connected_at = time.time()
+        self.last_seen = time.monotonic()
+        self.ping_sent_at: Optional[float] = None
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._writer is None:
+            self._writer = asyncio.get_running_loop().create_task(self._run())
+
+    def enqueue(self, frame: Frame, urgent: bool = False) -> bool:
+        """Queue a frame; applies the overflow policy when the queue is full.
+
+        ``urgent`` frames jump the queue (time-sync replies, whose timestamp must not age).
+        """
+        if self.closed:
+            return False
+        if len(self.queue) >= self.max_queue:
+            if self.policy == 'disconnect':
+                logger.warning(f'WebSocket send queue full ({self.max_queue}); disconnecting slow client')
+                self.close()
+                return False
+            if self.policy == 'coalesce' and self._coalesce(frame):
+                pass
+            else:
+                self.queue.popleft()
+                self.dropped += 1
+        if urgent:
+            self.queue.appendleft((time.monotonic(), frame))
+        else:
+            self.queue.append((time.monotonic(), frame))
+        self._wakeup.set()
+        return True
+
+    def _coalesce(self, frame: Frame) -> bool:
+        # Newer messages of the same type supersede queued ones (e.g. full game state).
+        kind = frame.type
+        if kind is None:
+            return False
+        before = len(self.queue)
+        self.queue = deque(item for item in self.queue if item[1].type != kind)
+        removed = before - len(self.queue)
+        self.coalesced += removed
+        return removed > 0
+
+    async def _run(self) -> None:
+        try:
+            while not self.closed:
+                if not self.queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                queued_at, frame = self.queue.popleft()
+                data = frame.wire(self.encoding)
+                if isinstance(data, str):
+                    await self.ws.send_text(data)
+                else:
+                    await self.ws.send_bytes(data)
+                self.bytes_sent += len(data)
+                self.sent += 1
+                self.last_lag_ms = (time.monotonic() - queued_at) * 1000.0
+                self.max_lag_ms = max(self.max_lag_ms, self.last_lag_ms)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            self.close()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        self._wakeup.set()
+        # a writer blocked in send on a half-open socket would never see ``closed``
+        if self._writer is not None and self._writer is not _current_task():
+            self._writer.cancel()
+        if self._on_close is not None:
+            self._on_close(self)
+        try:
+            asyncio.get_running_loop().create_task(self._close_socket())
+        except RuntimeError:
+            pass
+
+    async def _close_socket(self) -> None:
+        try:
+            await self.ws.close()
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        client = getattr(self.ws, 'client', None)
+        return {
+            'client': f'{client.host}:{client.port}' if client else None,
+            'rooms': sorted(self.rooms),
+            'queued': len(self.queue),
+            'encoding': self.encoding,
+            'sent': self.sent,
+            'bytes_sent': self.bytes_sent,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'last_lag_ms': round(self.last_lag_ms, 2),
+            'max_lag_ms': round(self.max_lag_ms, 2),
+            'closed': self.closed,
+            'idle_s': round(time.monotonic() - self.last_seen, 1),
+        }
+
+
+class _Listener:
+    """Non-WebSocket consumer of a room (SSE streams, long-polls).
+
+    Gets the same frames as the room's sockets. The buffer is bounded: on overflow it is
+    emptied and refilled with the room's retained frames, so a slow reader resumes from
+    the current state instead of an old backlog.
+    """
+
+    def __init__(self, room: str, max_queue: int) -> None:
+        self.room = room
+        self.max_queue = max(1, max_queue)
+        self.queue: Deque[Frame] = deque()
+        self.dropped = 0
+        self._wakeup = asyncio.Event()
+
+    def push(self, frame: Frame) -> bool:
+        """Buffer ``frame``; False if the buffer overflowed and was reset first."""
+        ok = True
+        if len(self.queue) >= self.max_queue:
+            self.dropped += len(self.queue)
+            self.queue.clear()
+            ok = False
+        self.queue.append(frame)
+        self._wakeup.set()
+        return ok
+
+    async def get(self, timeout: float | None = None) -> Optional[Frame]:
+        """Next frame, or None if nothing arrived within ``timeout`` seconds."""
+        while not self.queue:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self.queue.popleft()
+
+
+class WSManager:
+    def __init__(
+        self,
+        max_queue: int | None = None,
+        policy: str | None = None,
+        ping_interval: float | None = None,
+        pong_timeout: float | None = None,
+    ) -> None:
+        self.rooms: Dict[str, Set[_Connection]] = {
+            'control': set(),
+            'player': set(),
+            'display': set(),
+        }
+        self._connections: Dict[WebSocket, _Connection] = {}
+        self.max_queue = max_queue if max_queue is not None else settings.ws_send_queue_size
+        policy = policy or settings.ws_overflow_policy
+        if policy not in OVERFLOW_POLICIES:
+            logger.warning(f"Unknown WS overflow policy '{policy}', using 'drop_oldest'")
+            policy = 'drop_oldest'
+        self.policy = policy
+        self.ping_interval = ping_interval if ping_interval is not None else settings.ws_ping_interval
+        self.pong_timeout = pong_timeout if pong_timeout is not None else settings.ws_pong_timeout
+        self.max_rooms = settings.ws_max_rooms
+        # last value per (room, message type), replayed to sockets joining the room;
+        # a value may be a callable so the frame is built fresh at join time
+        self._retained: Dict[str, Dict[str, Frame | Callable[[], Optional[Frame]]]] = {}
+        self.listeners: Dict[str, Set[_Listener]] = {}
+        self.evicted = 0
+        self.bus = None
+
+    async def accept(self, ws: WebSocket, encoding: str | None = None) -> _Connection:
+        """Accept the socket and start its writer without joining any room.
+
+        ``encoding`` is the client's requested wire encoding (``?encoding=``); when one is
+        asked for, the first message is ``{"type": "hello", "encoding": ...}`` with the
+        encoding actually used (JSON if the request cannot be served).
+        """
+        await ws.accept()
+        conn = self._connections.get(ws)
+        if conn is None:
+            conn = _Connection(ws, self.max_queue, self.policy, on_close=self._evict, encoding=ws_codec.negotiate(encoding))
+            self._connections[ws] = conn
+            conn.start()
+            if encoding:
+                conn.enqueue(Frame.encode({'type': 'hello', 'encoding': conn.encoding}))
+        return conn
+
+    def join(self, ws: WebSocket, room: str, replay: bool = True) -> bool:
+        """Add an accepted socket to ``room``; False if that would exceed WS_MAX_ROOMS.
+
+        With ``replay`` the room's retained messages are queued for the socket right away.
+        """
+        conn = self._connections.get(ws)
+        if conn is None or conn.closed:
+            return False
+        if room not in self.rooms and len(self.rooms) >= self.max_rooms:
+            logger.warning(f"WebSocket room limit ({self.max_rooms}) reached; refusing room '{room}'")
+            return False
+        conn.rooms.add(room)
+        self.rooms.setdefault(room, set()).add(conn)
+        if replay:
+            self.replay(ws, room)
+        return True
+
+    def replay(self, ws: WebSocket, room: str) -> int:
+        """Queue the retained messages of ``room`` for ``ws``; returns how many."""
+        conn = self._connections.get(ws)
+        if conn is None:
+            return 0
+        frames = self.retained(room)
+        for frame in frames:
+            conn.enqueue(frame)
+        return len(frames)
+
+    def retain(self, room: str, kind: str, value: Frame | Callable[[], Optional[Frame]]) -> None:
+        """Keep ``value`` as the last ``kind`` message of ``room`` for late joiners."""
+        self._retained.setdefault(room, {})[kind] = value
+
+    def clear_retained(self, room: str, kind: str | None = None) -> None:
+        if kind is None:
+            self._retained.pop(room, None)
+        else:
+            self._retained.get(room, {}).pop(kind, None)
+
+    def retained(self, room: str) -> list[Frame]:
+        """Current retained frames of ``room`` (providers are evaluated now)."""
+        frames = []
+        for kind, value in list(self._retained.get(room, {}).items()):
+            if callable(value):
+                try:
+                    value = value()
+                except Exception:
+                    logger.exception(f"Retained value provider for {room}/{kind} failed")
+                    continue
+            if value is not None:
+                frames.append(value)
+        return frames
+
+    def leave(self, ws: WebSocket, room: str) -> None:
+        conn = self._connections.get(ws)
+        if conn is not None:
+            self._leave(conn, room)
+
+    def rooms_of(self, ws: WebSocket) -> Set[str]:
+        conn = self._connections.get(ws)
+        return set(conn.rooms) if conn else set()
+
+    async def connect(self, room: str, ws: WebSocket, encoding: str | None = None) -> _Connection:
+        conn = await self.accept(ws, encoding)
+        self.join(ws, room)
+        return conn
+
+    async def disconnect(self, room: str, ws: WebSocket):
+        conn = self._connections.get(ws)
+        if conn is None:
+            return
+        self._leave(conn, room)
+        if not conn.rooms:
+            self._drop(conn)
+
+    async def disconnect_all(self, ws: WebSocket):
+        """Remove ``ws`` from every room and stop its writer."""
+        conn = self._connections.get(ws)
+        if conn is not None:
+            for room in list(conn.rooms):
+                self._leave(conn, room)
+            self._drop(conn)
+
+    def _leave(self, conn: _Connection, room: str) -> None:
+        members = self.rooms.get(room)
+        if members is not None:
+            members.discard(conn)
+            # rooms created on demand go away with their last member
+            if not members and room not in _FIXED_ROOMS:
+                del self.rooms[room]
+        conn.rooms.discard(room)
+
+    def _drop(self, conn: _Connection) -> None:
+        self._connections.pop(conn.ws, None)
+        if conn._writer is not None and conn._writer is not _current_task():
+            conn._writer.cancel()
+        conn.closed = True
+
+    def _evict(self, conn: _Connection) -> None:
+        # called when a send fails, the queue overflows under 'disconnect' or a pong is missed
+        if self._connections.get(conn.ws) is not conn:
+            return
+        for room in list(conn.rooms):
+            self._leave(conn, room)
+        self._connections.pop(conn.ws, None)
+        self.evicted += 1
+
+    def touch(self, ws: WebSocket) -> None:
+        """Record inbound traffic from ``ws``; any message counts as proof of life."""
+        conn = self._connections.get(ws)
+        if conn is not None:
+            conn.last_seen = time.monotonic()
+            conn.ping_sent_at = None
+
+    def send(self, ws: WebSocket, message: Any, urgent: bool = False) -> bool:
+        """Queue a message for a single socket (keeps ordering with broadcasts unless ``urgent``)."""
+        conn = self._connections.get(ws)
+        return conn.enqueue(Frame.encode(message), urgent) if conn else False
+
+    async def broadcast(self, room: str, message: dict | Frame | str | bytes, retain: bool = False, local: bool = False) -> int:
+        """Queue ``message`` on every connection in ``room``; never waits on the network.
+
+        A dict is encoded once and the same frame is shared by all targets; callers that
+        send the same payload to several rooms can pass a ``Frame`` (or pre-encoded
+        text/bytes) to skip even that. With a cross-process bus attached the frame is
+        also published once for the other workers. Returns the local connections queued for.
+
+        ``retain=True`` keeps the frame as the room's last value for its message type, so
+        sockets joining later get it immediately (only for state-like messages).
+        ``local=True`` keeps the frame off the bus: for frames derived from state that only
+        this process holds (versioned game deltas), which other workers could not follow.
+        """
+        frame = Frame.encode(message)
+        if retain and frame.type:
+            self.retain(room, frame.type, frame)
+        if self.bus is not None and not local:
+            self.bus.publish(room, frame)
+        return self.deliver(room, frame)
+
+    def deliver(self, room: str, frame: Frame) -> int:
+        """Queue ``frame`` on this process's sockets in ``room`` (bus receive path)."""
+        delivered = 0
+        for conn in list(self.rooms.get(room, ())):
+            if conn.enqueue(frame):
+                delivered += 1
+        for listener in list(self.listeners.get(room, ())):
+            if not listener.push(frame):
+                for retained in self.retained(room):
+                    listener.push(retained)
+        return delivered
+
+    @contextmanager
+    def listen(self, room: str, replay: bool = True, max_queue: int | None = None) -> Iterator[_Listener]:
+        """Receive ``room``'s broadcasts without a WebSocket, for the ``with`` block.
+
+        With ``replay`` the room's retained frames are buffered first.
+        """
+        listener = _Listener(room, max_queue or self.max_queue)
+        if replay:
+            for frame in self.retained(room):
+                listener.push(frame)
+        self.listeners.setdefault(room, set()).add(listener)
+        try:
+            yield listener
+        finally:
+            members = self.listeners.get(room)
+            if members is not None:
+                members.discard(listener)
+                if not members:
+                    del self.listeners[room]
+
+    async def start_bus(self, backend: str | None = None):
+        """Attach the cross-process bus configured by WS_BUS (local, unix, postgres)."""
+        from .ws_bus import create_bus
+        bus = create_bus(self.deliver, backend)
+        await bus.start()
+        self.bus = None if bus.name == 'local' else bus
+        return bus
+
+    async def stop_bus(self) -> None:
+        bus, self.bus = self.bus, None
+        if bus is not None:
+            await bus.stop()
+
+    def check_heartbeats(self, now: float | None = None) -> int:
+        """Evict connections whose ping went unanswered and ping the idle ones.
+
+        Returns the number of connections evicted.
+        """
+        now = time.monotonic() if now is None else now
+        evicted = 0
+        for conn in list(self._connections.values()):
+            if conn.ping_sent_at is not None and now - conn.ping_sent_at > self.pong_timeout:
+                logger.info(f"Evicting WebSocket client {conn.stats()['client']}: no pong within {self.pong_timeout}s")
+                conn.close()
+                evicted += 1
+            elif conn.ping_sent_at is None and now - conn.last_seen >= self.ping_interval:
+                conn.ping_sent_at = now
+                conn.enqueue(Frame.encode({'type': 'ping', 'ts': int(time.time() * 1000)}))
+        return evicted
+
+    async def heartbeat_loop(self):
+        """Background task: server-initiated ping/pong so half-open sockets get dropped."""
+        step = max(1.0, min(self.ping_interval, self.pong_timeout) / 2)
+        while True:
+            await asyncio.sleep(step)
+            try:
+                self.check_heartbeats()
+            except Exception as e:
+                logger.error(f"Error in ws heartbeat loop: {e}", exc_info=True)
+
+    def room_gauges(self) -> Dict[str, int]:
+        """Live connections per room."""
+        return {room: len(members) for room, members in self.rooms.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        conns = list(self._connections.values())
+        return {
+            'policy': self.policy,
+            'max_queue': self.max_queue,
+            'connections': len(conns),
+            'evicted': self.evicted,
+            'bus': self.bus.stats() if self.bus is not None else {'backend': 'local'},
+            'rooms': self.room_gauges(),
+            'listeners': {room: len(members) for room, members in self.listeners.items()},
+            'retained': {room: sorted(kinds) for room, kinds in self._retained.items() if kinds},
+            'clients': [c.stats() for c in conns],
+        }
+
+
+def _current_task() -> Optional[asyncio.Task]:
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+ws_manager = WSManager()
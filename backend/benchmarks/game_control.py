@@ -0,0 +1,82 @@
+"""Click-to-scoreboard latency: operator commands over HTTP vs over the game socket.
+
+In-process like ws_fanout.py: one scoreboard on /ws/game and the operator either
+POSTing /api/v1/game/score (token and permission checked per request) or sending
+``{"type": "command"}`` on its own /ws/game?token= socket (checked once at connect).
+Latency runs from the operator's send until the scoreboard gets the new state.
+
+    python benchmarks/game_control.py --rounds 300
+"""
+import argparse
+import asyncio
+import time
+
+from ws_fanout import SimClient, bootstrap_users, percentiles  # also sets up the temp app env
+
+import httpx
+
+from app.main import app
+from app.core.config import settings
+
+
+class Scoreboard(SimClient):
+    """Keeps the arrival time of every frame for the caller to wait on."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.frames: asyncio.Queue = asyncio.Queue()
+
+    async def _send(self, message: dict) -> None:
+        if message['type'] == 'websocket.send' and '"ping"' not in (message.get('text') or ''):
+            self.frames.put_nowait(time.perf_counter())
+        await super()._send(message)
+
+    async def next_frame(self) -> float:
+        return await asyncio.wait_for(self.frames.get(), 5)
+
+    def clear(self) -> None:
+        while not self.frames.empty():
+            self.frames.get_nowait()
+
+
+async def run(rounds: int) -> dict:
+    token, _ = bootstrap_users(0)
+    settings.ws_command_rate = 1e6  # latency, not the rate limit, is measured here
+    display = Scoreboard('display', '/api/v1/ws/game')
+    operator = Scoreboard('operator', '/api/v1/ws/game', f'token={token}')
+    await display.connect(10000)
+    await operator.connect(10001)
+    await asyncio.sleep(0.2)
+    headers = {'Authorization': f'Bearer {token}'}
+    http_ms, ws_ms = [], []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench') as http:
+        for i in range(rounds):
+            # alternated so both paths see the same state size and warm-up
+            display.clear()
+            t0 = time.perf_counter()
+            post = asyncio.get_running_loop().create_task(
+                http.post('/api/v1/game/score', json={'team': 'home', 'delta': 1}, headers=headers))
+            http_ms.append((await display.next_frame() - t0) * 1000)
+            await post
+            display.clear()
+            operator.clear()
+            t0 = time.perf_counter()
+            operator.send_json({'type': 'command', 'seq': i + 1, 'commands': [{'op': 'score', 'team': 'away', 'delta': 1}]})
+            ws_ms.append((await display.next_frame() - t0) * 1000)
+    await display.close()
+    await operator.close()
+    return {'http': percentiles(http_ms), 'ws': percentiles(ws_ms)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--rounds', type=int, default=300)
+    args = ap.parse_args()
+    result = asyncio.run(run(args.rounds))
+    for path, stats in result.items():
+        print(f"{path:5s} p50={stats['p50']:.3f} ms  p90={stats['p90']:.3f} ms  p99={stats['p99']:.3f} ms  max={stats['max']:.3f} ms")
+    print(f"p50 speed-up: {result['http']['p50'] / result['ws']['p50']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""CPU cost of one game tick broadcast to N clients.
+
+Compares the old path (every client JSON-encodes the state itself, as
+``ws.send_json`` did) with the shared-frame path of ``WSManager.broadcast``.
+
+    python benchmarks/ws_broadcast.py --clients 200 --ticks 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('STORAGE_PATH', os.path.join(tempfile.gettempdir(), 'palafeltre-bench'))
+
+from app.services import ws_manager as wsm  # noqa: E402
+
+
+class NullWS:
+    client = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        pass
+
+    async def send_bytes(self, data):
+        pass
+
+    async def send_json(self, message):
+        # what Starlette does for send_json
+        await self.send_text(json.dumps(message, separators=(',', ':'), ensure_ascii=False))
+
+    async def close(self):
+        pass
+
+
+def sample_state(tick: int) -> dict:
+    return {
+        "homeName": "HC Feltre", "awayName": "Ospiti Belluno",
+        "colorHome": "#ff4444", "colorAway": "#44aaff",
+        "scoreHome": 3, "scoreAway": 2, "shotsHome": 21, "shotsAway": 17,
+        "period": "2°", "periodIndex": 2, "timerRunning": True,
+        "timerRemaining": 1200 - tick % 1200, "inInterval": False,
+        "periodDuration": 1200, "intervalDuration": 900, "timeoutRemaining": 0,
+        "sirenOn": False, "sirenEveryMinute": False, "obsVisible": True,
+        "penalties": [{"id": i, "team": "home" if i % 2 else "away", "player_number": str(10 + i), "remaining": 120 - i} for i in range(4)],
+    }
+
+
+async def legacy(clients: int, ticks: int) -> float:
+    sockets = [NullWS() for _ in range(clients)]
+    start = time.process_time()
+    for t in range(ticks):
+        msg = {"type": "state", "payload": sample_state(t)}
+        for ws in sockets:
+            await ws.send_json(msg)
+    return (time.process_time() - start) / ticks
+
+
+async def shared(clients: int, ticks: int) -> float:
+    mgr = wsm.WSManager(max_queue=ticks + 1, policy='drop_oldest', ping_interval=3600, pong_timeout=3600)
+    for _ in range(clients):
+        await mgr.connect('game', NullWS())
+    start = time.process_time()
+    for t in range(ticks):
+        await mgr.broadcast('game', {"type": "state", "payload": sample_state(t)})
+        await asyncio.sleep(0)  # let the writers drain
+    while any(c.queue for c in mgr._connections.values()):
+        await asyncio.sleep(0)
+    elapsed = (time.process_time() - start) / ticks
+    for c in list(mgr._connections.values()):
+        c.close()
+    return elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--clients', type=int, default=200)
+    ap.add_argument('--ticks', type=int, default=500)
+    args = ap.parse_args()
+    old = asyncio.run(legacy(args.clients, args.ticks))
+    new = asyncio.run(shared(args.clients, args.ticks))
+    print(f"encoder: {'orjson' if wsm.orjson is not None else 'json'}")
+    print(f"clients={args.clients} ticks={args.ticks}")
+    print(f"per-client encode : {old * 1000:.3f} ms CPU/tick")
+    print(f"shared frame      : {new * 1000:.3f} ms CPU/tick ({old / new:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Wire size and encode/decode cost of the WebSocket encodings (see services.ws_codec).
+
+Messages measured: a clock start delta (running clocks travel as deadlines), a full
+keyframe and sirenPulse.
+Encode time is what the server pays once per broadcast; decode time is per client.
+
+    python benchmarks/ws_encoding.py --rounds 20000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('STORAGE_PATH', os.path.join(tempfile.gettempdir(), 'palafeltre-bench'))
+
+from app.services import ws_codec  # noqa: E402
+from app.services import ws_manager as wsm  # noqa: E402
+from ws_broadcast import sample_state  # noqa: E402
+
+MESSAGES = {
+    'clock delta': {"type": "delta", "v": 4711, "changes": {"timerRunning": True, "timerEndsAt": 1760000000250}},
+    'keyframe': {"type": "state", "v": 4710, "payload": sample_state(13)},
+    'sirenPulse': {"type": "sirenPulse", "payload": {"at": 1760000000, "play_at": 1760000000250}},
+}
+
+
+def _timed(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def measure(message: dict, encoding: str, rounds: int):
+    if encoding == 'json':
+        encode = lambda: wsm.dumps(message)  # noqa: E731
+        data = encode()
+        decode = lambda: json.loads(data)  # noqa: E731
+    else:
+        encode = lambda: ws_codec.encode(message, encoding)  # noqa: E731
+        data = encode()
+        if data is None:
+            return None  # no binary form: the client gets the JSON text
+        if encoding == 'struct':
+            decode = lambda: ws_codec.unpack_struct(data)  # noqa: E731
+        else:
+            decode = lambda: ws_codec.msgpack.unpackb(data, raw=False)  # noqa: E731
+    size = len(data.encode('utf-8') if isinstance(data, str) else data)
+    return size, _timed(encode, rounds), _timed(decode, rounds)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--rounds', type=int, default=20000)
+    args = ap.parse_args()
+    encodings = ['json', 'struct'] + (['msgpack'] if ws_codec.msgpack is not None else [])
+    print(f"json encoder: {'orjson' if wsm.orjson is not None else 'json'}")
+    if ws_codec.msgpack is None:
+        print('msgpack not installed: skipped')
+    print(f"{'message':<12} {'encoding':<8} {'bytes':>6} {'ratio':>6} {'encode us':>10} {'decode us':>10}")
+    for name, message in MESSAGES.items():
+        base = None
+        for enc in encodings:
+            result = measure(message, enc, args.rounds)
+            if result is None:
+                print(f"{name:<12} {enc:<8} {'(sent as JSON text)':>34}")
+                continue
+            size, enc_us, dec_us = result
+            base = base or size
+            print(f"{name:<12} {enc:<8} {size:>6} {base / size:>5.1f}x {enc_us:>10.2f} {dec_us:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
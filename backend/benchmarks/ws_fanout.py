@@ -0,0 +1,326 @@
+"""WebSocket fan-out load test: simulated clients against the real app, in-process.
+
+Clients connect through the app's own ASGI WebSocket routes (no server, no network,
+SQLite in a temp dir): ``--game`` sockets on /ws/game, ``--display`` on /ws/display and
+``--notify`` authenticated sockets on /ws?token= subscribed to their notifications.
+A driver runs a game the way the operator would: clock running (the real
+``game_scheduler``), goals, shots, penalties, display view changes and notifications.
+
+Reported, per room where it applies:
+
+* latency   – from ``WSManager.deliver`` (the broadcast enters the fan-out) until the
+              frame is handed to the client's socket: p50/p90/p99/max in ms
+* drops     – frames a client should have received during the run but did not
+              (overflow policy, evictions)
+* game rate – frames per second broadcast on the game room (running clocks travel as
+              deadlines, so this follows the operator's actions, not the clock)
+* cpu       – process CPU seconds per wall second (client simulation included)
+
+Results are written as JSON for comparing runs:
+
+    python benchmarks/ws_fanout.py --game 300 --display 50 --notify 100 --duration 30
+    python benchmarks/ws_fanout.py --compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+_TMP = tempfile.mkdtemp(prefix='palafeltre-fanout-')
+os.environ.setdefault('STORAGE_PATH', _TMP)
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_TMP, 'bench.db')}")
+
+import logging  # noqa: E402
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.api.v1 import endpoints  # noqa: E402
+from app.core.security import create_access_token, hash_password  # noqa: E402
+from app.db.session import Base, SessionLocal, engine  # noqa: E402
+from app.models.rbac import Role, User  # noqa: E402
+from app.services import ws_codec  # noqa: E402
+from app.services.ws_manager import ws_manager  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+class SimClient:
+    """One WebSocket client talking ASGI directly to the app."""
+
+    def __init__(self, name: str, path: str, query: str = '', delay: float = 0.0) -> None:
+        self.name = name
+        self.path = path
+        self.query = query
+        self.delay = delay
+        self.received: dict = {}  # id(data) -> receive time
+        self.closed = False
+        self._inbox: asyncio.Queue = asyncio.Queue()
+        self._accepted = asyncio.Event()
+        self._task = None
+
+    async def connect(self, port: int) -> None:
+        scope = {
+            'type': 'websocket', 'asgi': {'version': '3.0'}, 'scheme': 'ws', 'http_version': '1.1',
+            'path': self.path, 'raw_path': self.path.encode(), 'root_path': '',
+            'query_string': self.query.encode(), 'headers': [(b'host', b'bench')],
+            'client': ('127.0.0.1', port), 'server': ('bench', 80), 'subprotocols': [],
+        }
+        await self._inbox.put({'type': 'websocket.connect'})
+        self._task = asyncio.get_running_loop().create_task(app(scope, self._receive, self._send))
+        await asyncio.wait_for(self._accepted.wait(), 10)
+
+    def send_json(self, message: dict) -> None:
+        self._inbox.put_nowait({'type': 'websocket.receive', 'text': json.dumps(message)})
+
+    async def _receive(self):
+        return await self._inbox.get()
+
+    async def _send(self, message: dict) -> None:
+        kind = message['type']
+        if kind == 'websocket.accept':
+            self._accepted.set()
+        elif kind == 'websocket.send':
+            data = message.get('text') if message.get('text') is not None else message.get('bytes')
+            self.received[id(data)] = time.perf_counter()
+            if isinstance(data, str) and '"ping"' in data:
+                self.send_json({'type': 'pong'})
+            if self.delay:
+                await asyncio.sleep(self.delay)  # a slow socket applies backpressure here
+        elif kind == 'websocket.close':
+            self.closed = True
+            self._accepted.set()
+
+    async def close(self) -> None:
+        await self._inbox.put({'type': 'websocket.disconnect', 'code': 1000})
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, 2)
+            except Exception:
+                self._task.cancel()
+
+
+class DeliveryLog:
+    """Wraps ``ws_manager.deliver`` to timestamp every frame entering the fan-out."""
+
+    def __init__(self) -> None:
+        self.frames: dict = {}  # id(frame.data) -> (room, sent_at, frame); frames kept alive
+        self.recording = False
+        self._orig = ws_manager.deliver
+
+    def __enter__(self):
+        def deliver(room, frame):
+            if self.recording and id(frame.data) not in self.frames:
+                self.frames[id(frame.data)] = (room, time.perf_counter(), frame)
+            return self._orig(room, frame)
+        ws_manager.deliver = deliver
+        return self
+
+    def __exit__(self, *exc):
+        ws_manager.deliver = self._orig
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {'count': 0}
+    values = sorted(values)
+
+    def pct(p: float) -> float:
+        return round(values[min(len(values) - 1, int(p / 100.0 * len(values)))], 3)
+    return {'count': len(values), 'p50': pct(50), 'p90': pct(90), 'p99': pct(99), 'max': round(values[-1], 3)}
+
+
+def bootstrap_users(count: int) -> tuple:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        admin_role = db.query(Role).filter(Role.name == 'admin').first() or Role(name='admin')
+        operator = User(username='bench_operator', email='operator@bench.local', full_name='Bench', hashed_password=hash_password('bench-pass'), is_active=True)
+        operator.roles.append(admin_role)
+        viewers = [User(username=f'bench_{i}', email=f'bench_{i}@bench.local', full_name=f'Bench {i}', hashed_password='-', is_active=True) for i in range(count)]
+        db.add(operator)
+        db.add_all(viewers)
+        db.commit()
+        return create_access_token(str(operator.id)), [(u.id, create_access_token(str(u.id))) for u in viewers]
+    finally:
+        db.close()
+
+
+async def drive_game(http: httpx.AsyncClient, headers: dict, stop: asyncio.Event, batch: bool = False) -> dict:
+    """Operator actions on top of the running clock; a goal also counts as a shot on goal."""
+    counts = {'goals': 0, 'shots': 0, 'penalties': 0, 'views': 0, 'notifications': 0}
+    await http.post('/api/v1/game/setup', json={'home_name': 'HC Feltre', 'away_name': 'Ospiti', 'period_duration': '20:00'}, headers=headers)
+    await http.post('/api/v1/game/timer/start', headers=headers)
+    step = 0
+    while not stop.is_set():
+        await asyncio.sleep(0.25)
+        step += 1
+        team = 'home' if step % 2 else 'away'
+        if step % 2 == 0:
+            await http.post('/api/v1/game/shots', json={'team': team, 'delta': 1}, headers=headers)
+            counts['shots'] += 1
+        if step % 17 == 0:
+            if batch:
+                ops = [{'op': 'score', 'team': team, 'delta': 1}, {'op': 'shots', 'team': team, 'delta': 1}]
+                await http.post('/api/v1/game/commands', json={'commands': ops}, headers=headers)
+            else:
+                await http.post('/api/v1/game/score', json={'team': team, 'delta': 1}, headers=headers)
+                await http.post('/api/v1/game/shots', json={'team': team, 'delta': 1}, headers=headers)
+            counts['goals'] += 1
+            counts['shots'] += 1
+        if step % 23 == 0:
+            await http.post('/api/v1/game/penalties', json={'team': team, 'player_number': str(step % 30), 'minutes': 2}, headers=headers)
+            counts['penalties'] += 1
+        if step % 13 == 0:
+            view = {'view': 'message', 'title': 'Pattinaggio', 'message': f'Turno {step}'}
+            await http.post('/api/v1/skating/command/display', json={'type': 'showView', 'payload': view}, headers=headers)
+            counts['views'] += 1
+        if step % 11 == 0:
+            await endpoints.send_notification(None, f'Avviso {step}', 'info')
+            counts['notifications'] += 1
+    return counts
+
+
+async def run(args) -> dict:
+    operator_token, viewers = bootstrap_users(args.notify)
+    headers = {'Authorization': f'Bearer {operator_token}'}
+    scheduler = asyncio.get_running_loop().create_task(endpoints.game_scheduler())
+    heartbeat = asyncio.get_running_loop().create_task(ws_manager.heartbeat_loop())
+
+    clients = []
+    enc = f'encoding={args.encoding}' if args.encoding != 'json' else ''
+    for i in range(args.game):
+        clients.append(SimClient(f'game-{i}', '/api/v1/ws/game', enc, args.slow_ms / 1000.0 if i < args.slow else 0.0))
+    for i in range(args.display):
+        clients.append(SimClient(f'display-{i}', '/api/v1/ws/display', enc))
+    for uid, token in viewers:
+        clients.append(SimClient(f'notify-{uid}', '/api/v1/ws', f'token={token}' + (f'&{enc}' if enc else '')))
+    for port, c in enumerate(clients, start=10000):
+        await c.connect(port)
+    for (uid, _), c in zip(viewers, clients[args.game + args.display:]):
+        c.send_json({'type': 'subscribe', 'topics': [f'notifications_user_{uid}', 'notifications_all']})
+    await asyncio.sleep(0.5)
+
+    stop = asyncio.Event()
+    with DeliveryLog() as log:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench') as http:
+            log.recording = True
+            wall0, cpu0 = time.perf_counter(), time.process_time()
+            driver = asyncio.get_running_loop().create_task(drive_game(http, headers, stop, args.batch))
+            await asyncio.sleep(args.duration)
+            stop.set()
+            actions = await driver
+            log.recording = False
+            await asyncio.sleep(args.drain)  # let the queues empty before counting drops
+            wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+
+    room_of = {'game': 'game', 'display': 'display', 'notify': 'notifications'}
+    latency: dict = {}
+    drops: dict = {}
+    expected_by_room: dict = {}
+    encoding = ws_codec.negotiate(args.encoding)
+    for room, sent_at, frame in log.frames.values():
+        # /ws/game joins the default game's room, 'game:main'
+        key = 'notifications' if room.startswith('notifications') else 'game' if room.startswith('game:') else room
+        # clients see the object the writer sent: the cached wire form for their encoding
+        expected_by_room.setdefault(key, []).append((id(frame.wire(encoding)), sent_at, room))
+    for c in clients:
+        key = room_of[c.name.split('-')[0]]
+        lat = latency.setdefault(key, [])
+        d = drops.setdefault(key, {'expected': 0, 'received': 0, 'clients_evicted': 0})
+        if c.closed:
+            d['clients_evicted'] += 1
+        for fid, sent_at, room in expected_by_room.get(key, ()):
+            if key == 'notifications' and room not in ('notifications_all', f"notifications_user_{c.name.split('-')[1]}"):
+                continue
+            d['expected'] += 1
+            got = c.received.get(fid)
+            if got is not None:
+                d['received'] += 1
+                lat.append((got - sent_at) * 1000.0)
+    for d in drops.values():
+        d['dropped'] = d['expected'] - d['received']
+
+    game_frames = sum(1 for room, _, _ in log.frames.values() if room.startswith('game:'))
+
+    stats = ws_manager.stats()
+    for c in clients:
+        await c.close()
+    scheduler.cancel()
+    heartbeat.cancel()
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'host': {'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'config': vars(args),
+        'actions': actions,
+        'frames_broadcast': len(log.frames),
+        'latency_ms': {room: percentiles(v) for room, v in latency.items()},
+        'drops': drops,
+        'game_frames_per_s': round(game_frames / wall, 2),
+        'cpu': {'cpu_s': round(cpu, 3), 'wall_s': round(wall, 3), 'utilisation': round(cpu / wall, 3)},
+        'manager': {'evicted': stats['evicted'], 'coalesced': sum(c['coalesced'] for c in stats['clients']),
+                    'queue_dropped': sum(c['dropped'] for c in stats['clients']),
+                    'max_lag_ms': max((c['max_lag_ms'] for c in stats['clients']), default=0.0)},
+    }
+
+
+_COMPARE = [
+    ('latency_ms', 'game', 'p99'), ('latency_ms', 'display', 'p99'), ('latency_ms', 'notifications', 'p99'),
+    ('game_frames_per_s',), ('cpu', 'utilisation'), ('manager', 'queue_dropped'),
+]
+
+
+def _dig(result: dict, path: tuple):
+    for key in path:
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def compare(old_path: str, new_path: str) -> None:
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    for path in _COMPARE:
+        a, b = _dig(old, path), _dig(new, path)
+        change = f'{(b - a) / a * 100:+.1f}%' if a and b is not None else ''
+        print(f"{'.'.join(path):<28} {a!s:>10} -> {b!s:<10} {change}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--game', type=int, default=200, help='sockets on the game room')
+    ap.add_argument('--display', type=int, default=50, help='sockets on the display room')
+    ap.add_argument('--notify', type=int, default=50, help='authenticated notification sockets')
+    ap.add_argument('--slow', type=int, default=0, help='how many game clients are slow readers')
+    ap.add_argument('--slow-ms', type=float, default=200.0, help='per-message delay of a slow reader')
+    ap.add_argument('--encoding', default='json', choices=('json', 'struct', 'msgpack'))
+    ap.add_argument('--batch', action='store_true', help='send a goal and its shot as one /game/commands batch')
+    ap.add_argument('--duration', type=float, default=20.0, help='seconds of game to simulate')
+    ap.add_argument('--drain', type=float, default=1.0, help='seconds to wait for queues to empty')
+    ap.add_argument('--out', help='result file (default: benchmarks/results/ws_fanout-<time>.json)')
+    ap.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two result files and exit')
+    args = ap.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+    result = asyncio.run(run(args))
+    out = args.out or os.path.join(RESULTS_DIR, f"ws_fanout-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps({k: result[k] for k in ('latency_ms', 'drops', 'game_frames_per_s', 'cpu', 'manager')}, indent=2))
+    print(f'written to {out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import os
+import pytest
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test.db')
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.db.session import Base, engine, SessionLocal
+from app.models.settings import AuditLog
+from app.models.rbac import Role, User
+from app.core.security import hash_password, create_access_token
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        db.query(AuditLog).filter(AuditLog.action.like('search.%')).delete(synchronize_session=False)
+        for i in range(30):
+            db.add(AuditLog(timestamp=now - timedelta(hours=i), user_id=1, action='search.recent' if i < 24 else 'search.old', details=f'row {i}'))
+        db.add(AuditLog(timestamp=now - timedelta(days=40), user_id=1, action='search.ancient', details='100%_literal'))
+        db.commit()
+    finally:
+        db.close()
+    yield
+
+
+@pytest.fixture()
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture()
+def admin_token():
+    db = SessionLocal()
+    try:
+        role = db.query(Role).filter(Role.name=='admin').first()
+        if not role:
+            role = Role(name='admin')
+            db.add(role); db.commit(); db.refresh(role)
+        user = db.query(User).filter(User.username=='admin').first()
+        if not user:
+            user = User(username='admin', email='admin@example.com', full_name='Admin', hashed_password=hash_password('adminadmin'), is_active=True)
+            user.roles.append(role)
+            db.add(user); db.commit(); db.refresh(user)
+        return create_access_token(str(user.id))
+    finally:
+        db.close()
+
+
+def auth_headers(token: str):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_time_range_and_prefix_filters(client, admin_token):
+    since = (datetime.now(timezone.utc) - timedelta(hours=24, minutes=30)).isoformat()
+    r = client.get('/api/v1/admin/audit', params={'since': since, 'action_prefix': 'search.'}, headers=auth_headers(admin_token))
+    assert r.status_code == 200
+    actions = {a['action'] for a in r.json()}
+    assert len(r.json()) == 25
+    assert actions == {'search.recent', 'search.old'}
+
+    r = client.get('/api/v1/admin/audit', params={'action': 'search.ancient'}, headers=auth_headers(admin_token))
+    assert [a['details'] for a in r.json()] == ['100%_literal']
+
+
+def test_search_escapes_wildcards(client, admin_token):
+    r = client.get('/api/v1/admin/audit', params={'q': '0%_l'}, headers=auth_headers(admin_token))
+    assert [a['action'] for a in r.json()] == ['search.ancient']
+
+
+def test_keyset_pagination_walks_all_rows(client, admin_token):
+    seen = []
+    cursor = None
+    while True:
+        params = {'action_prefix': 'search.', 'limit': 7}
+        if cursor:
+            params['cursor'] = cursor
+        r = client.get('/api/v1/admin/audit', params=params, headers=auth_headers(admin_token))
+        assert r.status_code == 200
+        seen.extend(a['id'] for a in r.json())
+        cursor = r.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+    assert len(seen) == 31
+    assert len(set(seen)) == 31
+
+
+def test_settings_change_is_audited_only_once_committed(monkeypatch):
+    from app.api.v1 import endpoints as ep
+    logged = []
+    monkeypatch.setattr(ep.audit_writer, 'log', lambda *args: logged.append(args))
+    admin = User(id=1, username='admin')
+    db = SessionLocal()
+    try:
+        def failing_commit():
+            raise RuntimeError('commit failed')
+        monkeypatch.setattr(db, 'commit', failing_commit)
+        with pytest.raises(RuntimeError):
+            ep.admin_settings_set([ep.SettingItem(key='audit.test', value='1')], db, admin)
+        assert logged == []
+    finally:
+        db.rollback()
+        db.close()
+    db = SessionLocal()
+    try:
+        ep.admin_settings_set([ep.SettingItem(key='audit.test', value='1')], db, admin)
+        assert logged == [(1, 'settings.update', '1 items')]
+    finally:
+        db.close()
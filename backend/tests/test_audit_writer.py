@@ -0,0 +1,44 @@
+import os
+import pytest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test.db')
+
+from app.db.session import Base, engine, SessionLocal
+from app.models.settings import AuditLog
+from app.services.audit import AuditWriter
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+
+
+def _count(action: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(AuditLog).filter(AuditLog.action == action).count()
+    finally:
+        db.close()
+
+
+def test_batched_writes_reach_db():
+    before = _count('test.batch')  # test.db outlives the run
+    writer = AuditWriter(max_queue=100, flush_interval_ms=1000, batch_size=10)
+    for i in range(25):
+        assert writer.log(1, 'test.batch', f'item {i}')
+    writer.stop()
+    stats = writer.stats()
+    assert stats['written'] == 25
+    assert stats['queued'] == 0
+    assert stats['batches'] >= 3
+    assert _count('test.batch') - before == 25
+
+
+def test_full_queue_drops_and_counts():
+    writer = AuditWriter(max_queue=3, flush_interval_ms=60000, batch_size=100)
+    writer._ensure_started = lambda: None  # keep entries queued for the assertion
+    results = [writer.log(None, 'test.drop') for _ in range(5)]
+    assert results == [True, True, True, False, False]
+    assert writer.stats()['dropped'] == 2
+    assert writer.flush() == 3
@@ -0,0 +1,140 @@
+import os
+import random
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test.db')
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import game_clock
+from app.services.game_clock import Countdown
+from app.api.v1 import endpoints
+
+
+class VirtualClock:
+    def __init__(self, t: float = 1000.0):
+        self.t = t
+
+    def __call__(self) -> float:
+        return self.t
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    vc = VirtualClock()
+    monkeypatch.setattr(game_clock, 'monotonic', vc)
+    monkeypatch.setattr(endpoints, 'games', endpoints.GameRegistry())
+    return vc
+
+
+def test_countdown_keeps_fraction_across_stop_start(clock):
+    c = Countdown(60)
+    c.start()
+    clock.t += 10.37
+    c.stop()
+    clock.t += 5  # stopped: no time passes on the countdown
+    assert c.remaining_ms() == pytest.approx(49630)
+    assert (c.seconds(), c.tenths()) == (50, 497)
+    c.start()
+    assert c.next_change() == pytest.approx(clock.t + 0.63)
+    clock.t += 49.63
+    assert c.remaining_ms() == pytest.approx(0, abs=1e-6) and c.seconds() == 0
+
+
+def test_sixty_minute_game_has_no_drift(clock):
+    """Three 20' periods with intervals, the scheduler waking late by up to 300ms each time."""
+    game = endpoints.games.default
+    gs = game.state
+    gs.siren_every_minute = True
+    gs.interval_duration_seconds = 900
+    lag = random.Random(42)
+    pulses, period_ends = [], []
+
+    def run_until_stopped(started: float, total_ms: float):
+        endpoints._reschedule_game(game)  # the clock was edited directly, not by a command
+        while gs.timer_running:
+            clock.t += endpoints._next_game_wakeup(clock.t) + lag.uniform(0, 0.3)
+            _, due = endpoints._advance_game_clock(game, clock.t)
+            pulses.extend(due)
+            if gs.timer_running:
+                # what the clock shows always matches real elapsed time
+                assert gs.timer.remaining_ms(clock.t) == pytest.approx(total_ms - (clock.t - started) * 1000, abs=1e-3)
+
+    for period in range(3):
+        gs.period_index = period + 1
+        gs.in_interval = False
+        gs.timer_remaining = 1200
+        start = clock.t
+        if period == 0:
+            # penalty taken 5.3s in: it is aligned to the displayed second and expires with the clock
+            gs.start_timer()
+            clock.t += 5.3
+            gs.add_penalty(endpoints.Penalty(id=1, team='home', player_number='9', remaining=120))
+            assert gs.penalties[0].remaining == 120
+        else:
+            gs.start_timer()
+        run_until_stopped(start, 1200_000)
+        period_ends.append(pulses[-1] - start)
+        assert gs.in_interval and gs.timer_remaining == 900
+        if period == 0:
+            assert gs.penalties == []
+        gs.start_timer()  # interval
+        run_until_stopped(clock.t, 900_000)
+        assert gs.timer_remaining == 0
+
+    # period ends and minute sirens land exactly on their deadlines, whatever the lag
+    assert period_ends == [pytest.approx(1200.0, abs=1e-6)] * 3
+    assert len(pulses) == 3 * 20
+    first_period = sorted(pulses)[:20]
+    assert [round(p - first_period[0], 6) for p in first_period] == [60.0 * i for i in range(20)]
+
+
+def test_clock_endpoint_reports_tenths(clock):
+    gs = endpoints.games.default.state
+    gs.timer_remaining = 75
+    gs.start_timer()
+    clock.t += 12.34
+    snap = gs.clock_snapshot()
+    assert snap['timerRunning'] and snap['timerTenths'] == 627
+
+
+def test_running_clock_is_sent_as_deadlines_and_sirens_ahead_of_time(clock):
+    game = endpoints.games.default
+    gs = game.state
+    gs.siren_every_minute = True
+    gs.timer_remaining = 150
+    gs.start_timer()
+    start = clock.t
+    gs.add_penalty(endpoints.Penalty(id=7, team='away', player_number='4', remaining=120))
+    endpoints._reschedule_game(game)
+    snap = endpoints._snapshot_state(gs)
+    assert snap['timerEndsAt'] == game_clock.server_ms(start + 150)
+    assert snap['penalties'][0]['endsAt'] == game_clock.server_ms(start + 120)
+    assert snap['timeoutEndsAt'] is None
+
+    lead = endpoints.settings.game_siren_lead_ms / 1000.0
+    announced, broadcasts = [], []
+    while gs.timer_running:
+        clock.t += endpoints._next_game_wakeup(clock.t)
+        changed, due = endpoints._advance_game_clock(game, clock.t)
+        announced += [(clock.t, play) for play in due]
+        if changed:
+            broadcasts.append(round(clock.t - start, 2))
+    # no per-second ticks: only penalty expiry and the end of the period change the state
+    assert broadcasts == [120.0, 150.0]
+    assert [round(play - start, 6) for _, play in announced] == [30.0, 90.0, 150.0]
+    assert all(play - t == pytest.approx(lead, abs=0.002) for t, play in announced)
+
+
+def test_time_sync_probe_is_answered_in_server_time():
+    with TestClient(app).websocket_connect('/api/v1/ws/display?encoding=struct') as ws:
+        assert ws.receive_json() == {'type': 'hello', 'encoding': 'struct'}
+        before = game_clock.server_ms()
+        ws.send_json({'type': 'timeSync', 't0': 1234.5})
+        while True:
+            reply = ws.receive_json()
+            if reply.get('type') == 'timeSync':
+                break
+        assert reply['t0'] == 1234.5
+        assert before <= reply['t1'] <= reply['t2'] <= game_clock.server_ms()
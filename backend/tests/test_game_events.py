@@ -0,0 +1,191 @@
+import asyncio
+import os
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test.db')
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import game_clock
+from app.services.game_events import GameEventLog
+from app.services.game_store import GameStateStore
+from app.api.v1 import endpoints as ep
+
+
+class VirtualClock:
+    def __init__(self, t: float = 1000.0):
+        self.t = t
+
+    def __call__(self) -> float:
+        return self.t
+
+
+@pytest.fixture()
+def game(tmp_path, monkeypatch):
+    clock = VirtualClock()
+    monkeypatch.setattr(game_clock, 'monotonic', clock)
+    monkeypatch.setattr(ep, 'game_store', GameStateStore(tmp_path / 'game.json', debounce_ms=0))
+    monkeypatch.setattr(ep.settings, 'game_events_path', tmp_path / 'events')
+    monkeypatch.setattr(ep.settings, 'game_event_snapshot_every', 4)
+    monkeypatch.setattr(ep, 'games', ep.GameRegistry())
+    return clock
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def _rounded(value):
+    if isinstance(value, float):
+        return round(value, 3)
+    if isinstance(value, dict):
+        return {k: _rounded(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_rounded(v) for v in value]
+    return value
+
+
+def _play_first_period(clock):
+    _run(ep.game_setup(ep.GameSetupRequest(home_name='HC Feltre', away_name='Ospiti', period_duration='20:00'), None))
+    _run(ep.game_timer_start(None))
+    clock.t += 61.3
+    _run(ep.game_update_score(ep.ScoreUpdate(team='home', delta=1), None))
+    for _ in range(3):
+        _run(ep.game_update_shots(ep.ShotsUpdate(team='home', delta=1), None))
+    _run(ep.game_add_penalty(ep.AddPenaltyRequest(team='away', player_number='17', minutes=2), None))
+    clock.t += 12.0
+    _run(ep.game_update_score(ep.ScoreUpdate(team='away', delta=-1), None))  # already 0: not logged
+
+
+def test_undo_redo_and_per_period_stats(game):
+    _play_first_period(game)
+    gs = ep.games.default.state
+    assert (gs.score_home, gs.shots_home, len(gs.penalties)) == (1, 3, 1)
+    stats = ep.game_stats(None)
+    assert stats['periods']['1'] == {'goals': {'home': 1, 'away': 0}, 'shots': {'home': 3, 'away': 0},
+                                     'penaltyMinutes': {'home': 0, 'away': 2}}
+
+    # a mis-click on the clock is undone relative to the time run since
+    before = gs.timer.remaining_ms()
+    _run(ep.game_timer_set(ep.TimerSetRequest(seconds=600), None))
+    game.t += 5
+    _run(ep.game_undo(None))
+    assert gs.timer.remaining_ms() == pytest.approx(before - 5000)
+
+    _run(ep.game_period_next(None))
+    _run(ep.game_update_score(ep.ScoreUpdate(team='away', delta=1), None))
+    assert ep.game_stats(None)['periods']['2']['goals'] == {'home': 0, 'away': 1}
+    assert _run(ep.game_undo(None))['undone']['type'] == 'score'
+    assert _run(ep.game_undo(None))['undone']['type'] == 'periodNext'
+    assert (gs.period_index, gs.score_away) == (1, 0)
+    assert _run(ep.game_undo(None))['undone']['type'] == 'penaltyAdd'
+    assert gs.penalties == [] and ep.game_stats(None)['totals']['penaltyMinutes']['away'] == 0
+
+    # redo brings the penalty back with the time it had left, and its minutes
+    assert _run(ep.game_redo(None))['redone']['type'] == 'penaltyAdd'
+    assert gs.penalties[0].id == 1 and gs.penalties[0].remaining == 120 - 17
+    assert ep.game_stats(None)['totals']['penaltyMinutes']['away'] == 2
+    # a new command clears the redo stack
+    _run(ep.game_update_shots(ep.ShotsUpdate(team='away', delta=1), None))
+    with pytest.raises(HTTPException) as exc:
+        _run(ep.game_redo(None))
+    assert exc.value.status_code == 409
+
+
+def test_state_rebuilt_from_snapshots_and_log_matches_live(game, tmp_path):
+    _play_first_period(game)
+    _run(ep.game_remove_penalty(1, None))
+    _run(ep.game_undo(None))  # the penalty is back, running again
+    game.t += 30
+    _run(ep.game_timeout_start(None))
+    game.t += 31  # timeout ends at its deadline, the penalty keeps running
+    changed, _ = ep._advance_game_clock(ep.games.default, game.t)
+    assert changed and ep.games.default.state.timeout_remaining == 0
+
+    log = ep.games.default.log
+    assert len(log.snapshots) > 2  # base + one every 4 events
+    live = _rounded(ep.games.default.state.to_record())
+    assert _rounded(ep._rebuild_game_state(log).to_record()) == live
+    # from the file as well, with stats and undo stack intact
+    log.flush()
+    loaded = GameEventLog.load(log.game_id, log.path, snapshot_every=4)
+    assert loaded.seq == log.seq and loaded.stats() == log.stats()
+    assert loaded.undo_target() == log.undo_target()
+    assert _rounded(ep._rebuild_game_state(loaded).to_record()) == live
+    # any earlier point of the game can be rebuilt too
+    assert ep._rebuild_game_state(loaded, upto=4).shots_home == 1
+
+
+def test_games_are_independent_and_share_one_scheduler(game, monkeypatch):
+    setup = ep.GameSetupRequest(home_name='U15', away_name='U17', period_duration='15:00')
+    assert _run(ep.game_setup(setup, None, game_id='training'))['gameId'] == 'training'
+    main, training = ep.games.default, ep.games['training']
+    assert training.room == 'game:training' and training.log is not main.log
+    assert (ep._public_room('game'), ep._public_room('game:training'), ep._public_room('game:nope')) == ('game:main', 'game:training', None)
+    with pytest.raises(HTTPException) as exc:
+        _run(ep.game_timer_start(None, game_id='nope'))
+    assert exc.value.status_code == 404
+    with pytest.raises(HTTPException) as exc:
+        ep._game('Campo B!', create=True)
+    assert exc.value.status_code == 400
+
+    _run(ep.game_timer_start(None, game_id='training'))
+    _run(ep.game_add_penalty(ep.AddPenaltyRequest(team='home', player_number='9', minutes=2), None, game_id='training'))
+    _run(ep.game_update_score(ep.ScoreUpdate(team='away', delta=1), None, game_id='training'))
+    assert (main.state.score_away, training.state.score_away) == (0, 1)
+    assert main.log.seq == 0 and ep.game_stats(None, game_id='training')['totals']['goals']['away'] == 1
+    # the main game is idle: only the training game's deadlines wake the scheduler
+    assert ep._game_due(main, game.t) is None
+    game.t += ep._next_game_wakeup(game.t) + 120
+    assert ep._advance_game_clock(training, game.t)[0] and training.state.penalties == []
+    assert not main.state.timer_running and main.state.timer_remaining == 20 * 60
+
+    # both games come back after a restart, each with its own log
+    for g in ep.games.values():
+        g.log.flush()  # the module store's flusher; this test runs on its own store
+    ep.game_store.stop()
+    monkeypatch.setattr(ep, 'games', ep.GameRegistry())
+    assert ep.restore_game_state()
+    restored = ep.games['training']
+    assert restored.state.score_away == 1 and restored.log.seq == training.log.seq
+    assert restored.state.penalties == []  # expired after the last snapshot: rebuilt from the log
+    assert restored.penalty_seq == 2 and ep.games.default.state.home_name == 'Casa'
+
+
+def test_command_batch_is_atomic_with_one_broadcast(game):
+    main = ep.games.default
+    _run(ep.game_timer_start(None))
+    version, seq = main.sync.version, main.log.seq
+    goal = ep.GameCommandsRequest(commands=[
+        {'op': 'score', 'team': 'home', 'delta': 1},
+        {'op': 'shots', 'team': 'home', 'delta': 1},
+        {'op': 'penaltyAdd', 'team': 'away', 'player_number': '4', 'minutes': 2},
+    ])
+    out = _run(ep._game_batch(main, goal.commands, is_admin=True))
+    assert [e['type'] for e in out['events']] == ['score', 'shots', 'penaltyAdd']
+    assert out['version'] == version + 1 and main.log.seq == seq + 3
+    assert (main.state.score_home, main.state.shots_home, len(main.state.penalties)) == (1, 1, 1)
+
+    # the second op is invalid: nothing of the batch is applied
+    before = (main.state.to_record(), main.log.seq, main.penalty_seq, main.sync.version)
+    bad = ep.GameCommandsRequest(commands=[
+        {'op': 'penaltyAdd', 'team': 'home', 'player_number': '8', 'minutes': 5},
+        {'op': 'score', 'team': 'nobody', 'delta': 1},
+    ])
+    with pytest.raises(HTTPException) as exc:
+        _run(ep._game_batch(main, bad.commands, is_admin=True))
+    assert exc.value.status_code == 400 and exc.value.detail == 'Comando 2: Team non valido'
+    assert (main.state.to_record(), main.log.seq, main.penalty_seq, main.sync.version) == before
+    with pytest.raises(HTTPException) as exc:
+        _run(ep._game_batch(main, ep.GameCommandsRequest(commands=[{'op': 'explode'}]).commands, is_admin=True))
+    assert exc.value.status_code == 400
+    # penalties need admin, as on their own endpoint
+    with pytest.raises(HTTPException) as exc:
+        _run(ep._game_batch(main, goal.commands, is_admin=False))
+    assert exc.value.status_code == 403 and main.log.seq == before[1]
+
+    # batched events are undone one at a time
+    _run(ep.game_undo(None))
+    assert main.state.penalties == [] and main.state.score_home == 1
+    _run(ep.game_undo(None))
+    assert (main.state.score_home, main.state.shots_home) == (1, 0)
@@ -0,0 +1,90 @@
+import os
+import time
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test.db')
+
+import pytest
+
+from app.services import game_clock
+from app.services.game_store import GameStateStore
+from app.api.v1 import endpoints
+
+
+class VirtualClock:
+    def __init__(self, t: float = 1000.0):
+        self.t = t
+
+    def __call__(self) -> float:
+        return self.t
+
+
+def test_saves_are_debounced_into_one_durable_write(tmp_path):
+    store = GameStateStore(tmp_path / 'game.json', debounce_ms=50)
+    try:
+        for i in range(200):
+            store.save({'clicks': i})
+        assert store.stats()['writes'] == 0  # nothing on the caller's path
+        deadline = time.monotonic() + 2
+        while store.stats()['writes'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert store.load() == {'clicks': 199}
+        assert store.stats()['writes'] == 1 and not store.stats()['pending']
+        assert not (tmp_path / 'game.json.tmp').exists()
+    finally:
+        store.stop()
+
+
+def test_restart_restores_running_clock_from_its_deadline(tmp_path, monkeypatch):
+    clock = VirtualClock()
+    monkeypatch.setattr(game_clock, 'monotonic', clock)
+    monkeypatch.setattr(endpoints.settings, 'game_events_path', tmp_path / 'events')
+    monkeypatch.setattr(endpoints, 'games', endpoints.GameRegistry())
+    store = GameStateStore(tmp_path / 'game.json', debounce_ms=0)
+    monkeypatch.setattr(endpoints, 'game_store', store)
+
+    game = endpoints.games.default
+    game.penalty_seq = 8
+    gs = game.state
+    gs.home_name, gs.score_home, gs.period_index = 'HC Feltre', 3, 2
+    gs.timer_remaining = 600
+    gs.start_timer()
+    clock.t += 0.4
+    gs.add_penalty(endpoints.Penalty(id=7, team='away', player_number='4', remaining=120))
+    clock.t += 10
+    for i in range(5):
+        game.sync.update({**endpoints._snapshot_state(gs), 'n': i})
+    store.save(endpoints._games_record())
+    store.stop()
+    version = game.sync.version
+
+    # new process 3.25s later: different monotonic origin, same server (epoch) time scale
+    clock.t = 50.0
+    monkeypatch.setattr(game_clock, '_EPOCH_OFFSET', game_clock._EPOCH_OFFSET + (1010.4 - 50.0) + 3.25)
+    monkeypatch.setattr(endpoints, 'games', endpoints.GameRegistry())
+    started = time.perf_counter()
+    assert endpoints.restore_game_state()
+    assert time.perf_counter() - started < 1.0
+
+    game = endpoints.games.default
+    gs = game.state
+    assert (gs.home_name, gs.score_home, gs.period_index) == ('HC Feltre', 3, 2)
+    assert gs.timer_running
+    assert gs.timer.remaining_ms() == pytest.approx(600_000 - 10_400 - 3_250, abs=1)
+    assert gs.penalties[0].id == 7 and gs.penalties[0]._clock.running
+    # the penalty keeps its alignment with the game clock's displayed second
+    assert (gs.timer.remaining_ms() - gs.penalties[0]._clock.remaining_ms()) % 1000 == pytest.approx(0, abs=1)
+    assert game.penalty_seq == 8
+    # clients keep counting up: the first version after the restart is a full keyframe
+    assert game.sync.version == version + 1
+
+
+def test_overdue_deadline_restores_at_zero(tmp_path, monkeypatch):
+    clock = VirtualClock()
+    monkeypatch.setattr(game_clock, 'monotonic', clock)
+    gs = endpoints.GameState()
+    gs.timer_remaining = 5
+    gs.start_timer()
+    record = gs.to_record()
+    clock.t += 30  # down for longer than the clock had left
+    restored = endpoints.GameState.from_record(record)
+    assert restored.timer_running and restored.timer.remaining_ms() == 0
@@ -0,0 +1,116 @@
+import asyncio
+import os
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test.db')
+
+import pytest
+
+from app.services import game_clock
+from app.services.game_store import GameStateStore
+from app.services.game_timers import DeadlineQueue
+from app.api.v1 import endpoints as ep
+
+
+class VirtualClock:
+    def __init__(self, t: float = 1000.0):
+        self.t = t
+
+    def __call__(self) -> float:
+        return self.t
+
+
+def test_deadline_queue_moves_and_cancels_keys():
+    q = DeadlineQueue()
+    q.schedule('a', 5.0)
+    q.schedule('b', 3.0)
+    q.schedule('c', 9.0)
+    q.schedule('a', 1.0)  # moved earlier
+    q.schedule('b', 7.0)  # moved later
+    q.cancel('c')
+    assert q.next_deadline() == 1.0 and len(q) == 2
+    assert q.pop_due(6.0) == ['a']
+    assert q.pop_due(8.0) == ['b'] and q.next_deadline() is None
+    for i in range(1000):
+        q.schedule('x', float(i))
+    # superseded entries are dropped before they pile up
+    assert q.stats()['heap'] < 200 and q.pop_due(1e9) == ['x']
+
+
+def test_penalties_expire_in_deadline_order(monkeypatch):
+    clock = VirtualClock()
+    monkeypatch.setattr(game_clock, 'monotonic', clock)
+    gs = ep.GameState()
+    gs.timer_remaining = 1200
+    gs.start_timer()
+    for pid, seconds in ((1, 300), (2, 120), (3, 240), (4, 120)):
+        gs.add_penalty(ep.Penalty(id=pid, team='home', player_number=str(pid), remaining=seconds))
+    gs.remove_penalties({3})
+    clock.t += 100
+    gs.stop_timer()  # stopped clocks leave the heap and come back with new deadlines
+    clock.t += 50
+    gs.start_timer()
+    assert gs.next_penalty_expiry() == pytest.approx(clock.t + 20)
+    assert gs.expired_penalties(clock.t + 19.9) == []
+    assert gs.expired_penalties(clock.t + 20) == [2, 4]
+    gs.remove_penalties({2, 4})
+    # the removed 4' penalty never fires
+    assert gs.expired_penalties(clock.t + 10_000) == [1]
+
+
+def test_scheduler_sleeps_until_the_next_deadline(tmp_path, monkeypatch):
+    monkeypatch.setattr(ep, 'game_store', GameStateStore(tmp_path / 'game.json', debounce_ms=0))
+    monkeypatch.setattr(ep.settings, 'game_events_path', tmp_path / 'events')
+    monkeypatch.setattr(ep, '_game_timers', DeadlineQueue())
+    monkeypatch.setattr(ep, 'games', ep.GameRegistry())
+    game = ep.games.default
+
+    async def scenario():
+        task = asyncio.create_task(ep.game_scheduler())
+        try:
+            await asyncio.sleep(0.3)
+            idle = ep._game_timers.wakeups
+            async with game.lock:
+                await ep._game_command(game, 'timerSet', ms=200.0, before=game.state.timer.remaining_ms())
+                await ep._game_command(game, 'timerStart')
+            await asyncio.sleep(0.5)
+            return idle
+        finally:
+            task.cancel()
+
+    # nothing running: the loop never wakes
+    assert asyncio.run(scenario()) == 0
+    # the siren at 0 (announced at once, inside its lead time) and the end of the period
+    assert game.state.in_interval and not game.state.timer_running
+    assert ep._game_timers.wakeups <= 3 and ep._game_timers.next_deadline() is None
+    assert [e['type'] for e in game.log.since(0)][-1] == 'periodEnd'
+
+
+def test_penalties_expire_at_their_deadlines_before_the_period_end(tmp_path, monkeypatch):
+    clock = VirtualClock()
+    monkeypatch.setattr(game_clock, 'monotonic', clock)
+    monkeypatch.setattr(ep, 'game_store', GameStateStore(tmp_path / 'game.json', debounce_ms=0))
+    monkeypatch.setattr(ep.settings, 'game_events_path', tmp_path / 'events')
+    monkeypatch.setattr(ep, '_game_timers', DeadlineQueue())
+    monkeypatch.setattr(ep, 'games', ep.GameRegistry())
+    game = ep.games.default
+
+    async def play():
+        async with game.lock:
+            await ep._game_command(game, 'timerSet', ms=120000.0, before=game.state.timer.remaining_ms())
+            await ep._game_command(game, 'timerStart')
+            start = clock.t
+            for pid, ms in ((1, 120000.0), (2, 60000.0)):
+                await ep._game_command(game, 'penaltyAdd', id=pid, team='home', player_number=str(pid), ms=ms, minutes=ms / 60000)
+        return start
+
+    start = asyncio.run(play())
+    clock.t = start + 200  # the scheduler wakes late, after both penalties and the period
+    assert ep._advance_game_clock(game, clock.t)[0]
+    events = [e for e in game.log.since(0) if e['type'] in ('penaltyExpired', 'periodEnd')]
+    assert [(e['type'], e['data'].get('ids'), e['at']) for e in events] == [
+        ('penaltyExpired', [2], game_clock.server_ms(start + 60)),
+        ('penaltyExpired', [1], game_clock.server_ms(start + 120)),
+        ('periodEnd', None, game_clock.server_ms(start + 120)),
+    ]
+    # the penalty ending with the period left the board instead of freezing at 0
+    assert game.state.penalties == [] and game.state.in_interval
@@ -0,0 +1,146 @@
+import os
+import asyncio
+import pytest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test.db')
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.v1.endpoints import send_notification
+from app.db.session import Base, engine, SessionLocal
+from app.models.notifications import Notification, NotificationCursor
+from app.models.rbac import User
+from app.core.security import hash_password, create_access_token
+from app.services.notifications import _Ring, NotificationHub, NotificationCoalescer
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.query(Notification).delete()
+        db.query(NotificationCursor).delete()
+        db.commit()
+    finally:
+        db.close()
+    yield
+
+
+@pytest.fixture()
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture()
+def user():
+    db = SessionLocal()
+    try:
+        u = db.query(User).filter(User.username=='inboxuser').first()
+        if not u:
+            u = User(username='inboxuser', email='inbox@example.com', full_name='Inbox', hashed_password=hash_password('secret123'), is_active=True)
+            db.add(u); db.commit(); db.refresh(u)
+        return u.id, {"Authorization": f"Bearer {create_access_token(str(u.id))}"}
+    finally:
+        db.close()
+
+
+def test_inbox_unread_and_bulk_mark_read(client, user):
+    uid, headers = user
+    assert client.get('/api/v1/notifications/unread', headers=headers).json()['unread'] == 0
+    async def send():
+        for i in range(5):
+            await send_notification(uid, f'personale {i}')
+        await send_notification(None, 'a tutti', 'warning', {'k': 1})
+        await send_notification(uid + 1000, 'di un altro')
+    asyncio.run(send())
+
+    r = client.get('/api/v1/notifications', params={'limit': 4}, headers=headers)
+    assert r.status_code == 200
+    assert r.headers['X-Unread-Count'] == '6'
+    page1 = r.json()
+    assert [n['message'] for n in page1][:2] == ['a tutti', 'personale 4']
+    r = client.get('/api/v1/notifications', params={'limit': 4, 'before_id': r.headers['X-Next-Cursor']}, headers=headers)
+    assert len(r.json()) == 2 and 'X-Next-Cursor' not in r.headers
+
+    up_to = page1[2]['id']  # 'personale 3'
+    r = client.post('/api/v1/notifications/read', json={'up_to_id': up_to}, headers=headers)
+    assert r.json() == {'unread': 2, 'last_read_id': up_to}
+    r = client.post('/api/v1/notifications/read', json={}, headers=headers)
+    assert r.json()['unread'] == 0
+    # counters follow new inserts
+    asyncio.run(send_notification(uid, 'nuova'))
+    assert client.get('/api/v1/notifications/unread', headers=headers).json()['unread'] == 1
+
+
+def test_replay_from_ring_buffer_and_db_fallback():
+    hub = NotificationHub(buffer_size=3, max_users=2)
+    first = hub.store(41, 'a')['id']
+    ids = [hub.store(41, f'm{i}')['id'] for i in range(4)]
+    b = hub.store(None, 'all')['id']
+    # last 3 personal + broadcast fit in memory
+    assert [p['id'] for p in hub.replay(41, ids[0])] == ids[1:] + [b]
+    assert hub.replayed_from_memory == 1
+    # older than the ring: served from the table, still complete and ordered
+    assert [p['id'] for p in hub.replay(41, first - 1)] == [first] + ids + [b]
+    assert hub.replayed_from_db == 1
+    # LRU drops buffers of idle users but replay stays correct
+    hub.store(42, 'x'); hub.store(43, 'y')
+    assert [p['message'] for p in hub.replay(41, ids[-1])] == ['all']
+    # several workers: the table is the only complete source
+    hub.memory_replay = False
+    assert [p['id'] for p in hub.replay(41, ids[0])] == ids[1:] + [b] and hub.replayed_from_db == 2
+
+
+def test_ring_stays_in_id_order_when_stores_finish_out_of_order():
+    ring = _Ring(size=3, floor=10)
+    for pid in (12, 11, 14, 13):
+        ring.append({'id': pid})
+    # the oldest id left, so everything after the new floor is still there
+    assert ring.floor == 11 and [p['id'] for p in ring.after(11)] == [12, 13, 14]
+    ring.append({'id': 9})  # behind the floor: left to the table
+    assert [p['id'] for p in ring.items] == [12, 13, 14]
+
+
+def test_ws_subscribe_with_since_replays(client, user):
+    uid, headers = user
+    last = client.get('/api/v1/notifications', headers=headers).json()[0]['id']
+    asyncio.run(send_notification(uid, 'mentre ero offline'))
+    token = headers['Authorization'].split()[1]
+    with client.websocket_connect(f'/api/v1/ws?token={token}') as ws:
+        ws.send_json({'type': 'subscribe', 'topics': [f'notifications_user_{uid}'], 'since': last})
+        assert ws.receive_json()['type'] == 'subscribed'
+        missed = ws.receive_json()
+        assert missed['type'] == 'notification' and missed['message'] == 'mentre ero offline'
+
+
+def test_coalescer_digests_bursts_and_caps_rate():
+    sent = []
+
+    async def deliver(user_id, message, ntype, data):
+        sent.append((user_id, message, ntype, data))
+
+    async def scenario():
+        c = NotificationCoalescer(deliver, window_s=0.05, rate_per_minute=3)
+        for i in range(12):
+            await c.submit(None, f'noleggio {i}', 'info', {'rental_id': i}, key='skates.rental')
+        for i in range(9):
+            await c.submit(None, f'reso {i}', 'success', {'rental_id': i}, key='skates.return')
+        # first of each key went out immediately, the rest are held
+        assert [m for _, m, _, _ in sent] == ['noleggio 0', 'reso 0']
+        # the rate cap also holds back un-keyed messages for that recipient
+        await c.submit(None, 'avviso', 'warning')
+        assert len(sent) == 3
+        await c.submit(None, 'altro avviso', 'warning')
+        assert len(sent) == 3
+        # another recipient is not affected
+        await c.submit(7, 'personale')
+        assert sent[-1][:2] == (7, 'personale')
+        await asyncio.sleep(0.1)
+        digest = sent[-1]
+        assert digest[1] == '11 noleggi, 8 restituzioni, 1 warning negli ultimi 0.05s'
+        assert digest[2] == 'warning'
+        assert digest[3]['counts'] == {'skates.rental': 11, 'skates.return': 8, 'warning': 1}
+        assert len(digest[3]['items']) == 20
+        assert c.stats()['digests'] == 1
+    asyncio.run(scenario())
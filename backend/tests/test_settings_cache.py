@@ -0,0 +1,80 @@
+import os
+import pytest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test.db')
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.db.session import Base, engine, SessionLocal
+from app.models.settings import AppSetting
+from app.models.rbac import Role, User
+from app.core.security import hash_password, create_access_token
+from app.services.settings_cache import settings_cache
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+
+
+@pytest.fixture()
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture()
+def admin_token():
+    db = SessionLocal()
+    try:
+        role = db.query(Role).filter(Role.name=='admin').first()
+        if not role:
+            role = Role(name='admin')
+            db.add(role); db.commit(); db.refresh(role)
+        user = db.query(User).filter(User.username=='admin').first()
+        if not user:
+            user = User(username='admin', email='admin@example.com', full_name='Admin', hashed_password=hash_password('adminadmin'), is_active=True)
+            user.roles.append(role)
+            db.add(user); db.commit(); db.refresh(user)
+        return create_access_token(str(user.id))
+    finally:
+        db.close()
+
+
+def auth_headers(token: str):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_settings_bulk_upsert_updates_db_and_cache(client, admin_token):
+    items = [{'key': 'backup.enabled', 'value': 'true'}, {'key': 'backup.interval_hours', 'value': '6'}]
+    r = client.put('/api/v1/admin/settings', json=items, headers=auth_headers(admin_token))
+    assert r.status_code == 200
+    # second write updates existing rows instead of inserting duplicates
+    r = client.put('/api/v1/admin/settings', json=[{'key': 'backup.interval_hours', 'value': '12'}], headers=auth_headers(admin_token))
+    assert r.status_code == 200
+    db = SessionLocal()
+    try:
+        rows = db.query(AppSetting).filter(AppSetting.key == 'backup.interval_hours').all()
+        assert [r.value for r in rows] == ['12']
+    finally:
+        db.close()
+    assert settings_cache.get_bool('backup.enabled') is True
+    assert settings_cache.get_int('backup.interval_hours', 24) == 12
+
+
+def test_settings_cache_ignores_rolled_back_writes():
+    settings_cache.reload()
+    db = SessionLocal()
+    try:
+        settings_cache.put(db, 'pdf.footer', 'never committed')
+        db.rollback()
+    finally:
+        db.close()
+    assert settings_cache.get('pdf.footer') != 'never committed'
+
+
+def test_json_setting_roundtrip(client, admin_token):
+    r = client.put('/api/v1/admin/obs/mapping', json={'activate_scene': 'Live', 'deactivate_scene': None}, headers=auth_headers(admin_token))
+    assert r.status_code == 200
+    r = client.get('/api/v1/admin/obs/mapping', headers=auth_headers(admin_token))
+    assert r.json() == {'activate_scene': 'Live', 'deactivate_scene': None}
@@ -0,0 +1,70 @@
+import os
+import json
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test.db')
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.state_sync import VersionedState
+
+
+def _msg(frame):
+    return json.loads(frame.data)
+
+
+def test_deltas_keyframes_and_versions():
+    sync = VersionedState(keyframe_every=3)
+    state = {'scoreHome': 0, 'timerRemaining': 1200, 'penalties': []}
+    first = _msg(sync.update(state))
+    assert first == {'type': 'state', 'v': 1, 'payload': state}
+    assert sync.update(dict(state)) is None  # unchanged: nothing to send
+
+    tick = sync.update({**state, 'timerRemaining': 1199})
+    assert tick.type is None  # deltas are never coalesced by send queues
+    assert _msg(tick) == {'type': 'delta', 'v': 2, 'changes': {'timerRemaining': 1199}}
+    assert len(tick) < 64
+
+    _msg(sync.update({**state, 'timerRemaining': 1198}))
+    key = _msg(sync.update({**state, 'timerRemaining': 1197}))
+    assert key['type'] == 'state' and key['v'] == 4
+    assert _msg(sync.keyframe())['payload']['timerRemaining'] == 1197
+    assert sync.versioned(state)['version'] == 4
+
+
+def test_game_room_resync_returns_keyframe():
+    client = TestClient(app)
+    r = client.get('/api/v1/game/state')
+    assert r.status_code == 200
+    with client.websocket_connect('/api/v1/ws/game') as ws:
+        ws.send_json({'type': 'resync'})
+        msg = ws.receive_json()
+        assert msg['type'] == 'state'
+        assert msg['v'] >= 1
+        assert 'timerRemaining' in msg['payload']
+
+
+def test_game_state_long_poll():
+    client = TestClient(app)
+    current = client.get('/api/v1/game/state').json()['version']
+    # already newer: answered at once
+    assert client.get(f'/api/v1/game/state?after={current - 1}').json()['version'] == current
+    # nothing changes within the timeout
+    assert client.get(f'/api/v1/game/state?after={current}&timeout=0.2').status_code == 204
+
+
+def test_game_state_etag_revalidation():
+    client = TestClient(app)
+    first = client.get('/api/v1/game/state')
+    etag = first.headers['etag']
+    assert etag.endswith(f"-{first.json()['version']}\"") and first.headers['cache-control'] == 'no-cache'
+    again = client.get('/api/v1/game/state', headers={'If-None-Match': f'"other", W/{etag}'})
+    assert again.status_code == 304 and again.content == b'' and again.headers['etag'] == etag
+    assert client.get('/api/v1/game/state', headers={'If-None-Match': '"stale-1"'}).status_code == 200
+
+    sync = VersionedState()
+    sync.update({'scoreHome': 0})
+    body, tag = sync.current_json(), sync.etag()
+    assert sync.current_json() is body  # encoded once per version
+    sync.update({'scoreHome': 1})
+    assert sync.etag() != tag and json.loads(sync.current_json()) == {'scoreHome': 1, 'version': 2}
+    assert VersionedState().etag() != VersionedState().etag()  # another process's version 0
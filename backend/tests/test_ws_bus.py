@@ -0,0 +1,84 @@
+import os
+import json
+import asyncio
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test.db')
+
+from app.services.ws_bus import UnixSocketBus, decode_wire, encode_wire
+from app.services.ws_manager import Frame, WSManager
+
+
+class FakeWS:
+    client = None
+
+    def __init__(self):
+        self.received = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        self.received.append(json.loads(data))
+
+    async def close(self):
+        pass
+
+
+def test_wire_roundtrip():
+    room, frame = decode_wire(encode_wire('game', Frame('{"type":"state"}', 'state'))[4:])
+    assert (room, frame.data, frame.type) == ('game', '{"type":"state"}', 'state')
+    room, frame = decode_wire(encode_wire('tick', Frame(b'\x01\x02'))[4:])
+    assert (room, frame.data, frame.type) == ('tick', b'\x01\x02', None)
+
+
+async def _wait_for(cond, timeout=2.0):
+    loop = asyncio.get_running_loop()
+    end = loop.time() + timeout
+    while not cond():
+        assert loop.time() < end, 'timed out'
+        await asyncio.sleep(0.01)
+
+
+def test_unix_broker_fans_out_between_workers(tmp_path):
+    async def scenario():
+        path = tmp_path / 'ws.sock'
+        worker_a, worker_b = WSManager(max_queue=8), WSManager(max_queue=8)
+        bus_a = UnixSocketBus(worker_a.deliver, path, reconnect_delay=0.05)
+        bus_b = UnixSocketBus(worker_b.deliver, path, reconnect_delay=0.05)
+        await bus_a.start(); await bus_a.wait_connected()
+        await bus_b.start(); await bus_b.wait_connected()
+        worker_a.bus, worker_b.bus = bus_a, bus_b
+        assert bus_a.is_broker and not bus_b.is_broker
+
+        ws_a, ws_b = FakeWS(), FakeWS()
+        await worker_a.connect('game', ws_a)
+        await worker_b.connect('game', ws_b)
+
+        await worker_b.broadcast('game', {'type': 'state', 'n': 1})
+        await worker_a.broadcast('game', {'type': 'state', 'n': 2})
+        await _wait_for(lambda: len(ws_a.received) == 2 and len(ws_b.received) == 2)
+        # each worker publishes once and delivers locally: no duplicates
+        assert sorted(m['n'] for m in ws_a.received) == [1, 2]
+        assert sorted(m['n'] for m in ws_b.received) == [1, 2]
+
+        # frames of per-process state (the game's versioned deltas) stay on their worker
+        await worker_b.broadcast('game', {'type': 'state', 'n': 4}, local=True)
+        await worker_b.broadcast('game', {'type': 'state', 'n': 5})
+        await _wait_for(lambda: len(ws_a.received) == 3)
+        assert ws_a.received[-1]['n'] == 5 and ws_b.received[-1]['n'] == 5
+
+        # broker goes away: the other worker takes over and fan-out keeps working
+        await bus_a.stop()
+        await _wait_for(lambda: bus_b.is_broker and bus_b._writer is not None)
+        bus_c = UnixSocketBus(worker_a.deliver, path, reconnect_delay=0.05)
+        await bus_c.start(); await bus_c.wait_connected()
+        worker_a.bus = bus_c
+        await worker_b.broadcast('game', {'type': 'state', 'n': 3})
+        await _wait_for(lambda: len(ws_a.received) == 4)
+        assert ws_a.received[-1]['n'] == 3
+
+        await bus_b.stop(); await bus_c.stop()
+        for mgr in (worker_a, worker_b):
+            for conn in list(mgr._connections.values()):
+                conn.close()
+    asyncio.run(scenario())
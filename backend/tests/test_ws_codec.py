@@ -0,0 +1,59 @@
+import os
+import json
+import asyncio
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test.db')
+
+from app.services import ws_codec
+from app.services.state_sync import VersionedState
+from app.services.ws_manager import WSManager, Frame
+
+
+class BinaryWS:
+    client = None
+
+    def __init__(self):
+        self.received = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        self.received.append(('text', data))
+
+    async def send_bytes(self, data):
+        self.received.append(('bytes', data))
+
+    async def close(self):
+        pass
+
+
+def test_struct_siren_is_an_order_of_magnitude_smaller():
+    siren = Frame.encode({'type': 'sirenPulse', 'payload': {'at': 1760000000, 'play_at': 1760000000250}})
+    assert len(siren.wire('struct')) == 9 and len(siren.data) > 60
+    assert ws_codec.unpack_struct(siren.wire('struct'))['payload'] == {'at': 1760000000, 'play_at': 1760000000250}
+
+    # no compact layout: JSON text, same object shared with JSON clients
+    sync = VersionedState()
+    sync.update({'timerRunning': False, 'timerEndsAt': None, 'scoreHome': 0})
+    start = sync.update({'timerRunning': True, 'timerEndsAt': 1760000000250, 'scoreHome': 0})
+    assert start.wire('struct') is start.data
+
+
+def test_negotiation_and_per_connection_encoding():
+    assert ws_codec.negotiate(None) == 'json'
+    assert ws_codec.negotiate('bogus') == 'json'
+    assert ws_codec.negotiate('msgpack') == ('msgpack' if ws_codec.msgpack is not None else 'json')
+
+    async def scenario():
+        mgr = WSManager(max_queue=16)
+        plain, compact = BinaryWS(), BinaryWS()
+        await mgr.connect('display', plain)
+        await mgr.connect('display', compact, encoding='struct')
+        await mgr.broadcast('display', {'type': 'sirenPulse', 'payload': {'at': 1, 'play_at': 1500}})
+        await asyncio.sleep(0.05)
+        assert plain.received == [('text', '{"type":"sirenPulse","payload":{"at":1,"play_at":1500}}')]
+        kind, hello = compact.received[0]
+        assert kind == 'text' and json.loads(hello) == {'type': 'hello', 'encoding': 'struct'}
+        assert compact.received[1] == ('bytes', bytes([0x10]) + (1500).to_bytes(8, 'big'))
+    asyncio.run(scenario())
@@ -0,0 +1,98 @@
+import os
+import pytest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test.db')
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.db.session import Base, engine, SessionLocal
+from app.models.rbac import Permission, Role, User
+from app.core.security import hash_password, create_access_token
+from app.services.game_store import GameStateStore
+from app.api.v1 import endpoints as ep
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+
+
+@pytest.fixture()
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(ep, 'game_store', GameStateStore(tmp_path / 'game.json', debounce_ms=0))
+    monkeypatch.setattr(ep.settings, 'game_events_path', tmp_path / 'events')
+    monkeypatch.setattr(ep, 'games', ep.GameRegistry())
+    return TestClient(app)
+
+
+def _token(username: str, permission: str | None) -> str:
+    db = SessionLocal()
+    try:
+        u = db.query(User).filter(User.username == username).first()
+        if not u:
+            u = User(username=username, email=f'{username}@example.com', full_name=username, hashed_password=hash_password('secret123'), is_active=True)
+            if permission:
+                perm = db.query(Permission).filter(Permission.code == permission).first() or Permission(code=permission)
+                role = db.query(Role).filter(Role.name == 'ws_game_operator').first() or Role(name='ws_game_operator')
+                if perm not in role.permissions:
+                    role.permissions.append(perm)
+                u.roles.append(role)
+            db.add(u); db.commit(); db.refresh(u)
+        return create_access_token(str(u.id))
+    finally:
+        db.close()
+
+
+def _ack(ws) -> dict:
+    while True:
+        msg = ws.receive_json()
+        if msg.get('type') == 'ack':
+            return msg
+
+
+def test_commands_on_the_game_socket_are_acked_in_order(client, monkeypatch):
+    monkeypatch.setattr(ep.settings, 'ws_command_burst', 4)
+    monkeypatch.setattr(ep.settings, 'ws_command_rate', 0.0)
+    token = _token('wsoperator', 'game.control')
+    goal = [{'op': 'score', 'team': 'home', 'delta': 1}, {'op': 'shots', 'team': 'home', 'delta': 1}]
+    with client.websocket_connect(f'/api/v1/ws/game?token={token}') as ws:
+        assert ws.receive_json()['type'] == 'state'
+        ws.send_json({'type': 'command', 'seq': 1, 'commands': goal})
+        # the new state is on the socket before the ack
+        assert ws.receive_json()['type'] in ('state', 'delta')
+        ack = ws.receive_json()
+        assert ack['type'] == 'ack' and ack['seq'] == 1 and ack['ok']
+        assert [e['type'] for e in ack['events']] == ['score', 'shots'] and ack['version'] == ep.games.default.sync.version
+        assert ep.games.default.state.score_home == 1
+
+        ws.send_json({'type': 'command', 'seq': 1, 'commands': goal})  # resent: not applied twice
+        assert _ack(ws)['status'] == 409 and ep.games.default.state.score_home == 1
+        ws.send_json({'type': 'command', 'seq': 2, 'commands': [{'op': 'penaltyAdd', 'team': 'home', 'player_number': '5', 'minutes': 2}]})
+        assert _ack(ws) == {'type': 'ack', 'seq': 2, 'ok': False, 'status': 403, 'detail': 'Permesso negato'}
+        ws.send_json({'type': 'command', 'seq': 3, 'commands': [{'op': 'score', 'team': 'nobody', 'delta': 1}]})
+        assert _ack(ws)['detail'] == 'Comando 1: Team non valido'
+        # the bucket (4 at once, no refill) is empty
+        ws.send_json({'type': 'command', 'seq': 4, 'commands': goal})
+        assert _ack(ws)['status'] == 429 and ep.games.default.state.score_home == 1
+        # a throttled command was not applied, so the same seq goes through once the bucket refills
+        monkeypatch.setattr(ep.settings, 'ws_command_rate', 1e6)
+        ws.send_json({'type': 'command', 'seq': 4, 'commands': goal})
+        assert _ack(ws)['ok'] and ep.games.default.state.score_home == 2
+
+
+def test_commands_need_game_control_at_connect(client):
+    viewer = _token('wsviewer_nocontrol', None)
+    command = {'type': 'command', 'seq': 1, 'commands': [{'op': 'timerStart'}]}
+    for url in ('/api/v1/ws/game', f'/api/v1/ws/game?token={viewer}'):
+        with client.websocket_connect(url) as ws:
+            ws.receive_json()
+            ws.send_json(command)
+            assert _ack(ws)['status'] == 403
+    # the multiplexed socket addresses a game by id
+    operator = _token('wsoperator', 'game.control')
+    with client.websocket_connect(f'/api/v1/ws?token={operator}') as ws:
+        ws.send_json({**command, 'game': 'nope'})
+        assert _ack(ws)['status'] == 404
+        ws.send_json({**command, 'seq': 2})
+        assert _ack(ws)['ok'] and ep.games.default.state.timer_running
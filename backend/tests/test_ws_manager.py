@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import asyncio
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test.db')
+
+from app.services.ws_manager import WSManager, Frame
+
+
+class FakeWS:
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.received = []
+        self.closed = False
+        self.client = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        if self.fail:
+            raise RuntimeError('gone')
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received.append(json.loads(data))
+
+    async def close(self):
+        self.closed = True
+
+
+def test_slow_client_does_not_block_others():
+    async def scenario():
+        mgr = WSManager(max_queue=16, policy='drop_oldest')
+        slow, fast = FakeWS(delay=0.5), FakeWS()
+        await mgr.connect('game', slow)
+        await mgr.connect('game', fast)
+        started = asyncio.get_running_loop().time()
+        assert await mgr.broadcast('game', {'type': 'state', 'n': 1}) == 2
+        assert asyncio.get_running_loop().time() - started < 0.05
+        await asyncio.sleep(0.05)
+        assert fast.received == [{'type': 'state', 'n': 1}]
+        assert slow.received == []
+        stats = mgr.stats()
+        assert stats['rooms']['game'] == 2
+        assert stats['connections'] == 2
+    asyncio.run(scenario())
+
+
+def test_overflow_policies():
+    async def scenario():
+        for policy in ('drop_oldest', 'coalesce', 'disconnect'):
+            mgr = WSManager(max_queue=3, policy=policy)
+            ws = FakeWS(delay=10)
+            conn = await mgr.connect('game', ws)
+            await asyncio.sleep(0)
+            # first message is picked up by the writer and blocks in send
+            await mgr.broadcast('game', {'type': 'state', 'n': 0})
+            await asyncio.sleep(0)
+            await mgr.broadcast('game', {'type': 'sirenPulse'})
+            for n in range(1, 5):
+                await mgr.broadcast('game', {'type': 'state', 'n': n})
+            queued = [json.loads(f.data) for _, f in conn.queue]
+            if policy == 'drop_oldest':
+                assert [m.get('n') for m in queued] == [2, 3, 4]
+                assert conn.dropped == 2
+            elif policy == 'coalesce':
+                # stale states are replaced, other message types are kept
+                assert queued == [{'type': 'sirenPulse'}, {'type': 'state', 'n': 3}, {'type': 'state', 'n': 4}]
+                assert conn.coalesced == 2
+            else:
+                assert conn.closed
+                await asyncio.sleep(0)
+                assert ws.closed
+            conn.close()
+    asyncio.run(scenario())
+
+
+def test_failed_send_closes_connection():
+    async def scenario():
+        mgr = WSManager(max_queue=4, policy='drop_oldest')
+        ws = FakeWS(fail=True)
+        conn = await mgr.connect('display', ws)
+        await mgr.broadcast('display', {'type': 'showView'})
+        await asyncio.sleep(0.01)
+        assert conn.closed
+        assert await mgr.broadcast('display', {'type': 'showView'}) == 0
+    asyncio.run(scenario())
+
+
+def test_missed_pong_evicts_and_pong_keeps_alive():
+    async def scenario():
+        mgr = WSManager(max_queue=8, policy='drop_oldest', ping_interval=5, pong_timeout=2)
+        alive, dead = FakeWS(), FakeWS()
+        await mgr.connect('game', alive)
+        await mgr.connect('notifications_user_7', dead)
+        t0 = mgr._connections[alive].last_seen
+        mgr.check_heartbeats(now=t0 + 6)
+        await asyncio.sleep(0.01)
+        assert alive.received[-1]['type'] == 'ping'
+        assert dead.received[-1]['type'] == 'ping'
+        mgr.touch(alive)  # pong
+        assert mgr.check_heartbeats(now=t0 + 9) == 1
+        await asyncio.sleep(0.01)
+        assert dead.closed
+        assert mgr.room_gauges() == {'control': 0, 'player': 0, 'display': 0, 'game': 1}
+        assert mgr.stats()['evicted'] == 1
+    asyncio.run(scenario())
+
+
+def test_evicted_connection_stops_a_stuck_writer():
+    async def scenario():
+        mgr = WSManager(max_queue=8, policy='drop_oldest', ping_interval=5, pong_timeout=2)
+        stuck = FakeWS(delay=3600)  # half-open socket: send never returns
+        await mgr.connect('game', stuck)
+        conn = mgr._connections[stuck]
+        await mgr.broadcast('game', {'type': 'state'})
+        await asyncio.sleep(0.01)
+        t0 = conn.last_seen
+        mgr.check_heartbeats(now=t0 + 6)
+        assert mgr.check_heartbeats(now=t0 + 9) == 1
+        await asyncio.sleep(0.01)
+        assert conn._writer.done() and stuck.closed and not conn.queue
+    asyncio.run(scenario())
+
+
+def test_send_failure_removes_from_rooms():
+    async def scenario():
+        mgr = WSManager(max_queue=4, policy='drop_oldest')
+        await mgr.connect('display', FakeWS(fail=True))
+        await mgr.broadcast('display', {'type': 'showView'})
+        await asyncio.sleep(0.01)
+        assert mgr.room_gauges()['display'] == 0
+        assert mgr.stats()['connections'] == 0
+    asyncio.run(scenario())
+
+
+def test_endpoint_disconnect_cleans_up():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services.ws_manager import ws_manager
+    client = TestClient(app)
+    before = ws_manager.room_gauges()['display']
+    with client.websocket_connect('/api/v1/ws/display') as ws:
+        ws.send_json({'type': 'pong'})
+        ws.send_json({'hello': 1})
+        assert ws.receive_json() == {'ok': True}
+        assert ws_manager.room_gauges()['display'] == before + 1
+    for _ in range(50):
+        if ws_manager.room_gauges()['display'] == before:
+            break
+        time.sleep(0.01)
+    assert ws_manager.room_gauges()['display'] == before
+
+
+def test_broadcast_encodes_once_and_shares_frame():
+    async def scenario():
+        mgr = WSManager(max_queue=8, policy='drop_oldest')
+        conns = [await mgr.connect('game', FakeWS(delay=10)) for _ in range(3)]
+        await asyncio.sleep(0)
+        await mgr.broadcast('game', {'type': 'state', 'n': 0})  # picked up by the writers
+        await asyncio.sleep(0)
+        frame = Frame.encode({'type': 'state', 'n': 1})
+        assert await mgr.broadcast('game', frame) == 3
+        assert all(c.queue[-1][1] is frame for c in conns)
+        assert await mgr.broadcast('game', '{"type":"raw"}') == 3
+        assert conns[0].queue[-1][1].data == '{"type":"raw"}'
+        for c in conns:
+            c.close()
+    asyncio.run(scenario())
+
+
+def test_late_joiner_gets_retained_state_only():
+    async def scenario():
+        mgr = WSManager(max_queue=16)
+        early = FakeWS()
+        await mgr.connect('display', early)
+        await mgr.broadcast('display', {'type': 'showView', 'payload': {'view': 'message'}}, retain=True)
+        await mgr.broadcast('display', {'type': 'showView', 'payload': {'view': 'clear'}}, retain=True)
+        await mgr.broadcast('display', {'type': 'sirenPulse'})
+        mgr.retain('game', 'state', lambda: Frame.encode({'type': 'state', 'v': 7}))
+        late = FakeWS()
+        await mgr.connect('display', late)
+        await mgr.connect('game', late)
+        await asyncio.sleep(0.05)
+        assert len(early.received) == 3
+        # only the latest retained value per type, no one-shot events; providers evaluated at join
+        assert late.received == [{'type': 'showView', 'payload': {'view': 'clear'}}, {'type': 'state', 'v': 7}]
+        assert mgr.stats()['retained'] == {'display': ['showView'], 'game': ['state']}
+    asyncio.run(scenario())
+
+
+def test_listener_gets_broadcasts_and_resets_on_overflow():
+    async def scenario():
+        mgr = WSManager(max_queue=2)
+        mgr.retain('game', 'state', Frame.encode({'type': 'state', 'v': 0}))
+        with mgr.listen('game') as listener:
+            assert json.loads((await listener.get(0.1)).data)['v'] == 0
+            for v in (1, 2, 3):
+                await mgr.broadcast('game', {'type': 'delta', 'v': v})
+            # overflow: backlog replaced by the latest frame plus the retained state
+            got = [json.loads((await listener.get(0.1)).data) for _ in range(2)]
+            assert got == [{'type': 'delta', 'v': 3}, {'type': 'state', 'v': 0}]
+            assert await listener.get(0.05) is None
+            assert mgr.stats()['listeners'] == {'game': 1}
+        assert mgr.stats()['listeners'] == {}
+    asyncio.run(scenario())
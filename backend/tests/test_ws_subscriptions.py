@@ -0,0 +1,88 @@
+import os
+import pytest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test.db')
+
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from app.main import app
+from app.db.session import Base, engine, SessionLocal
+from app.models.rbac import Permission, Role, User
+from app.core.security import hash_password, create_access_token
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+
+
+@pytest.fixture()
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture()
+def user():
+    db = SessionLocal()
+    try:
+        u = db.query(User).filter(User.username=='wsviewer').first()
+        if not u:
+            u = User(username='wsviewer', email='wsviewer@example.com', full_name='WS', hashed_password=hash_password('secret123'), is_active=True)
+            db.add(u); db.commit(); db.refresh(u)
+        return u.id, create_access_token(str(u.id))
+    finally:
+        db.close()
+
+
+def test_rejects_missing_or_bad_token(client):
+    for url in ('/api/v1/ws', '/api/v1/ws?token=garbage'):
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect(url) as ws:
+                ws.receive_json()
+
+
+def test_legacy_route_only_serves_public_rooms(client):
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect('/api/v1/ws/notifications_user_1') as ws:
+            ws.receive_json()
+
+
+def test_subscribe_checks_topic_permissions(client, user):
+    uid, token = user
+    with client.websocket_connect(f'/api/v1/ws?token={token}') as ws:
+        ws.send_json({'type': 'subscribe', 'topics': ['game', f'notifications_user_{uid}', 'notifications_all', f'notifications_user_{uid + 1000}', 'control', 'made_up']})
+        msg = ws.receive_json()
+        assert msg['type'] == 'subscribed'
+        assert msg['topics'] == sorted(['game:main', f'notifications_user_{uid}', 'notifications_all'])
+        assert set(msg['denied']) == {f'notifications_user_{uid + 1000}', 'control', 'made_up'}
+        # the game room's current keyframe follows the ack
+        assert ws.receive_json()['type'] == 'state'
+
+        ws.send_json({'type': 'unsubscribe', 'topics': ['game']})
+        assert 'game:main' not in ws.receive_json()['topics']
+
+
+def test_control_room_needs_obs_control(client, user):
+    _, viewer = user
+    for url in ('/api/v1/ws/control', f'/api/v1/ws/control?token={viewer}'):
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect(url) as ws:
+                ws.receive_json()
+    assert client.get('/api/v1/stream/control').status_code == 404
+    db = SessionLocal()
+    try:
+        u = db.query(User).filter(User.username == 'wsobs').first()
+        if not u:
+            perm = db.query(Permission).filter(Permission.code == 'obs.control').first() or Permission(code='obs.control')
+            role = db.query(Role).filter(Role.name == 'ws_obs_operator').first() or Role(name='ws_obs_operator')
+            role.permissions.append(perm)
+            u = User(username='wsobs', email='wsobs@example.com', full_name='OBS', hashed_password=hash_password('secret123'), is_active=True)
+            u.roles.append(role)
+            db.add(u); db.commit(); db.refresh(u)
+        token = create_access_token(str(u.id))
+    finally:
+        db.close()
+    with client.websocket_connect(f'/api/v1/ws/control?token={token}') as ws:
+        ws.send_json({'type': 'hello'})
+        assert ws.receive_json() == {'ok': True}
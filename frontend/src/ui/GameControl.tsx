@@ -1,4 +1,8 @@
-import React, { useEffect, useMemo, useRef, useState } from 'react'
+import React, { useCallback, useEffect, useMemo, useRef, useState } from 'react'
+import { answerPings } from '../utils/wsHeartbeat'
+import { GameStateSync } from '../utils/gameSync'
+import { TimeSync, clientNow } from '../utils/timeSync'
+import { useLiveClock } from '../utils/useLiveClock'
 
 type Penalty = { id:number; team:'home'|'away'; player_number:string; remaining:number }
 
@@ -25,20 +29,25 @@ type GameState = {
   penalties: Penalty[]
 }
 
-function useWs(room: string){
+// with a token the game socket is also the control channel: permission is checked once at connect
+function useWs(room: string, token?: string){
   const [status, setStatus] = useState<'connecting'|'open'|'closed'>('connecting')
   const wsRef = useRef<WebSocket | null>(null)
+  const timeRef = useRef<TimeSync | null>(null)
   useEffect(() => {
-    const base = `/api/v1/ws/${room}`
+    const base = `/api/v1/ws/${room}` + (token ? `?token=${encodeURIComponent(token)}` : '')
     const url = (location.protocol === 'https:' ? 'wss://' : 'ws://') + location.host + base
-    const ws = new WebSocket(url)
+    const ws = answerPings(new WebSocket(url))
     wsRef.current = ws
+    timeRef.current = new TimeSync(ws)
     ws.onopen = () => setStatus('open')
     ws.onclose = () => setStatus('closed')
     ws.onerror = () => setStatus('closed')
-    return () => ws.close()
-  }, [room])
-  return { status, wsRef }
+    return () => { timeRef.current?.stop(); ws.close() }
+  }, [room, token])
+  // server time in epoch ms, as estimated by the time-sync probes
+  const serverNow = useCallback(() => timeRef.current ? timeRef.current.serverNow() : clientNow(), [])
+  return { status, wsRef, serverNow }
 }
 
 function normalizeState(raw: Partial<GameState> & { penalties?: any }): GameState {
@@ -67,24 +76,38 @@ function normalizeState(raw: Partial<GameState> & { penalties?: any }): GameStat
 }
 
 export function GameControl(){
-  const { status, wsRef } = useWs('game')
-  const [state, setState] = useState<GameState>(normalizeState({}))
+  // ?game=<id> controls another rink's game (created by its first setup); default: the main one
+  const gameId = new URLSearchParams(location.search).get('game') || 'main'
+  const api = `/api/v1/games/${encodeURIComponent(gameId)}`
+  const token = sessionStorage.getItem('token') || ''
+  const { status, wsRef, serverNow } = useWs(`game:${encodeURIComponent(gameId)}`, token)
+  // latest state from the server; the clocks in it are counted down locally from their deadlines
+  const [raw, setRaw] = useState<Record<string, any>>({})
+  const state = normalizeState(useLiveClock(raw, serverNow))
   const [setup, setSetup] = useState({ home:'Casa', away:'Ospiti', duration:'20:00', interval:'15:00', colorHome:'#ff4444', colorAway:'#44aaff', sirenEveryMinute:false })
   const [penModal, setPenModal] = useState<{ team:'home'|'away'; open:boolean }>({ team:'home', open:false })
   const [pen, setPen] = useState<{ number:string; minutes:number }>({ number:'', minutes:2 })
   const [log, setLog] = useState<Array<{ ts:number; text:string }>>([])
   const [confirm, setConfirm] = useState<Record<string, number>>({})
 
-  const token = sessionStorage.getItem('token') || ''
-  useEffect(() => {
-    fetch('/api/v1/game/state').then(r => r.json()).then((s)=> setState(normalizeState(s))).catch(() => {})
-  }, [])
+  const syncRef = useRef(new GameStateSync())
+  // socket commands waiting for their ack, by seq
+  const pendingRef = useRef(new Map<number, { resolve: (ack: any) => void; reject: (e: Error) => void }>())
+  const seqRef = useRef(0)
+  // no initial GET state: the server replays the current keyframe when the socket joins the game's room
   useEffect(() => {
     const ws = wsRef.current
     if(!ws) return
     ws.onmessage = (ev) => {
       try{
-        const msg = JSON.parse(ev.data); if(msg.type === 'state' && msg.payload) { setState(normalizeState(msg.payload)) }
+        const msg = JSON.parse(ev.data)
+        if(msg?.type === 'ack'){
+          const waiting = pendingRef.current.get(msg.seq)
+          pendingRef.current.delete(msg.seq)
+          if(waiting){ msg.ok ? waiting.resolve(msg) : waiting.reject(new Error(msg.detail)) }
+          return
+        }
+        const next = syncRef.current.applyMessage(msg, ws); if(next) { setRaw(next) }
       }catch{}
     }
   }, [wsRef])
@@ -101,11 +124,26 @@ export function GameControl(){
     return res
   }
 
+  // game ops (see POST /game/commands): over the socket when it is open, else over HTTP
+  async function command(op: string, fields: Record<string, any> = {}){
+    const commands = [{ op, ...fields }]
+    const ws = wsRef.current
+    if(!ws || ws.readyState !== WebSocket.OPEN){
+      return (await post(`${api}/commands`, { commands })).json()
+    }
+    const seq = ++seqRef.current
+    return new Promise<any>((resolve, reject) => {
+      pendingRef.current.set(seq, { resolve, reject })
+      ws.send(JSON.stringify({ type: 'command', seq, commands }))
+      setTimeout(() => { if(pendingRef.current.delete(seq)) reject(new Error('Nessuna risposta')) }, 5000)
+    })
+  }
+
   const teamLabel = (team:'home'|'away') => team === 'home' ? state.homeName : state.awayName
 
   async function startGame(){
     try{
-      await post('/api/v1/game/setup', { 
+      await post(`${api}/setup`, { 
         home_name: setup.home, 
         away_name: setup.away, 
         period_duration: setup.duration,
@@ -120,7 +158,7 @@ export function GameControl(){
 
   async function changeScore(team:'home'|'away', delta:number){
     try{
-      await post('/api/v1/game/score', { team, delta })
+      await command('score', { team, delta })
       appendLog(`${teamLabel(team)} punteggio ${delta>0?'+1':'-1'}`)
     }catch(e){ console.error(e) }
   }
@@ -129,49 +167,52 @@ export function GameControl(){
     try{
       const current = team === 'home' ? state.shotsHome : state.shotsAway
       if(delta < 0 && current <= 0) return
-      await post('/api/v1/game/shots', { team, delta })
+      await command('shots', { team, delta })
       appendLog(`${teamLabel(team)} tiri ${delta>0?'+1':'-1'}`)
     }catch(e){ console.error(e) }
   }
 
   async function startTimeout(){
     try{
-      await post('/api/v1/game/timeout/start')
+      await command('timeoutStart')
       appendLog('Timeout avviato (30s)')
     }catch(e){ console.error(e) }
   }
 
   async function stopTimeout(){
     try{
-      await post('/api/v1/game/timeout/stop')
+      await command('timeoutStop')
       appendLog('Timeout terminato')
     }catch(e){ console.error(e) }
   }
 
   async function toggleSiren(){
     try{
-      await post('/api/v1/game/siren', { on: !state.sirenOn })
+      await command('siren', { on: !state.sirenOn })
       appendLog(`Sirena ${!state.sirenOn ? 'attivata' : 'disattivata'}`)
     }catch(e){ console.error(e) }
   }
 
   async function toggleObs(){
     try{
-      await post('/api/v1/game/obs', { visible: !state.obsVisible })
+      await command('obs', { visible: !state.obsVisible })
       appendLog(`Grafica OBS ${!state.obsVisible ? 'mostrata' : 'nascosta'}`)
     }catch(e){ console.error(e) }
   }
 
-  async function timerStart(){ try{ await post('/api/v1/game/timer/start'); appendLog('Cronometro avviato') }catch(e){ console.error(e) } }
-  async function timerStop(){ try{ await post('/api/v1/game/timer/stop'); appendLog('Cronometro fermato') }catch(e){ console.error(e) } }
-  async function timerReset(){ try{ await post('/api/v1/game/timer/reset'); appendLog('Cronometro resettato') }catch(e){ console.error(e) } }
-  async function timerSet(seconds:number, running?: boolean){ try{ await post('/api/v1/game/timer/set', { seconds, running }); appendLog(`Tempo impostato a ${formatTime(seconds)}`) }catch(e){ console.error(e) } }
-  async function periodNext(){ try{ await post('/api/v1/game/period/next'); appendLog('Periodo successivo') }catch(e){ console.error(e) } }
-  async function intervalStart(){ try{ await post('/api/v1/game/interval/start'); appendLog('Intervallo avviato') }catch(e){ console.error(e) } }
+  async function timerStart(){ try{ await command('timerStart'); appendLog('Cronometro avviato') }catch(e){ console.error(e) } }
+  async function timerStop(){ try{ await command('timerStop'); appendLog('Cronometro fermato') }catch(e){ console.error(e) } }
+  async function timerReset(){ try{ await command('timerReset'); appendLog('Cronometro resettato') }catch(e){ console.error(e) } }
+  async function timerSet(seconds:number, running?: boolean){ try{ await command('timerSet', { seconds, running }); appendLog(`Tempo impostato a ${formatTime(seconds)}`) }catch(e){ console.error(e) } }
+  async function periodNext(){ try{ await command('periodNext'); appendLog('Periodo successivo') }catch(e){ console.error(e) } }
+  async function intervalStart(){ try{ await command('intervalStart'); appendLog('Intervallo avviato') }catch(e){ console.error(e) } }
+  // server-side undo/redo of the last score, shots, penalty, clock or period edit
+  async function undo(){ try{ const r = await (await post(`${api}/undo`)).json(); appendLog(`Annullato: ${r.undone?.type}`) }catch(e){ appendLog('Niente da annullare') } }
+  async function redo(){ try{ const r = await (await post(`${api}/redo`)).json(); appendLog(`Ripristinato: ${r.redone?.type}`) }catch(e){ appendLog('Niente da ripristinare') } }
 
   async function addPenalty(){
     try{
-      await post('/api/v1/game/penalties', { team: penModal.team, player_number: pen.number, minutes: pen.minutes })
+      await command('penaltyAdd', { team: penModal.team, player_number: pen.number, minutes: pen.minutes })
       appendLog(`Penalità ${teamLabel(penModal.team)} #${pen.number} (${pen.minutes}m)`)
       setPenModal({ ...penModal, open:false })
       setPen({ number:'', minutes:2 })
@@ -347,7 +388,7 @@ export function GameControl(){
               {state.penalties.filter(p => p.team==='home').map(p => (
                 <li key={p.id} style={{display:'flex', justifyContent:'space-between', padding:'4px 0'}}>
                   <span>#{p.player_number} — {Math.floor(p.remaining/60)}:{String(p.remaining%60).padStart(2,'0')}</span>
-                  <button className="btn btn-outline" title="Rimuovi penalità" onClick={() => fetch(`/api/v1/game/penalties/${p.id}`, { method:'DELETE', headers: authHeader || undefined })}>Rimuovi</button>
+                  <button className="btn btn-outline" title="Rimuovi penalità" onClick={() => fetch(`${api}/penalties/${p.id}`, { method:'DELETE', headers: authHeader || undefined })}>Rimuovi</button>
                 </li>
               ))}
             </ul>
@@ -361,7 +402,7 @@ export function GameControl(){
               {state.penalties.filter(p => p.team==='away').map(p => (
                 <li key={p.id} style={{display:'flex', justifyContent:'space-between', padding:'4px 0'}}>
                   <span>#{p.player_number} — {Math.floor(p.remaining/60)}:{String(p.remaining%60).padStart(2,'0')}</span>
-                  <button className="btn btn-outline" onClick={() => fetch(`/api/v1/game/penalties/${p.id}`, { method:'DELETE', headers: authHeader || undefined })}>Rimuovi</button>
+                  <button className="btn btn-outline" onClick={() => fetch(`${api}/penalties/${p.id}`, { method:'DELETE', headers: authHeader || undefined })}>Rimuovi</button>
                 </li>
               ))}
             </ul>
@@ -370,7 +411,13 @@ export function GameControl(){
       </div>
 
       <div className="card" style={{marginTop:16}}>
-        <div className="card-header"><strong>Log Partita</strong></div>
+        <div className="card-header" style={{display:'flex', justifyContent:'space-between', alignItems:'center', gap:8}}>
+          <strong>Log Partita</strong>
+          <div style={{display:'flex', gap:8}}>
+            <button className="btn btn-outline" onClick={undo} title="Annulla l'ultima modifica (punteggio, tiri, penalità, tempo, periodo)">Annulla</button>
+            <button className="btn btn-outline" onClick={redo} title="Ripristina l'ultima modifica annullata">Ripristina</button>
+          </div>
+        </div>
         <div className="card-body" style={{maxHeight:200, overflow:'auto', display:'flex', flexDirection:'column', gap:6}}>
           {log.length === 0 ? <span className="text-muted">Nessuna azione registrata.</span> : log.map(item => (
             <div key={item.ts} className="text-muted" style={{fontSize:12}}>
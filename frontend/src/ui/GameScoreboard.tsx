@@ -1,4 +1,9 @@
-import React, { useEffect, useRef, useState } from 'react'
+import React, { useCallback, useEffect, useRef, useState } from 'react'
+import { answerPings } from '../utils/wsHeartbeat'
+import { GameStateSync } from '../utils/gameSync'
+import { decodeFrame } from '../utils/wsCodec'
+import { TimeSync, clientNow } from '../utils/timeSync'
+import { useLiveClock } from '../utils/useLiveClock'
 
 type Penalty = { id:number; team:'home'|'away'; player_number:string; remaining:number }
 
@@ -8,7 +13,9 @@ type GameState = {
   scoreHome: number
   scoreAway: number
   period: string
+  timerRunning: boolean
   timerRemaining: number
+  inInterval: boolean
   timeoutRemaining: number
   sirenOn: boolean
   obsVisible: boolean
@@ -20,17 +27,23 @@ type GameState = {
 function useWs(room: string){
   const [status, setStatus] = useState<'connecting'|'open'|'closed'>('connecting')
   const wsRef = useRef<WebSocket | null>(null)
+  const timeRef = useRef<TimeSync | null>(null)
   useEffect(() => {
-    const base = `/api/v1/ws/${room}`
+    // compact binary frames for the siren (venue Wi-Fi), JSON for the rest
+    const base = `/api/v1/ws/${room}?encoding=struct`
     const url = (location.protocol === 'https:' ? 'wss://' : 'ws://') + location.host + base
-    const ws = new WebSocket(url)
+    const ws = answerPings(new WebSocket(url))
+    ws.binaryType = 'arraybuffer'
     wsRef.current = ws
+    timeRef.current = new TimeSync(ws)
     ws.onopen = () => setStatus('open')
     ws.onclose = () => setStatus('closed')
     ws.onerror = () => setStatus('closed')
-    return () => ws.close()
+    return () => { timeRef.current?.stop(); ws.close() }
   }, [room])
-  return { status, wsRef }
+  // server time in epoch ms, as estimated by the time-sync probes
+  const serverNow = useCallback(() => timeRef.current ? timeRef.current.serverNow() : clientNow(), [])
+  return { status, wsRef, serverNow }
 }
 
 function normalizeState(raw: Partial<GameState> & { penalties?: any }): GameState {
@@ -40,7 +53,9 @@ function normalizeState(raw: Partial<GameState> & { penalties?: any }): GameStat
     scoreHome: Number(raw.scoreHome ?? 0),
     scoreAway: Number(raw.scoreAway ?? 0),
     period: raw.period ?? '1°',
+    timerRunning: Boolean(raw.timerRunning),
     timerRemaining: Number(raw.timerRemaining ?? 20*60),
+    inInterval: Boolean(raw.inInterval),
     timeoutRemaining: Math.max(0, Number(raw.timeoutRemaining ?? 0)),
     sirenOn: Boolean(raw.sirenOn),
     obsVisible: raw.obsVisible !== false,
@@ -51,8 +66,12 @@ function normalizeState(raw: Partial<GameState> & { penalties?: any }): GameStat
 }
 
 export function GameScoreboard(){
-  const { status, wsRef } = useWs('game')
-  const [state, setState] = useState<GameState>(normalizeState({}))
+  // ?game=<id> shows another rink's game; default: the main one
+  const gameId = new URLSearchParams(location.search).get('game') || 'main'
+  const { status, wsRef, serverNow } = useWs(`game:${encodeURIComponent(gameId)}`)
+  // latest state from the server; the clocks in it are counted down locally from their deadlines
+  const [raw, setRaw] = useState<Record<string, any>>({})
+  const state = normalizeState(useLiveClock(raw, serverNow))
   const prevTimeRef = useRef<number>(state.timerRemaining)
   const sirenUrl = React.useMemo(() => `/api/v1/scoreboard/siren?v=${Date.now()}`,[ ])
   const [audioUnlocked, setAudioUnlocked] = useState<boolean>(false)
@@ -98,12 +117,12 @@ export function GameScoreboard(){
     }
   }, [])
 
-  useEffect(() => { fetch('/api/v1/game/state').then(r => r.json()).then((s)=> setState(normalizeState(s))).catch(() => {}) }, [])
+  const syncRef = useRef(new GameStateSync())
   useEffect(() => {
     const ws = wsRef.current
     if(!ws) return
     ws.onmessage = (ev) => {
-      try{ const msg = JSON.parse(ev.data); if(msg.type === 'state' && msg.payload) { setState(normalizeState(msg.payload)) } }catch{}
+      try{ const next = syncRef.current.applyMessage(decodeFrame(ev.data), ws); if(next) { setRaw(next) } }catch{}
     }
   }, [wsRef])
 
@@ -196,24 +215,37 @@ export function GameScoreboard(){
     }catch{}
   }
 
-  // React to sirenPulse messages and to timer hitting 0
+  // sirenPulse messages arrive ahead of time: every display plays them at the same play_at
+  const pendingSirens = useRef<number[]>([])
   useEffect(() => {
     const ws = wsRef.current
     if(!ws) return
     const prevOnMsg = ws.onmessage
     ws.onmessage = (ev) => {
       try{
-        const msg = JSON.parse(ev.data)
-        if(msg.type === 'sirenPulse') { playSiren() }
-        if(msg.type === 'state' && msg.payload) { setState(normalizeState(msg.payload)) }
+        const msg = decodeFrame(ev.data)
+        if(msg.type === 'sirenPulse') {
+          const delay = Number(msg.payload?.play_at ?? serverNow()) - serverNow()
+          const id = window.setTimeout(() => { pendingSirens.current = pendingSirens.current.filter(t => t !== id); playSiren() }, Math.max(0, delay))
+          pendingSirens.current.push(id)
+        }
+        const next = syncRef.current.applyMessage(msg, ws)
+        if(next) {
+          // clock stopped mid-period before an announced siren: it must not sound
+          if(!next.timerRunning && !next.inInterval && Number(next.timerRemaining) > 0) {
+            pendingSirens.current.forEach(t => window.clearTimeout(t)); pendingSirens.current = []
+          }
+          setRaw(next)
+        }
       }catch{}
     }
     return () => { if(ws) ws.onmessage = prevOnMsg as any }
   }, [wsRef])
 
+  // end of the interval (the server announces period-end sirens itself)
   useEffect(() => {
     const prev = prevTimeRef.current
-    if(prev > 0 && state.timerRemaining === 0){ playSiren() }
+    if(prev > 0 && state.timerRemaining === 0 && state.inInterval){ playSiren() }
     prevTimeRef.current = state.timerRemaining
   }, [state.timerRemaining])
 
@@ -1,19 +1,21 @@
 import React, { useEffect, useMemo, useRef, useState } from 'react'
+import { answerPings } from '../utils/wsHeartbeat'
 
-function useWs(room: string){
+// the 'control' room (OBS scene commands) needs a token with obs.control
+function useWs(room: string, token?: string){
   const [status, setStatus] = useState<'connecting'|'open'|'closed'>('connecting')
   const wsRef = useRef<WebSocket | null>(null)
 
   useEffect(() => {
-    const base = `/api/v1/ws/${room}`
+    const base = `/api/v1/ws/${room}` + (token ? `?token=${encodeURIComponent(token)}` : '')
     const url = (location.protocol === 'https:' ? 'wss://' : 'ws://') + location.host + base
-    const ws = new WebSocket(url)
+    const ws = answerPings(new WebSocket(url))
     wsRef.current = ws
     ws.onopen = () => setStatus('open')
     ws.onclose = () => setStatus('closed')
     ws.onerror = () => setStatus('closed')
     return () => ws.close()
-  }, [room])
+  }, [room, token])
 
   const send = useMemo(() => (data: any) => {
     if(wsRef.current && wsRef.current.readyState === WebSocket.OPEN){
@@ -25,11 +27,11 @@ function useWs(room: string){
 }
 
 export function SkatingControl(){
-  const control = useWs('control')
   const [events, setEvents] = useState<Array<{id:number; title:string; start_time:string; end_time:string}>>([])
   const [uploading, setUploading] = useState(false)
   const [message, setMessage] = useState('')
   const [token, setToken] = useState<string>('')
+  const control = useWs('control', token)
 
   useEffect(() => {
     const t = localStorage.getItem('token')
@@ -1,4 +1,5 @@
 import React, { useEffect, useMemo, useRef, useState } from 'react'
+import { answerPings } from '../utils/wsHeartbeat'
 
 type View = 'logo' | 'timer' | 'nextEvent' | 'message'
 
@@ -8,7 +9,7 @@ function useWs(room: string){
   useEffect(() => {
     const base = `/api/v1/ws/${room}`
     const url = (location.protocol === 'https:' ? 'wss://' : 'ws://') + location.host + base
-    const ws = new WebSocket(url)
+    const ws = answerPings(new WebSocket(url))
     wsRef.current = ws
     ws.onopen = () => setStatus('open')
     ws.onclose = () => setStatus('closed')
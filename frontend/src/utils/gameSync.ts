@@ -0,0 +1,53 @@
+// Client side of the versioned game state stream on the 'game' room.
+// The server sends full keyframes ({type:'state', v, payload}) and deltas
+// ({type:'delta', v, changes} relative to v-1); on a version gap we ask for a resync.
+export class GameStateSync {
+  raw: Record<string, any> = {}
+  version = 0
+
+  // Apply a REST snapshot (GET /game/state); ignored if a newer WS update already arrived
+  applySnapshot(s: Record<string, any>): Record<string, any> | null {
+    const v = Number(s?.version ?? 0)
+    if (v < this.version) return null
+    this.raw = s
+    this.version = v
+    return this.raw
+  }
+
+  // Returns the new raw state, or null when the message did not change it
+  applyMessage(msg: any, ws: WebSocket | null): Record<string, any> | null {
+    if (msg?.type === 'state' && msg.payload) {
+      this.raw = msg.payload
+      this.version = Number(msg.v ?? this.version)
+      return this.raw
+    }
+    if (msg?.type === 'delta') {
+      if (msg.v <= this.version) return null
+      if (msg.v !== this.version + 1) {
+        if (ws && ws.readyState === WebSocket.OPEN) ws.send(JSON.stringify({ type: 'resync' }))
+        return null
+      }
+      this.raw = { ...this.raw, ...msg.changes }
+      this.version = msg.v
+      return this.raw
+    }
+    return null
+  }
+}
+
+// Running clocks arrive as deadlines in server time (timerEndsAt, timeoutEndsAt, penalty
+// endsAt); count them down locally. Seconds round up like the server's clock.
+function secondsLeft(endsAt: any, fallback: any, serverNow: number): number {
+  if (typeof endsAt !== 'number') return Number(fallback ?? 0)
+  return Math.max(0, Math.ceil((endsAt - serverNow) / 1000 - 1e-6))
+}
+
+export function liveClock(raw: Record<string, any>, serverNow: number): Record<string, any> {
+  if (raw.timerEndsAt == null && raw.timeoutEndsAt == null && !(raw.penalties || []).some((p: any) => p?.endsAt != null)) return raw
+  return {
+    ...raw,
+    timerRemaining: secondsLeft(raw.timerEndsAt, raw.timerRemaining, serverNow),
+    timeoutRemaining: secondsLeft(raw.timeoutEndsAt, raw.timeoutRemaining, serverNow),
+    penalties: (raw.penalties || []).map((p: any) => ({ ...p, remaining: secondsLeft(p.endsAt, p.remaining, serverNow) })),
+  }
+}
@@ -0,0 +1,65 @@
+// NTP-style clock sync over the game WebSocket: we send {type:'timeSync', t0} with our clock,
+// the server answers with its receive/transmit times t1/t2 (server ms); t3 is our receive time.
+//   offset = ((t1 - t0) + (t2 - t3)) / 2     rtt = (t3 - t0) - (t2 - t1)
+// The sample with the smallest RTT among the recent ones is the least skewed by queuing.
+// Uses addEventListener so components can still assign ws.onmessage freely.
+const BURST = 5
+const BURST_GAP_MS = 200
+const INTERVAL_MS = 30_000
+const KEEP = 8
+
+// Monotonic-ish client clock in epoch ms (performance.now does not jump with the wall clock)
+export function clientNow(): number {
+  return performance.timeOrigin + performance.now()
+}
+
+export class TimeSync {
+  offset = 0
+  rtt = Infinity
+  private samples: Array<{ offset: number; rtt: number }> = []
+  private timers: number[] = []
+
+  constructor(private ws: WebSocket) {
+    ws.addEventListener('message', this.onMessage)
+    ws.addEventListener('open', this.burst)
+    ws.addEventListener('close', this.stop)
+    if (ws.readyState === WebSocket.OPEN) this.burst()
+  }
+
+  get synced(): boolean {
+    return this.samples.length > 0
+  }
+
+  // Current server time in epoch ms
+  serverNow = (): number => clientNow() + this.offset
+
+  stop = () => {
+    this.timers.forEach(t => window.clearTimeout(t))
+    this.timers = []
+  }
+
+  private probe = () => {
+    if (this.ws.readyState === WebSocket.OPEN) this.ws.send(JSON.stringify({ type: 'timeSync', t0: clientNow() }))
+  }
+
+  private burst = () => {
+    this.stop()
+    for (let i = 0; i < BURST; i++) this.timers.push(window.setTimeout(this.probe, i * BURST_GAP_MS))
+    this.timers.push(window.setInterval(this.probe, INTERVAL_MS))
+  }
+
+  private onMessage = (event: MessageEvent) => {
+    if (typeof event.data !== 'string' || !event.data.includes('"timeSync"')) return
+    const t3 = clientNow()
+    try {
+      const { type, t0, t1, t2 } = JSON.parse(event.data)
+      if (type !== 'timeSync' || typeof t0 !== 'number') return
+      this.samples = [...this.samples, { offset: ((t1 - t0) + (t2 - t3)) / 2, rtt: (t3 - t0) - (t2 - t1) }].slice(-KEEP)
+      const best = this.samples.reduce((a, b) => (b.rtt < a.rtt ? b : a))
+      this.offset = best.offset
+      this.rtt = best.rtt
+    } catch {
+      // not JSON: not ours
+    }
+  }
+}
@@ -0,0 +1,25 @@
+import { useEffect, useState } from 'react'
+import { liveClock } from './gameSync'
+
+// Re-derives the displayed clocks every animation frame (60fps) from the deadlines in
+// ``raw``; React only re-renders when a shown value actually changes.
+export function useLiveClock(raw: Record<string, any>, serverNow: () => number): Record<string, any> {
+  const [live, setLive] = useState(() => liveClock(raw, serverNow()))
+  useEffect(() => {
+    let frame = 0
+    let shown = ''
+    const tick = () => {
+      const next = liveClock(raw, serverNow())
+      const key = `${next.timerRemaining}|${next.timeoutRemaining}|${(next.penalties || []).map((p: any) => p.remaining).join(',')}`
+      if (key !== shown) {
+        shown = key
+        setLive(next)
+      }
+      frame = requestAnimationFrame(tick)
+    }
+    // a new raw state always renders once (shown starts empty), then only on changes
+    tick()
+    return () => cancelAnimationFrame(frame)
+  }, [raw, serverNow])
+  return live
+}
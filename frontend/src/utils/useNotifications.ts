@@ -1,4 +1,7 @@
 import { useEffect, useState, useCallback, useRef } from 'react'
+import { answerPings } from './wsHeartbeat'
+import { getToken } from '../auth'
+import { apiFetch } from './api'
 
 export type Notification = {
   id: string
@@ -12,29 +15,57 @@ export function useNotifications(userId: number | null) {
   const [notifications, setNotifications] = useState<Notification[]>([])
   const [unreadCount, setUnreadCount] = useState(0)
   const wsRef = useRef<WebSocket | null>(null)
+  // highest server notification id seen; sent on (re)connect so missed ones are replayed
+  const lastIdRef = useRef(0)
+
+  const toNotification = (data: any): Notification => ({
+    id: data.id != null ? String(data.id) : `${Date.now()}_${Math.random()}`,
+    type: data.notification_type || 'info',
+    message: data.message,
+    data: data.data,
+    timestamp: data.timestamp || new Date().toISOString()
+  })
 
   useEffect(() => {
     if (!userId) return
-
-    // Connect to user-specific notification room
-    const ws = new WebSocket(`ws://${window.location.host}/api/v1/ws/notifications_user_${userId}`)
+    const token = getToken()
+    if (!token) return
+
+    // Load the stored inbox and the server-side unread counter before subscribing,
+    // so the replay on subscribe only carries what arrived after it
+    const loaded = apiFetch('/api/v1/notifications?limit=50').then(async (r) => {
+      if (!r.ok) return
+      const items = await r.json()
+      setNotifications(items.map(toNotification))
+      setUnreadCount(Number(r.headers.get('X-Unread-Count') || 0))
+      if (items.length) lastIdRef.current = Math.max(lastIdRef.current, items[0].id)
+    }).catch(() => {})
+
+    // One authenticated socket for the user's own room and the broadcast channel
+    const proto = window.location.protocol === 'https:' ? 'wss://' : 'ws://'
+    const ws = answerPings(new WebSocket(`${proto}${window.location.host}/api/v1/ws?token=${encodeURIComponent(token)}`))
     wsRef.current = ws
 
     ws.onopen = () => {
+      loaded.then(() => {
+        if (ws.readyState !== WebSocket.OPEN) return
+        ws.send(JSON.stringify({ type: 'subscribe', topics: [`notifications_user_${userId}`, 'notifications_all'], since: lastIdRef.current }))
+      })
       console.log('Notifications WebSocket connected')
     }
 
     ws.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data)
+        if (data.type === 'subscribed' && data.denied?.length) {
+          console.warn('Notification topics denied:', data.denied)
+        }
         if (data.type === 'notification') {
-          const notification: Notification = {
-            id: `${Date.now()}_${Math.random()}`,
-            type: data.notification_type || 'info',
-            message: data.message,
-            data: data.data,
-            timestamp: data.timestamp || new Date().toISOString()
+          if (typeof data.id === 'number') {
+            if (data.id <= lastIdRef.current) return // already shown (replay overlap)
+            lastIdRef.current = data.id
           }
+          const notification = toNotification(data)
           
           setNotifications(prev => [notification, ...prev].slice(0, 50)) // Keep last 50
           setUnreadCount(prev => prev + 1)
@@ -65,37 +96,13 @@ export function useNotifications(userId: number | null) {
     }
   }, [userId])
 
-  // Also connect to broadcast channel for admin messages
-  useEffect(() => {
-    const ws = new WebSocket(`ws://${window.location.host}/api/v1/ws/notifications_all`)
-
-    ws.onmessage = (event) => {
-      try {
-        const data = JSON.parse(event.data)
-        if (data.type === 'notification') {
-          const notification: Notification = {
-            id: `${Date.now()}_${Math.random()}`,
-            type: data.notification_type || 'info',
-            message: data.message,
-            data: data.data,
-            timestamp: data.timestamp || new Date().toISOString()
-          }
-          
-          setNotifications(prev => [notification, ...prev].slice(0, 50))
-          setUnreadCount(prev => prev + 1)
-        }
-      } catch (e) {
-        console.error('Error parsing broadcast notification:', e)
-      }
-    }
-
-    return () => {
-      ws.close()
-    }
-  }, [])
-
   const markAsRead = useCallback(() => {
     setUnreadCount(0)
+    apiFetch('/api/v1/notifications/read', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ up_to_id: lastIdRef.current || null })
+    }).catch(() => {})
   }, [])
 
   const clearAll = useCallback(() => {
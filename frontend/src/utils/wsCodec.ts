@@ -0,0 +1,15 @@
+// Decoder for the compact '?encoding=struct' WebSocket frames (backend services/ws_codec.py).
+// Siren pulses arrive as small binary frames, everything else (game deltas included) as JSON text.
+export function decodeFrame(data: string | ArrayBuffer): any {
+  if (typeof data === 'string') return JSON.parse(data)
+  const view = new DataView(data)
+  const op = view.getUint8(0)
+  switch (op) {
+    case 0x10: {
+      const playAt = Number(view.getBigUint64(1))
+      return { type: 'sirenPulse', payload: { at: Math.floor(playAt / 1000), play_at: playAt } }
+    }
+    default:
+      throw new Error(`unknown frame opcode ${op}`)
+  }
+}
@@ -0,0 +1,16 @@
+// The backend pings idle sockets ({type:'ping'}) and drops them when no pong comes back.
+// Uses addEventListener so components can still assign ws.onmessage freely.
+export function answerPings(ws: WebSocket) {
+  ws.addEventListener('message', (event) => {
+    if (typeof event.data !== 'string' || !event.data.includes('"ping"')) return
+    try {
+      const msg = JSON.parse(event.data)
+      if (msg && msg.type === 'ping' && ws.readyState === WebSocket.OPEN) {
+        ws.send(JSON.stringify({ type: 'pong', ts: msg.ts }))
+      }
+    } catch {
+      // not JSON: nothing to answer
+    }
+  })
+  return ws
+}